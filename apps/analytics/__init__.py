@@ -0,0 +1,34 @@
+"""
+分析模块 - 溢价率时间序列与滚动统计
+"""
+from .series import (
+    RESAMPLE_MODES,
+    DEFAULT_POINTS,
+    MAX_POINTS,
+    MAX_CODES,
+    load_series,
+    resample_series,
+    fund_series,
+)
+from .rolling import (
+    STAT_FIELDS,
+    load_window,
+    compute_stats,
+    RollingStatsCache,
+    rolling_stats,
+)
+
+__all__ = [
+    "RESAMPLE_MODES",
+    "DEFAULT_POINTS",
+    "MAX_POINTS",
+    "MAX_CODES",
+    "load_series",
+    "resample_series",
+    "fund_series",
+    "STAT_FIELDS",
+    "load_window",
+    "compute_stats",
+    "RollingStatsCache",
+    "rolling_stats",
+]
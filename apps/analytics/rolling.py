@@ -0,0 +1,175 @@
+"""
+溢价率滚动统计
+按基金计算最近 N 个快照日的均值、标准差、最新溢价率的 z-score、
+百分位排名与 N 日最高/最低，供告警条件（如 z-score ≥ 2）和分析接口使用。
+
+计算方式：最近 N 个快照日透视为 日期 × 基金 的矩阵，全部基金一次 numpy 运算完成。
+统计窗口包含最新一日。
+
+增量缓存：快照变化时（latest_view 版本戳递增）只重新读取缓存中最后一天及之后的快照，
+替换/追加到矩阵末尾并截断到 N 行，不重新读取整个窗口。
+缓存的首日早于库中最早快照日（过期快照已被清理）时全量重建，不继续使用已删除的数据。
+"""
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+import config
+from apps.version_stamp import VersionStamp
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = ("premium", "mean", "std", "zscore", "pct_rank", "max", "min", "samples")
+
+
+def load_window(window: int, since=None) -> pd.DataFrame:
+    """
+    读取快照并透视为 日期 × 基金 的溢价率矩阵（日期升序）。
+
+    since 为 None 时读取最近 window 个快照日，否则读取 since 及之后的快照日。
+    """
+    from models import FundSnapshot
+
+    if since is None:
+        dates = (
+            db.select(FundSnapshot.snapshot_date)
+            .group_by(FundSnapshot.snapshot_date)
+            .order_by(FundSnapshot.snapshot_date.desc())
+            .limit(window)
+            .subquery()
+        )
+        condition = FundSnapshot.snapshot_date.in_(db.select(dates.c.snapshot_date))
+    else:
+        condition = FundSnapshot.snapshot_date >= since
+
+    rows = db.session.execute(
+        db.select(FundSnapshot.snapshot_date, FundSnapshot.fund_code, FundSnapshot.premium)
+        .where(condition)
+    ).all()
+    df = pd.DataFrame.from_records(rows, columns=["snapshot_date", "fund_code", "premium"])
+    if df.empty:
+        return pd.DataFrame(dtype="float64")
+    df["premium"] = pd.to_numeric(df["premium"], errors="coerce").astype("float64")
+    return (
+        df.pivot_table(
+            index="snapshot_date", columns="fund_code", values="premium",
+            aggfunc="last", dropna=False,
+        )
+        .sort_index()
+        .astype("float64")
+    )
+
+
+def compute_stats(wide: pd.DataFrame, min_periods: int = 5) -> pd.DataFrame:
+    """
+    对 日期 × 基金 矩阵计算最新一日的滚动统计（矩阵已截断为窗口大小）。
+
+    返回以基金代码为索引的 DataFrame，列见 STAT_FIELDS；
+    最新一日没有溢价率的基金不在结果中，样本数不足 min_periods 的统计量为 NaN。
+    """
+    if wide.empty:
+        return pd.DataFrame(columns=STAT_FIELDS, dtype="float64")
+
+    values = wide.to_numpy(dtype="float64")
+    latest = values[-1]
+    valid = ~np.isnan(values)
+    samples = valid.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.where(valid, values, 0.0).sum(axis=0)
+        mean = total / samples
+        sq = np.where(valid, (values - mean) ** 2, 0.0).sum(axis=0)
+        std = np.sqrt(sq / (samples - 1))
+        zscore = np.where(std > 0, (latest - mean) / std, np.nan)
+        pct_rank = (valid & (values <= latest)).sum(axis=0) / samples
+        high = np.where(valid, values, -np.inf).max(axis=0)
+        low = np.where(valid, values, np.inf).min(axis=0)
+
+    enough = samples >= max(min_periods, 2)
+    stats = pd.DataFrame({
+        "premium": latest,
+        "mean": np.where(enough, mean, np.nan),
+        "std": np.where(enough, std, np.nan),
+        "zscore": np.where(enough, zscore, np.nan),
+        "pct_rank": np.where(enough, pct_rank, np.nan),
+        "max": high,
+        "min": low,
+        "samples": samples,
+    }, index=wide.columns)
+    return stats[~np.isnan(latest)]
+
+
+class RollingStatsCache:
+    """
+    滚动统计的进程内增量缓存。
+
+    快照未变化时直接返回缓存；变化时只读取缓存最后一天及之后的快照
+    （抓取通常只改写当日或新增一天），合并后截断到窗口大小并重新计算统计。
+    """
+
+    def __init__(self):
+        # 快照变化时 latest_view 递增的同一版本戳
+        self._stamp = VersionStamp("latest_view")
+        self._lock = threading.Lock()
+        self._version = None
+        self._window: pd.DataFrame | None = None
+        self._stats: pd.DataFrame | None = None
+
+    def current(self) -> pd.DataFrame:
+        """最新一日的各基金统计（以基金代码为索引），需在 app context 中调用"""
+        version = self._stamp.current()
+        stats = self._stats
+        if stats is not None and self._version == version:
+            return stats
+
+        with self._lock:
+            if self._stats is None or self._version != version:
+                self._refresh()
+                self._version = version
+            return self._stats
+
+    def _refresh(self) -> None:
+        cfg = config.analytics_cfg
+        window = self._window
+
+        if window is None or window.empty or self._has_deleted_days(window):
+            window = load_window(cfg.ROLLING_WINDOW)
+            mode = "全量"
+        else:
+            last_date = window.index[-1]
+            fresh = load_window(cfg.ROLLING_WINDOW, since=last_date)
+            if fresh.empty or fresh.index[0] != last_date:
+                # 缓存中的最后一天已不存在（快照被删除/重写），全量重建
+                window = load_window(cfg.ROLLING_WINDOW)
+                mode = "全量"
+            else:
+                window = pd.concat([window.iloc[:-1], fresh]).iloc[-cfg.ROLLING_WINDOW:]
+                mode = f"增量 {len(fresh)} 天"
+
+        self._window = window
+        self._stats = compute_stats(window, cfg.ROLLING_MIN_PERIODS)
+        logger.info(
+            f"滚动统计已更新（{mode}）：{len(window)} 天 × {len(self._stats)} 只基金"
+        )
+
+    @staticmethod
+    def _has_deleted_days(window: pd.DataFrame) -> bool:
+        """缓存窗口中是否有早于库中最早快照日的日期（快照清理后）"""
+        from models import FundSnapshot
+
+        oldest = db.session.query(db.func.min(FundSnapshot.snapshot_date)).scalar()
+        return oldest is None or window.index[0] < oldest
+
+    @staticmethod
+    def to_records(stats: pd.DataFrame) -> list[dict]:
+        """统计结果转为 JSON 友好的列表（NaN → None，保留 4 位小数）"""
+        out = stats.round(4).astype(object).where(stats.notna(), None)
+        out["samples"] = stats["samples"].astype(int)
+        return [{"fund_code": code, **row} for code, row in out.to_dict("index").items()]
+
+
+# 全局单例
+rolling_stats = RollingStatsCache()
@@ -0,0 +1,150 @@
+"""
+溢价率时间序列
+从 fund_snapshots 一次查询取出一只或多只基金的历史溢价率，在服务端降采样，
+图表加载几个月的数据只需一次小响应。
+
+降采样方式：
+    daily   每个快照日一个点（不降采样）
+    weekly  按交易周（周五结束）聚合：均值 / 最低 / 最高
+    minmax  等分为 points/2 个桶，每桶保留最低点与最高点（保留尖峰形状）
+    auto    点数不超过 points 时同 daily，否则同 minmax
+"""
+import numpy as np
+import pandas as pd
+
+from extensions import db
+
+RESAMPLE_MODES = ("auto", "daily", "weekly", "minmax")
+# 降采样目标点数：默认值与上限；多基金接口一次最多查询的基金数
+DEFAULT_POINTS = 200
+MAX_POINTS = 2000
+MAX_CODES = 20
+
+_COLUMNS = ["fund_code", "fund_name", "snapshot_date", "premium"]
+
+
+def load_series(codes: list[str], start_date=None, end_date=None) -> pd.DataFrame:
+    """
+    一次查询取出多只基金的溢价率历史（走 fund_code + snapshot_date 索引）。
+
+    返回列 fund_code / fund_name / snapshot_date(datetime64) / premium(float64)，
+    按基金、日期升序。
+    """
+    from models import FundSnapshot
+
+    stmt = (
+        db.select(
+            FundSnapshot.fund_code,
+            FundSnapshot.fund_name,
+            FundSnapshot.snapshot_date,
+            FundSnapshot.premium,
+        )
+        .where(FundSnapshot.fund_code.in_(codes))
+        .order_by(FundSnapshot.fund_code, FundSnapshot.snapshot_date)
+    )
+    if start_date is not None:
+        stmt = stmt.where(FundSnapshot.snapshot_date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(FundSnapshot.snapshot_date <= end_date)
+
+    df = pd.DataFrame.from_records(db.session.execute(stmt).all(), columns=_COLUMNS)
+    df["snapshot_date"] = pd.to_datetime(df["snapshot_date"])
+    df["premium"] = pd.to_numeric(df["premium"], errors="coerce").astype("float64")
+    return df
+
+
+def resample_series(df: pd.DataFrame, mode: str = "auto", points: int = DEFAULT_POINTS) -> dict:
+    """
+    对单只基金的序列（snapshot_date / premium 列，日期升序）降采样。
+
+    返回列式结构，键随方式不同：
+        daily / minmax: {"dates": [...], "premium": [...]}
+        weekly:         {"dates": [...], "premium": [...], "min": [...], "max": [...]}
+    weekly 的 dates 为每周最后一个快照日，premium 为周均值。
+    """
+    if mode not in RESAMPLE_MODES:
+        raise ValueError(f"不支持的降采样方式: {mode}")
+
+    if mode == "auto":
+        mode = "daily" if len(df) <= points else "minmax"
+
+    if mode == "weekly":
+        return _weekly(df)
+    if mode == "minmax" and len(df) > points:
+        df = _minmax(df, points)
+    return _columns(df["snapshot_date"], df["premium"])
+
+
+def _weekly(df: pd.DataFrame) -> dict:
+    week = df["snapshot_date"].dt.to_period("W-FRI")
+    grouped = df.groupby(week, sort=True)
+    out = pd.DataFrame({
+        "date": grouped["snapshot_date"].max(),
+        "mean": grouped["premium"].mean(),
+        "min": grouped["premium"].min(),
+        "max": grouped["premium"].max(),
+    })
+    result = _columns(out["date"], out["mean"])
+    result["min"] = _values(out["min"])
+    result["max"] = _values(out["max"])
+    return result
+
+
+def _minmax(df: pd.DataFrame, points: int) -> pd.DataFrame:
+    """每桶保留最低、最高两个点（按位置分桶，全部向量化）"""
+    n = len(df)
+    buckets = max(points // 2, 1)
+    premium = df["premium"].to_numpy()
+    bucket = np.arange(n) * buckets // n
+
+    valid = ~np.isnan(premium)
+    positions = pd.Series(premium[valid], index=np.flatnonzero(valid))
+    grouped = positions.groupby(bucket[valid])
+    keep = np.union1d(grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy())
+    return df.iloc[keep]
+
+
+def _values(series: pd.Series) -> list:
+    """float → 保留 4 位小数，NaN → None"""
+    values = series.round(4).astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def _columns(dates: pd.Series, premium: pd.Series) -> dict:
+    return {
+        "dates": dates.dt.strftime("%Y-%m-%d").tolist(),
+        "premium": _values(premium),
+    }
+
+
+def fund_series(
+    codes: list[str],
+    start_date=None,
+    end_date=None,
+    mode: str = "auto",
+    points: int = DEFAULT_POINTS,
+) -> list[dict]:
+    """
+    多只基金的降采样序列，按传入顺序返回；没有快照的代码返回空序列。
+
+    返回: [{"fund_code", "fund_name", "raw_points", "dates", "premium", ...}, ...]
+    """
+    df = load_series(codes, start_date, end_date)
+    groups = dict(tuple(df.groupby("fund_code", sort=False)))
+
+    result = []
+    for code in codes:
+        group = groups.get(code)
+        if group is None:
+            result.append({
+                "fund_code": code, "fund_name": None, "raw_points": 0,
+                **resample_series(df.iloc[:0], mode, points),
+            })
+            continue
+        result.append({
+            "fund_code": code,
+            "fund_name": group["fund_name"].iloc[-1],
+            "raw_points": len(group),
+            **resample_series(group, mode, points),
+        })
+    return result
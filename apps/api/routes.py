@@ -2,7 +2,6 @@
 API 蓝图 - 统一路由层
 """
 from flask import Blueprint, request, jsonify, Response
-import time
 import json
 import logging
 
@@ -114,6 +113,7 @@ def list_or_create_tasks():
         conditions=json.dumps({
             "premium_min": data.get("premium_min", 0),
             "status_filter": data.get("status_filter", "all"),
+            "zscore_min": data.get("zscore_min"),
         }, ensure_ascii=False),
     )
     db.session.add(task)
@@ -199,6 +199,7 @@ def test_task():
     conditions = {
         "premium_min": data.get("premium_min", 0),
         "status_filter": data.get("status_filter", "all"),
+        "zscore_min": data.get("zscore_min"),
     }
 
     try:
@@ -223,51 +224,15 @@ def refresh():
     返回 JSON 格式的筛选后数据（含溢价率变化对比）。
     """
     from flask import request
-    import pandas as pd
-    import config
-    from models import FundSnapshot
+    from apps.latest_view import latest_view
 
     premium_min = request.form.get("premium_min", default=0.0, type=float)
     status_filter = request.form.get("status_filter", default="all")
 
-    # 尝试从快照获取带变化的数据
-    all_funds = []
-    try:
-        all_funds = FundSnapshot.compare_today_vs_yesterday()
-    except Exception:
-        pass
-
-    # 若无快照，降级到 CSV
-    if not all_funds:
-        data_path = config.spider.output_clean_path
-        if not data_path.exists():
-            return jsonify({"status": "error", "message": "暂无数据，请先刷新"}), 404
-        df = pd.read_csv(data_path)
-        col_map = {"来源": "source", "代码": "code", "名称": "name",
-                   "T-1溢价率": "premium_today", "申购状态": "status"}
-        df = df.rename(columns=col_map)
-        df["source"] = df.get("source", "")
-        df["change"] = None
-        all_funds = df.to_dict("records")
-
-    # 筛选
-    filtered = []
-    for f in all_funds:
-        premium = f.get("premium_today")
-        if premium is None:
-            continue
-        if premium < premium_min:
-            continue
-        status = f.get("status", "")
-        if status_filter == "limited" and "限" not in str(status):
-            continue
-        elif status_filter == "open" and "开放" not in str(status):
-            continue
-        elif status_filter == "closed" and "暂停" not in str(status):
-            continue
-        filtered.append(f)
-
-    filtered.sort(key=lambda x: x.get("premium_today") or -999, reverse=True)
+    # 进程内缓存的最新视图（快照优先，无快照时降级到清洗数据文件）
+    filtered = latest_view.query(premium_min, status_filter)
+    if not filtered and not latest_view.has_data():
+        return jsonify({"status": "error", "message": "暂无数据，请先刷新"}), 404
 
     from datetime import datetime
     return jsonify({
@@ -278,46 +243,78 @@ def refresh():
     })
 
 
-_refresh_lock_time = 0
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
 
-@api_bp.route("/refresh-status")
-def refresh_status():
-    """SSE 端点：实时推送数据刷新进度"""
-    global _refresh_lock_time
+@api_bp.route("/refresh/progress")
+def refresh_progress():
+    """
+    短轮询刷新进度（页面默认方式，每次请求立即返回，不占用 worker 线程）。
 
-    def generate():
-        global _refresh_lock_time
+    不带 job 参数：开始或加入当前刷新，返回任务 id 与已有事件；
+    带 job / offset：返回该任务 offset 之后的新事件。
+    返回: {job_id, events, offset, finished, poll_interval}
+    """
+    from flask import current_app
+    from apps.refresh import RefreshJob, refresh_coordinator
+    import config
+
+    cfg = config.refresh_cfg
+    job_id = request.args.get("job")
+    if job_id:
         try:
-            yield f"data: {json.dumps({'status': 'processing', 'message': '准备抓取数据...'})}\n\n"
-            time.sleep(0.3)
+            job = RefreshJob(job_id)
+        except ValueError as e:
+            return err(str(e), 400)
+    else:
+        job, error = refresh_coordinator.start(current_app._get_current_object())
+        if error:
+            return ok(
+                job_id=None, events=[{"status": "error", "message": error}],
+                offset=0, finished=True, poll_interval=cfg.POLL_INTERVAL,
+            )
 
-            # 冷却时间检查
-            now = time.time()
-            if now - _refresh_lock_time < 30:
-                cooldown = int(30 - (now - _refresh_lock_time))
-                yield f"data: {json.dumps({'status': 'error', 'message': f'刷新太频繁，请等待 {cooldown} 秒'})}\n\n"
-                return
+    offset = max(request.args.get("offset", default=0, type=int), 0)
+    events, offset, finished = job.poll(offset, cfg.LEASE_TTL)
+    return ok(
+        job_id=job.id, events=events, offset=offset,
+        finished=finished, poll_interval=cfg.POLL_INTERVAL,
+    )
 
-            yield f"data: {json.dumps({'status': 'processing', 'message': '正在抓取数据...'})}\n\n"
 
-            # 直接调用爬虫模块（不走 subprocess）
-            from apps.spider import run_workflow
-            import config
+@api_bp.route("/refresh-status")
+def refresh_status():
+    """
+    SSE 端点：实时推送数据刷新进度。
 
-            df, _ = run_workflow(
-                premium_min=config.filter_cfg.PREMIUM_THRESHOLD,
-                status_filter=None,
-            )
-            _refresh_lock_time = now
+    刷新在后台线程执行（apps.refresh），全系统同一时间只有一个刷新，
+    其他 worker 上的请求订阅同一刷新的进度，本端点只转发各阶段事件；
+    长时间无新阶段时发送 heartbeat 事件，避免前端判定连接超时。
 
-            yield f"data: {json.dumps({'status': 'completed', 'message': f'抓取完成，共 {len(df)} 条数据，正在刷新页面...'})}\n\n"
+    连接在整个刷新期间占用一个 worker 线程（默认 gunicorn 4 worker × 2 线程），
+    同步 worker 下请使用 /api/refresh/progress 短轮询；仅在 gevent 等异步 worker 下使用本端点。
+    """
+    from flask import current_app
+    from apps.refresh import refresh_coordinator
+    import config
 
-        except Exception as e:
-            logger.error(f"刷新出错: {e}")
-            yield f"data: {json.dumps({'status': 'error', 'message': str(e)})}\n\n"
+    job, error = refresh_coordinator.start(current_app._get_current_object())
+    heartbeat = config.refresh_cfg.HEARTBEAT_INTERVAL
+    stale_after = config.refresh_cfg.LEASE_TTL
 
-    return Response(generate(), mimetype="text/event-stream")
+    def generate():
+        if error:
+            yield _sse({"status": "error", "message": error})
+            return
+        for event in job.follow(heartbeat, stale_after):
+            yield _sse(event if event is not None else {"status": "heartbeat"})
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ═══════════════════════════════════════════════════════
@@ -378,6 +375,9 @@ def save_channel(channel_id):
     ch.is_active = bool(data.get("is_active", ch.is_active))
     db.session.commit()
 
+    from apps.notify import notification_service
+    notification_service.invalidate_channel_config()
+
     return ok(message=f"{ch.name} 配置已保存")
 
 
@@ -438,6 +438,10 @@ def create_template():
     )
     db.session.add(t)
     db.session.commit()
+
+    from apps.notify.templating import compile_template
+
+    compile_template(t)
     return ok(message="模板已创建", template_id=t.id)
 
 
@@ -459,6 +463,11 @@ def update_template(template_id):
             setattr(t, field, data[field])
 
     db.session.commit()
+
+    # 保存后立即编译，替换旧版本缓存
+    from apps.notify.templating import compile_template
+
+    compile_template(t)
     return ok(message="模板已更新")
 
 
@@ -475,12 +484,149 @@ def delete_template(template_id):
 
     db.session.delete(t)
     db.session.commit()
+
+    from apps.notify.templating import invalidate
+
+    invalidate(template_id)
     return ok(message="模板已删除")
 
 
+# ═══════════════════════════════════════════════════════
+# 通知发件箱
+# ═══════════════════════════════════════════════════════
+@api_bp.route("/notify/outbox", methods=["GET"])
+def list_outbox():
+    """
+    查看发件箱记录。
+
+    Query:
+        status: pending/sending/sent/dead（可选）
+        limit: 返回条数（默认 50）
+    """
+    from models import NotifyOutbox
+
+    status = request.args.get("status")
+    limit = min(request.args.get("limit", default=50, type=int), 500)
+
+    query = NotifyOutbox.query
+    if status:
+        query = query.filter_by(status=status)
+    items = query.order_by(NotifyOutbox.id.desc()).limit(limit).all()
+    return ok(items=[i.to_dict() for i in items])
+
+
+@api_bp.route("/notify/outbox/<int:item_id>/retry", methods=["POST"])
+def retry_outbox(item_id):
+    """死信手动重投"""
+    from models import NotifyOutbox
+    from apps.notify.outbox import outbox_dispatcher
+
+    item = db.session.get(NotifyOutbox, item_id)
+    if not item:
+        return err("记录不存在", 404)
+    if item.status != "dead":
+        return err(f"仅死信可重投，当前状态: {item.status}", 400)
+
+    item.requeue()
+    outbox_dispatcher.wake()
+    return ok(message=f"发件箱 #{item.id} 已重新加入投递队列")
+
+
 # ═══════════════════════════════════════════════════════
 # 历史数据 API
 # ═══════════════════════════════════════════════════════
+def _parse_date(value: str):
+    from datetime import datetime
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def _encode_cursor(cursor: tuple) -> str:
+    import base64
+    value, last_id = cursor
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    raw = json.dumps([value, last_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str, sort: str) -> tuple:
+    import base64
+    raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    value, last_id = json.loads(raw)
+    if sort == "snapshot_date" and value is not None:
+        value = _parse_date(value)
+    return value, int(last_id)
+
+
+@api_bp.route("/history", methods=["GET"])
+def list_history():
+    """
+    分页查询历史快照（过滤、排序、分页均在数据库完成）。
+
+    查询参数:
+        start_date / end_date: 日期范围 YYYY-MM-DD（含两端）
+        source: 市场来源；status: 申购状态子串；fund_code: 基金代码
+        premium_min / premium_max: 溢价率范围
+        sort: snapshot_date（默认）/ premium / fund_code；order: desc（默认）/ asc
+        limit: 每页条数（默认 SNAPSHOT_PAGE_SIZE，不超过 SNAPSHOT_MAX_PAGE_SIZE）
+        cursor: 上一页返回的 next_cursor
+    """
+    from models import FundSnapshot
+    import config
+
+    args = request.args
+    sort = args.get("sort", "snapshot_date")
+    if sort not in FundSnapshot.SORT_FIELDS:
+        return err(f"不支持的排序字段: {sort}", 400)
+    order = args.get("order", "desc").lower()
+    if order not in ("asc", "desc"):
+        return err(f"不支持的排序方向: {order}", 400)
+
+    try:
+        start_date = _parse_date(args.get("start_date"))
+        end_date = _parse_date(args.get("end_date"))
+    except ValueError:
+        return err("日期格式应为 YYYY-MM-DD", 400)
+
+    cursor = args.get("cursor")
+    try:
+        after = _decode_cursor(cursor, sort) if cursor else None
+    except (ValueError, TypeError):
+        return err("无效的分页游标", 400)
+
+    limit = args.get("limit", default=config.snapshot_cfg.PAGE_SIZE, type=int)
+    limit = max(1, min(limit, config.snapshot_cfg.MAX_PAGE_SIZE))
+
+    rows, next_cursor = FundSnapshot.page(
+        start_date=start_date,
+        end_date=end_date,
+        source=args.get("source"),
+        status=args.get("status"),
+        premium_min=args.get("premium_min", type=float),
+        premium_max=args.get("premium_max", type=float),
+        fund_code=args.get("fund_code"),
+        sort=sort,
+        desc=order == "desc",
+        limit=limit,
+        after=after,
+    )
+    return ok(
+        funds=[r.to_dict() for r in rows],
+        count=len(rows),
+        limit=limit,
+        next_cursor=_encode_cursor(next_cursor) if next_cursor else None,
+    )
+
+
+@api_bp.route("/history/dates", methods=["GET"])
+def list_history_dates():
+    """已有快照的日期及各日基金数（日期降序）"""
+    from models import FundSnapshot
+
+    limit = request.args.get("limit", type=int)
+    return ok(dates=FundSnapshot.list_dates(limit))
+
+
 @api_bp.route("/history/today", methods=["GET"])
 def get_today_with_changes():
     """
@@ -496,20 +642,142 @@ def get_today_with_changes():
     )
 
 
+# ═══════════════════════════════════════════════════════
+# 基金溢价率时间序列
+# ═══════════════════════════════════════════════════════
+def _series_response(codes: list[str]):
+    """解析公共查询参数并返回降采样序列"""
+    from apps import analytics
+
+    args = request.args
+    mode = args.get("resample", "auto")
+    if mode not in analytics.RESAMPLE_MODES:
+        return err(f"不支持的降采样方式: {mode}", 400)
+    try:
+        start_date = _parse_date(args.get("start_date"))
+        end_date = _parse_date(args.get("end_date"))
+    except ValueError:
+        return err("日期格式应为 YYYY-MM-DD", 400)
+    points = args.get("points", default=analytics.DEFAULT_POINTS, type=int)
+    points = max(2, min(points, analytics.MAX_POINTS))
+
+    series = analytics.fund_series(codes, start_date, end_date, mode, points)
+    return ok(series=series, resample=mode, points=points)
+
+
+@api_bp.route("/funds/<code>/series", methods=["GET"])
+def get_fund_series(code):
+    """
+    单只基金溢价率历史。
+
+    查询参数:
+        start_date / end_date: 日期范围 YYYY-MM-DD
+        resample: auto（默认）/ daily / weekly / minmax
+        points: 降采样目标点数（默认 200，上限 2000）
+    """
+    return _series_response([code])
+
+
+@api_bp.route("/funds/series", methods=["GET"])
+def get_funds_series():
+    """多只基金溢价率历史：codes=513100,159941（其余参数同单基金接口）"""
+    from apps import analytics
+
+    codes = [c.strip() for c in request.args.get("codes", "").split(",") if c.strip()]
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return err("请提供 codes 参数", 400)
+    if len(codes) > analytics.MAX_CODES:
+        return err(f"一次最多查询 {analytics.MAX_CODES} 只基金", 400)
+    return _series_response(codes)
+
+
+@api_bp.route("/analytics/rolling", methods=["GET"])
+def get_rolling_stats():
+    """
+    各基金最新溢价率的滚动统计（均值 / 标准差 / z-score / 百分位 / N 日最高最低）。
+
+    查询参数:
+        codes: 基金代码，逗号分隔（默认全部）
+        window: 窗口快照日数（默认 ANALYTICS_ROLLING_WINDOW；非默认值不走缓存）
+        zscore_min: 只返回 z-score 不低于该值的基金（与任务条件 zscore_min 相同）
+    """
+    import config
+    from apps import analytics
+
+    args = request.args
+    cfg = config.analytics_cfg
+    window = args.get("window", default=cfg.ROLLING_WINDOW, type=int)
+    window = max(2, min(window, config.snapshot_cfg.KEEP_DAYS or window))
+
+    if window == cfg.ROLLING_WINDOW:
+        stats = analytics.rolling_stats.current()
+    else:
+        stats = analytics.compute_stats(
+            analytics.load_window(window), min(cfg.ROLLING_MIN_PERIODS, window)
+        )
+
+    codes = [c.strip() for c in args.get("codes", "").split(",") if c.strip()]
+    if codes:
+        stats = stats[stats.index.isin(codes)]
+    zscore_min = args.get("zscore_min", type=float)
+    if zscore_min is not None:
+        stats = stats[stats["zscore"] >= zscore_min]
+
+    return ok(
+        window=window,
+        stats=analytics.RollingStatsCache.to_records(stats),
+        count=len(stats),
+    )
+
+
+@api_bp.route("/ticks/latest", methods=["GET"])
+def get_latest_ticks():
+    """最近一次抓取的盘中记录（全部基金）"""
+    from models import FundTick
+
+    captured_at, ticks = FundTick.latest_batch()
+    return ok(
+        captured_at=captured_at.isoformat() if captured_at else None,
+        ticks=[t.to_dict() for t in ticks],
+        count=len(ticks),
+    )
+
+
+@api_bp.route("/funds/<code>/ticks", methods=["GET"])
+def get_fund_ticks(code):
+    """单只基金某日（date=YYYY-MM-DD，默认今日）的盘中溢价率记录"""
+    from models import FundTick
+
+    try:
+        day = _parse_date(request.args.get("date"))
+    except ValueError:
+        return err("日期格式应为 YYYY-MM-DD", 400)
+
+    ticks = FundTick.intraday(code, day)
+    latest = ticks[-1] if ticks and day is None else FundTick.latest_for(code)
+    return ok(
+        fund_code=code,
+        ticks=[t.to_dict() for t in ticks],
+        latest=latest.to_dict() if latest else None,
+    )
+
+
 @api_bp.route("/history/snapshot", methods=["POST"])
 def save_snapshot():
     """
     保存当前清洗数据为快照（手动保存或定时任务调用）。
     """
     from models import FundSnapshot
-    import pandas as pd
-    import config
+    from apps.latest_view import latest_view
+    from apps.spider import storage
 
-    data_path = config.spider.output_clean_path
-    if not data_path.exists():
+    df = storage.load_clean(
+        columns=["来源", "代码", "名称", "溢价率", "T-1溢价率", "申购状态", "fund_id", "fund_nm"]
+    )
+    if df is None:
         return err("暂无数据可保存")
 
-    df = pd.read_csv(data_path)
     # 标准化列名（兼容 API 格式）
     col_map = {
         "来源": "来源",
@@ -524,6 +792,7 @@ def save_snapshot():
             df = df.rename(columns={old: new})
 
     count = FundSnapshot.save_from_df(df)
+    latest_view.invalidate()
     return ok(message=f"快照已保存，共 {count} 条数据")
 
 
@@ -537,4 +806,9 @@ def cleanup_history():
     data = request.get_json() or {}
     keep_days = int(data.get("keep_days", 30))
     deleted = FundSnapshot.cleanup_old_snapshots(keep_days)
+    if deleted:
+        from apps.latest_view import latest_view
+
+        # 通知所有 worker 的快照缓存（含滚动统计）重建
+        latest_view.invalidate()
     return ok(message=f"已清理 {deleted} 条过期快照")
@@ -64,6 +64,11 @@ def create_app(test_config: dict = None) -> Flask:
         # 创建数据库表
         db.create_all()
 
+        # 旧库补建新增索引
+        from models import FundSnapshot
+
+        FundSnapshot.ensure_indexes()
+
         # 初始化内置渠道
         from models import init_builtin_channels, NotifyTemplate
 
@@ -89,6 +94,9 @@ def create_app(test_config: dict = None) -> Flask:
         # 初始化调度器
         _init_scheduler(app)
 
+        # 启动通知发件箱投递器
+        _init_outbox(app)
+
     return app
 
 
@@ -96,9 +104,8 @@ def create_page_bp():
     """页面路由蓝图"""
     from flask import Blueprint, render_template, request
 
-    import pandas as pd
-
-    import config
+    from apps.latest_view import latest_view
+    from apps.spider import storage
 
     bp = Blueprint("pages", __name__)
 
@@ -107,62 +114,13 @@ def create_page_bp():
         premium_min = request.form.get("premium_min", default=0.0, type=float)
         status_filter = request.form.get("status_filter", default="all")
 
-        # 优先使用带变化的快照数据
-        try:
-            from models import FundSnapshot
-
-            all_funds = FundSnapshot.compare_today_vs_yesterday()
-        except Exception:
-            all_funds = []
-
-        # 若无快照数据，尝试从 CSV 读取
-        if not all_funds:
-            data_path = config.spider.output_clean_path
-            if data_path.exists():
-                df = pd.read_csv(data_path)
-                # 标准化列名
-                col_map = {
-                    "来源": "source",
-                    "代码": "code",
-                    "名称": "name",
-                    "溢价率": "premium_today",
-                    "申购状态": "status",
-                }
-                df = df.rename(columns=col_map)
-                df["source"] = df.get("source", "")
-                df["change"] = None
-                all_funds = df.to_dict("records")
-            else:
-                all_funds = []
-
-        # 应用筛选
-        filtered = []
-        for f in all_funds:
-            premium = f.get("premium_today")
-            if premium is None:
-                continue
-            if premium < premium_min:
-                continue
-            status = f.get("status", "")
-            if status_filter == "limited" and "限" not in str(status):
-                continue
-            elif status_filter == "open" and "开放" not in str(status):
-                continue
-            elif status_filter == "closed" and "暂停" not in str(status):
-                continue
-            filtered.append(f)
-
-        # 按溢价率降序
-        filtered.sort(key=lambda x: x.get("premium_today") or -999, reverse=True)
+        # 进程内缓存的最新视图（已按溢价率降序）
+        filtered = latest_view.query(premium_min, status_filter)
 
         # 更新时间
         update_time = None
         try:
-            data_path = config.spider.output_clean_path
-            if data_path.exists():
-                update_time = pd.Timestamp(data_path.stat().st_mtime).strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                )
+            update_time = storage.clean_updated_at()
         except Exception:
             pass
 
@@ -191,3 +149,19 @@ def _init_scheduler(app):
         logger.info("Scheduler initialized successfully")
     except Exception as e:
         logger.error("Scheduler init failed: %s", e)
+
+
+def _init_outbox(app):
+    """Start the notification outbox dispatcher thread."""
+    import logging
+
+    logger = logging.getLogger(__name__)
+    if not config.notify_cfg.OUTBOX_ENABLED:
+        return
+    try:
+        from apps.notify.outbox import outbox_dispatcher
+
+        outbox_dispatcher.start(app)
+        app.outbox_dispatcher = outbox_dispatcher
+    except Exception as e:
+        logger.error("Outbox dispatcher start failed: %s", e)
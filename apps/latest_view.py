@@ -0,0 +1,130 @@
+"""
+最新数据视图缓存
+首页与 /api/refresh 共用的“今日 vs 前一交易日”结果，进程内缓存、按版本戳失效。
+
+- 每次成功抓取/保存快照后调用 latest_view.invalidate() 递增版本
+- 各 worker 在请求时只读取版本戳文件，版本或日期变化时才重建（查一次库）
+- 结果预先按溢价率降序排好，溢价率下限用二分查找取前缀，状态筛选用预计算掩码
+"""
+import bisect
+import logging
+import threading
+from datetime import date
+
+from apps.version_stamp import VersionStamp
+
+logger = logging.getLogger(__name__)
+
+# 前端状态筛选值 → 申购状态关键字
+STATUS_KEYWORDS = {
+    "limited": "限",
+    "open": "开放",
+    "closed": "暂停",
+}
+
+
+class LatestViewCache:
+    """今日基金列表（含变化对比）的进程内缓存"""
+
+    def __init__(self):
+        self._stamp = VersionStamp("latest_view")
+        self._lock = threading.Lock()
+        self._key = None
+        # 有溢价率的基金，按溢价率降序
+        self._rows: list[dict] = []
+        # 对应的溢价率取负（升序），供 bisect 使用
+        self._neg_premiums: list[float] = []
+        # 每种状态筛选对应的布尔掩码
+        self._status_masks: dict[str, list[bool]] = {}
+
+    # ──────────────────────────────────────────
+    # 对外接口
+    # ──────────────────────────────────────────
+
+    def invalidate(self) -> None:
+        """数据已更新：递增版本戳，所有 worker 下次请求时重建"""
+        self._stamp.bump()
+
+    def has_data(self) -> bool:
+        """是否有可展示的数据（快照或清洗数据文件）"""
+        self._ensure_fresh()
+        return bool(self._rows)
+
+    def query(self, premium_min: float = 0.0, status_filter: str = "all") -> list[dict]:
+        """
+        按溢价率下限与状态筛选，返回已按溢价率降序排列的基金列表。
+
+        返回的 dict 为缓存共享对象，调用方不要修改。
+        """
+        self._ensure_fresh()
+        rows, neg, masks = self._rows, self._neg_premiums, self._status_masks
+
+        # 溢价率 >= premium_min 的行恰好是降序列表的前缀
+        end = bisect.bisect_right(neg, -premium_min)
+        mask = masks.get(status_filter)
+        if mask is None:
+            return rows[:end]
+        return [r for r, ok in zip(rows[:end], mask[:end]) if ok]
+
+    # ──────────────────────────────────────────
+    # 内部实现
+    # ──────────────────────────────────────────
+
+    def _ensure_fresh(self) -> None:
+        key = (self._stamp.current(), date.today())
+        if key == self._key:
+            return
+        with self._lock:
+            if key == self._key:
+                return
+            self._rebuild()
+            self._key = key
+
+    def _rebuild(self) -> None:
+        funds = self._load()
+        rows = [f for f in funds if f.get("premium_today") is not None]
+        rows.sort(key=lambda f: f["premium_today"], reverse=True)
+
+        statuses = [str(f.get("status", "")) for f in rows]
+        self._status_masks = {
+            name: [keyword in s for s in statuses]
+            for name, keyword in STATUS_KEYWORDS.items()
+        }
+        self._neg_premiums = [-f["premium_today"] for f in rows]
+        self._rows = rows
+        logger.info(f"最新数据视图已重建：{len(rows)} 条")
+
+    @staticmethod
+    def _load() -> list[dict]:
+        """优先读取带变化的快照数据，无快照时降级到清洗数据文件"""
+        try:
+            from models import FundSnapshot
+
+            funds = FundSnapshot.compare_today_vs_yesterday()
+            if funds:
+                return funds
+        except Exception as e:
+            logger.warning(f"读取快照失败，降级到清洗数据文件: {e}")
+
+        from apps.spider import storage
+
+        df = storage.load_clean(columns=["来源", "代码", "名称", "溢价率", "申购状态"])
+        if df is None:
+            return []
+        df = df.rename(columns={
+            "来源": "source",
+            "代码": "code",
+            "名称": "name",
+            "溢价率": "premium_today",
+            "申购状态": "status",
+        })
+        df["premium_today"] = df["premium_today"].astype("float64")
+        funds = df.astype(object).where(df.notna(), None).to_dict("records")
+        for f in funds:
+            f.setdefault("source", "")
+            f["change"] = None
+        return funds
+
+
+# 全局单例
+latest_view = LatestViewCache()
@@ -0,0 +1,162 @@
+"""
+通知渠道配置快照
+环境变量为默认值，数据库 notify_channels 中保存的渠道配置覆盖其上，
+合并结果为不可变快照，发送时显式传给各渠道，不再修改进程全局配置。
+
+- 快照每个版本只从数据库加载一次（一次查询取全部渠道）
+- 保存渠道配置后 bump 版本戳，各 worker 下次发送时自动重新加载
+"""
+import dataclasses
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from apps.version_stamp import VersionStamp
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ChannelConfig:
+    """通知渠道配置（不可变，修改请用 merged 生成新实例）"""
+    dingtalk_token: str = ""
+    dingtalk_secret: str = ""
+    feishu_token: str = ""
+    feishu_secret: str = ""
+    wecom_corp_id: str = ""
+    wecom_agent_id: str = ""
+    wecom_corp_secret: str = ""
+    telegram_token: str = ""
+    telegram_chat_id: str = ""
+    pushplus_token: str = ""
+    serverchan_sckey: str = ""
+    bark_key: str = ""
+    igot_key: str = ""
+    smtp_server: str = ""
+    smtp_port: int = 587
+    smtp_username: str = ""
+    smtp_password: str = ""
+    smtp_sender: str = ""
+    smtp_use_ssl: bool = True
+    custom_webhook: str = ""
+    # 配置版本："env" 表示仅环境变量，否则为渠道配置版本戳
+    version: str = "env"
+
+    @classmethod
+    def from_env(cls) -> "ChannelConfig":
+        return cls(
+            dingtalk_token=os.getenv("DINGTALK_TOKEN", ""),
+            dingtalk_secret=os.getenv("DINGTALK_SECRET", ""),
+            feishu_token=os.getenv("FEISHU_TOKEN", ""),
+            feishu_secret=os.getenv("FEISHU_SECRET", ""),
+            wecom_corp_id=os.getenv("WECOM_CORP_ID", ""),
+            wecom_agent_id=os.getenv("WECOM_AGENT_ID", ""),
+            wecom_corp_secret=os.getenv("WECOM_CORP_SECRET", ""),
+            telegram_token=os.getenv("TELEGRAM_TOKEN", ""),
+            telegram_chat_id=os.getenv("TELEGRAM_CHAT_ID", ""),
+            pushplus_token=os.getenv("PUSHPLUS_TOKEN", ""),
+            serverchan_sckey=os.getenv("SERVERCHAN_SCKEY", ""),
+            bark_key=os.getenv("BARK_KEY", ""),
+            igot_key=os.getenv("IGOT_KEY", ""),
+            smtp_server=os.getenv("SMTP_SERVER", ""),
+            smtp_port=int(os.getenv("SMTP_PORT", "587")),
+            smtp_username=os.getenv("SMTP_USERNAME", ""),
+            smtp_password=os.getenv("SMTP_PASSWORD", ""),
+            smtp_sender=os.getenv("MAIL_SENDER", ""),
+            smtp_use_ssl=os.getenv("SMTP_USE_SSL", "true").lower() == "true",
+            custom_webhook=os.getenv("CUSTOM_WEBHOOK", ""),
+        )
+
+    def merged(self, **kwargs) -> "ChannelConfig":
+        """返回覆盖了指定字段的新配置；未知字段与空值（None / ""）忽略"""
+        known = {f.name for f in dataclasses.fields(self)}
+        changes = {
+            key: value for key, value in kwargs.items()
+            if key in known and value is not None and value != ""
+        }
+        return dataclasses.replace(self, **changes) if changes else self
+
+
+def channel_fields(channel_id: str, config: dict) -> dict:
+    """将 DB 中某渠道的配置映射为 ChannelConfig 字段"""
+    mapping = {
+        "email": lambda: {
+            "smtp_server": config.get("smtp_server"),
+            "smtp_port": int(config.get("smtp_port") or 587),
+            "smtp_username": config.get("username") or config.get("smtp_username"),
+            "smtp_password": config.get("password") or config.get("smtp_password"),
+            "smtp_sender": config.get("sender_email") or config.get("smtp_username"),
+            "smtp_use_ssl": bool(config.get("use_ssl", True)),
+        },
+        "dingtalk": lambda: {
+            "dingtalk_token": config.get("token"),
+            "dingtalk_secret": config.get("secret"),
+        },
+        "feishu": lambda: {
+            "feishu_token": config.get("token"),
+            "feishu_secret": config.get("secret"),
+        },
+        "wecom": lambda: {
+            "wecom_corp_id": config.get("corp_id"),
+            "wecom_agent_id": config.get("agent_id"),
+            "wecom_corp_secret": config.get("corp_secret"),
+        },
+        "telegram": lambda: {
+            "telegram_token": config.get("token"),
+            "telegram_chat_id": config.get("chat_id"),
+        },
+        "pushplus": lambda: {"pushplus_token": config.get("token")},
+        "serverchan": lambda: {"serverchan_sckey": config.get("sckey")},
+        "bark": lambda: {"bark_key": config.get("key")},
+        "igot": lambda: {"igot_key": config.get("key")},
+        "webhook": lambda: {"custom_webhook": config.get("webhook_url")},
+    }
+    build = mapping.get(channel_id)
+    return build() if build else {}
+
+
+class ChannelConfigStore:
+    """
+    渠道配置快照缓存（每进程一份）。
+
+    current() 先读版本戳，版本未变直接返回缓存的快照；
+    变化时一次查询加载全部渠道配置并生成新快照（需在 app context 中调用）。
+    """
+
+    def __init__(self, base: ChannelConfig):
+        self.base = base
+        self._stamp = VersionStamp("notify_channels")
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ChannelConfig] = None
+
+    def current(self) -> ChannelConfig:
+        version = self._stamp.current()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self._load(version)
+        return snapshot
+
+    def invalidate(self) -> None:
+        """渠道配置已保存：bump 版本戳，所有 worker 下次读取时重新加载"""
+        self._stamp.bump()
+        with self._lock:
+            self._snapshot = None
+
+    def _load(self, version: str) -> ChannelConfig:
+        from models import NotifyChannel
+
+        fields = {}
+        for ch in NotifyChannel.query.all():
+            try:
+                fields.update(channel_fields(ch.channel, ch.get_config()))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"渠道 {ch.channel} 配置无效，已忽略: {e}")
+        logger.debug(f"已加载通知渠道配置快照 {version}")
+        return self.base.merged(version=version, **fields)
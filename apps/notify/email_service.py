@@ -8,6 +8,8 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import Optional
 
+from .smtp_pool import SMTPSettings, smtp_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -66,16 +68,16 @@ class EmailService:
         msg["Subject"] = subject
         msg.attach(MIMEText(content, "html" if is_html else "plain"))
 
+        settings = SMTPSettings(
+            server=cfg["smtp_server"],
+            port=int(cfg["smtp_port"]),
+            username=cfg["smtp_username"],
+            password=cfg["smtp_password"],
+            use_ssl=bool(cfg.get("use_ssl", True)),
+        )
         try:
-            if cfg.get("use_ssl", True):
-                server = smtplib.SMTP_SSL(cfg["smtp_server"], cfg["smtp_port"])
-            else:
-                server = smtplib.SMTP(cfg["smtp_server"], cfg["smtp_port"])
-                server.starttls()
-
-            server.login(cfg["smtp_username"], cfg["smtp_password"])
-            server.send_message(msg)
-            server.quit()
+            # 复用连接池中已登录的会话，断线自动重连
+            smtp_pool.send(settings, msg)
 
             logger.info(f"邮件发送成功: {subject} -> {recipients}")
             return True
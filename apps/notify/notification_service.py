@@ -2,17 +2,22 @@
 统一通知服务
 整合多渠道配置、模板渲染、统一发送接口。
 """
+import hashlib
+import json
 import logging
 from datetime import datetime
 from typing import Optional
 
+import config
 from extensions import db
 from models import NotifyChannel, NotifyTemplate
+from .templating import render_fund_table
+from .channel_config import ChannelConfigStore
 from .sendNotify import (
     send_notify,
     get_all_channels,
     CHANNEL_NAMES,
-    cfg as notify_cfg,
+    cfg as env_channel_cfg,
 )
 
 logger = logging.getLogger(__name__)
@@ -23,62 +28,17 @@ class NotificationService:
     统一通知服务。
 
     负责：
-    1. 从 DB 加载渠道配置（运行时覆盖 sendNotify 的 env 配置）
+    1. 从 DB 加载渠道配置快照（覆盖 sendNotify 的 env 配置，显式传给各渠道）
     2. 应用通知模板
     3. 触发多渠道发送
     """
 
     def __init__(self):
-        pass
-
-    def _load_channel_config_to_notify(self, channel_id: str, config: dict) -> None:
-        """将 DB 配置映射到 sendNotify 的 ChannelConfig"""
-        mapping = {
-            "email": {
-                "smtp_server": config.get("smtp_server"),
-                "smtp_port": config.get("smtp_port", 587),
-                "smtp_username": config.get("username") or config.get("smtp_username"),
-                "smtp_password": config.get("password") or config.get("smtp_password"),
-                "smtp_sender": config.get("sender_email") or config.get("smtp_username"),
-                "smtp_use_ssl": config.get("use_ssl", True),
-            },
-            "dingtalk": {
-                "dingtalk_token": config.get("token"),
-                "dingtalk_secret": config.get("secret"),
-            },
-            "feishu": {
-                "feishu_token": config.get("token"),
-                "feishu_secret": config.get("secret"),
-            },
-            "wecom": {
-                "wecom_corp_id": config.get("corp_id"),
-                "wecom_agent_id": config.get("agent_id"),
-                "wecom_corp_secret": config.get("corp_secret"),
-            },
-            "telegram": {
-                "telegram_token": config.get("token"),
-                "telegram_chat_id": config.get("chat_id"),
-            },
-            "pushplus": {
-                "pushplus_token": config.get("token"),
-            },
-            "serverchan": {
-                "serverchan_sckey": config.get("sckey"),
-            },
-            "bark": {
-                "bark_key": config.get("key"),
-            },
-            "igot": {
-                "igot_key": config.get("key"),
-            },
-            "webhook": {
-                "custom_webhook": config.get("webhook_url"),
-            },
-        }
-        if channel_id in mapping:
-            for key, value in mapping[channel_id].items():
-                if value:
-                    setattr(notify_cfg, key, value)
+        self.channel_configs = ChannelConfigStore(env_channel_cfg)
+
+    def invalidate_channel_config(self) -> None:
+        """渠道配置已修改，下次发送时重新加载快照"""
+        self.channel_configs.invalidate()
 
     def _get_enabled_channels(self) -> list[str]:
         """获取所有已启用的渠道 ID 列表"""
@@ -114,36 +74,8 @@ class NotificationService:
         premium_min = conditions.get("premium_min", "?")
         status_filter = conditions.get("status_filter", "全部")
 
-        # 渲染表格
-        if show_changes:
-            rows = [
-                "| 市场 | 代码 | 名称 | 溢价率 | 变化 | 状态 |",
-                "|------|------|------|--------|------|------|"
-            ]
-            for f in funds:
-                change = f.get("change")
-                change_icon = ""
-                change_str = ""
-                if change is not None:
-                    if change > 0:
-                        change_icon = "🔺"
-                    elif change < 0:
-                        change_icon = "🔻"
-                    change_str = f"{change_icon}{change:+.2f}%"
-                premium = f.get("premium_today") or f.get("premium")
-                premium_str = f"{premium:.2f}%" if premium is not None else "N/A"
-                rows.append(
-                    f"|{f.get('source', '')}|{f.get('fund_code', '')}|"
-                    f"{f.get('fund_name', '')}|{premium_str}|"
-                    f"{change_str}|{f.get('status', '')}|"
-                )
-            table_md = "\n".join(rows)
-        else:
-            table_md = "\n".join([
-                f"- **{f.get('fund_name')}** ({f.get('fund_code')}) "
-                f"溢价率 {f.get('premium', 'N/A')}%，状态：{f.get('status', '')}"
-                for f in funds
-            ])
+        # 渲染表格（每份报告一次，所有渠道共用）
+        table_md = render_fund_table(funds, show_changes=show_changes)
 
         variables = {
             "date": today,
@@ -175,6 +107,7 @@ class NotificationService:
             content=content,
             channels=self._get_enabled_channels(),
             recipients=recipients,
+            kind="alert",
         )
 
     def send_test(
@@ -189,8 +122,7 @@ class NotificationService:
         if not channel_model:
             return {"error": f"未找到渠道: {channel}"}
 
-        # 加载该渠道配置
-        self._load_channel_config_to_notify(channel, channel_model.get_config())
+        conf = self.channel_configs.current()
 
         test_content = (
             f"这是一条来自 QDII 基金监控系统的测试消息。\n"
@@ -206,9 +138,9 @@ class NotificationService:
                 return {"error": f"未知渠道: {channel}"}
 
             if channel == "email":
-                ok = handler(f"QDII 测试消息", test_content, recipients or [])
+                ok = handler(f"QDII 测试消息", test_content, recipients or [], conf=conf)
             else:
-                ok = handler(f"QDII 测试消息", test_content)
+                ok = handler(f"QDII 测试消息", test_content, conf=conf)
 
             if ok:
                 return {"success": True, "message": f"{CHANNEL_NAMES.get(channel)} 测试消息发送成功"}
@@ -223,30 +155,97 @@ class NotificationService:
         content: str,
         channels: list[str],
         recipients: list[str] = None,
+        kind: str = "report",
+        idempotency_key: str = None,
     ) -> dict:
-        """内部发送逻辑"""
-        # 为每个渠道加载配置
-        for ch in channels:
-            ch_model = NotifyChannel.get_by_channel(ch)
-            if ch_model:
-                self._load_channel_config_to_notify(ch, ch_model.get_config())
+        """
+        发送入口：启用发件箱时只入队，由后台投递器异步发送；否则同步发送。
 
+        幂等键默认由内容、渠道、收件人与当前分钟生成，
+        同一分钟内重复提交的同一通知只会入队一次。
+        """
+        if not config.notify_cfg.OUTBOX_ENABLED or not channels:
+            return self.deliver(title, content, channels, recipients)
+
+        from models import NotifyOutbox
+        from .outbox import outbox_dispatcher
+
+        if idempotency_key is None:
+            idempotency_key = self._default_idempotency_key(
+                kind, title, content, channels, recipients
+            )
+        try:
+            item, created = NotifyOutbox.enqueue(
+                idempotency_key=idempotency_key,
+                title=title,
+                content=content,
+                channels=channels,
+                recipients=recipients,
+                kind=kind,
+            )
+        except Exception as e:
+            logger.error(f"通知入队失败，改为同步发送: {e}")
+            return self.deliver(title, content, channels, recipients)
+
+        if created:
+            outbox_dispatcher.wake()
+            msg = f"已加入发件箱 #{item.id}，等待投递"
+        else:
+            msg = f"重复通知，已在发件箱 #{item.id}（{item.status}）"
+        logger.info(f"通知{msg}")
+        return {"queued": True, "outbox_id": item.id, "message": msg}
+
+    @staticmethod
+    def _default_idempotency_key(
+        kind: str,
+        title: str,
+        content: str,
+        channels: list[str],
+        recipients: list[str] = None,
+    ) -> str:
+        digest = hashlib.sha256(
+            json.dumps(
+                [kind, title, content, sorted(channels), sorted(recipients or [])],
+                ensure_ascii=False,
+            ).encode("utf-8")
+        ).hexdigest()[:32]
+        return f"{kind}:{datetime.now():%Y%m%d%H%M}:{digest}"
+
+    def deliver(
+        self,
+        title: str,
+        content: str,
+        channels: list[str],
+        recipients: list[str] = None,
+    ) -> dict:
+        """同步发送到各渠道（发件箱投递器与未启用发件箱时使用）"""
         try:
             result = send_notify(
                 title=title,
                 content=content,
                 channels=channels,
                 recipients=recipients,
+                conf=self.channel_configs.current(),
             )
             success_names = [CHANNEL_NAMES.get(c, c) for c in result["success"]]
             failed_names = [CHANNEL_NAMES.get(c, c) for c in result["failed"]]
             msg = f"成功: {', '.join(success_names)}" if success_names else ""
             if failed_names:
                 msg += f"；失败: {', '.join(failed_names)}"
-            logger.info(f"通知发送结果: {msg}")
+            timeout_names = [CHANNEL_NAMES.get(c, c) for c in result["timeout"]]
+            if timeout_names:
+                msg += f"；超时（结果未知）: {', '.join(timeout_names)}"
+            deferred_names = [CHANNEL_NAMES.get(c, c) for c in result["deferred"]]
+            if deferred_names:
+                msg += f"；限流合并发送: {', '.join(deferred_names)}"
+            latency = ", ".join(f"{c}={t:.2f}s" for c, t in result["latency"].items())
+            logger.info(f"通知发送结果: {msg}（耗时 {latency}）")
             return {
                 "success": result["success"],
                 "failed": result["failed"],
+                "timeout": result["timeout"],
+                "deferred": result["deferred"],
+                "latency": result["latency"],
                 "message": msg,
             }
         except Exception as e:
@@ -0,0 +1,209 @@
+"""
+通知发件箱投递器
+后台线程轮询 notify_outbox 表，领取到期记录并调用各渠道发送。
+
+- 入队后立即唤醒本进程投递器，正常情况下无需等待轮询间隔
+- 失败渠道按指数退避重试（带 ±20% 抖动），只重试失败的渠道；
+  超时渠道结果未知（可能已送达），只记录不重试，避免重复发送
+- 超过最大次数转为死信（status=dead），可通过 API 手动重投
+- 每个 worker 都运行投递器，但只有持有数据库租约 notify_outbox 的 worker 实际投递：
+  渠道限流（进程内令牌桶）因此对全部 worker 生效，不会按 worker 数放大配额。
+  其他 worker 入队后由主投递器在轮询间隔内取走；主投递器崩溃后租约过期即由其他 worker 接管
+- 领取是原子的，租约交接期间同一条记录也只会被一个 worker 投递
+- 限流合并的渠道交给汇总队列即视为已投递；汇总发送失败或进程退出时
+  汇总消息作为新记录（kind=digest）重新入队，走同样的重试与死信流程
+"""
+import atexit
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 投递主节点租约名称
+OUTBOX_LEASE = "notify_outbox"
+
+
+def backoff_seconds(attempts: int) -> float:
+    """第 attempts 次失败后的重试间隔：base * 2^(attempts-1)，不超过上限，带抖动"""
+    cfg = config.notify_cfg
+    delay = min(cfg.OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), cfg.OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class OutboxDispatcher:
+    """发件箱后台投递器（每进程一个线程）"""
+
+    def __init__(self):
+        self.app = None
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    # ──────────────────────────────────────────
+    # 生命周期
+    # ──────────────────────────────────────────
+
+    def start(self, app) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.app = app
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="notify-outbox", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info("通知发件箱投递器已启动")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self.app is not None:
+            from .sendNotify import throttle
+
+            drained = throttle.drain()
+            if drained:
+                logger.info(f"进程退出，{drained} 条待发汇总已写回发件箱")
+        if self.is_leader and self.app is not None:
+            from models import Lease
+
+            try:
+                with self.app.app_context():
+                    Lease.release(OUTBOX_LEASE, self.holder_id)
+            except Exception as e:
+                logger.warning(f"释放发件箱租约失败: {e}")
+            self.is_leader = False
+
+    def wake(self) -> None:
+        """有新记录入队，立即投递"""
+        self._wake.set()
+
+    def requeue(self, channel: str, title: str, content: str, recipients: list) -> bool:
+        """将未能发送的限流汇总消息写入发件箱（投递器未启动时返回 False）"""
+        if self.app is None:
+            return False
+
+        from models import NotifyOutbox
+
+        with self.app.app_context():
+            item, _ = NotifyOutbox.enqueue(
+                idempotency_key=f"digest:{channel}:{uuid.uuid4().hex}",
+                title=title,
+                content=content,
+                channels=[channel],
+                recipients=recipients,
+                kind="digest",
+            )
+            logger.info(f"渠道 {channel} 汇总消息已写入发件箱 #{item.id}")
+        self.wake()
+        return True
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ──────────────────────────────────────────
+    # 投递
+    # ──────────────────────────────────────────
+
+    def _loop(self) -> None:
+        cfg = config.notify_cfg
+        while not self._stop.is_set():
+            handled = 0
+            try:
+                with self.app.app_context():
+                    if self._renew_lease():
+                        handled = self.dispatch_due()
+            except Exception as e:
+                logger.error(f"发件箱投递异常: {e}", exc_info=True)
+
+            # 一批领满说明可能还有积压，直接继续
+            if handled >= cfg.OUTBOX_BATCH_SIZE:
+                continue
+            self._wake.wait(cfg.OUTBOX_POLL_INTERVAL)
+            self._wake.clear()
+
+    def _renew_lease(self) -> bool:
+        """抢占或续期投递租约，返回当前 worker 是否为投递主节点"""
+        from models import Lease
+
+        try:
+            leader = Lease.acquire(OUTBOX_LEASE, self.holder_id, config.notify_cfg.OUTBOX_LEASE_TTL)
+        except Exception as e:
+            logger.warning(f"发件箱租约续期失败: {e}")
+            leader = False
+        if leader != self.is_leader:
+            if leader:
+                logger.info(f"当前 worker 成为发件箱投递主节点（{self.holder_id}）")
+            else:
+                logger.info(f"发件箱由其他 worker 投递（{self.holder_id} 待命）")
+            self.is_leader = leader
+        return leader
+
+    def dispatch_due(self) -> int:
+        """领取并投递一批到期记录（需在 app context 中调用），返回处理条数"""
+        from models import NotifyOutbox
+
+        cfg = config.notify_cfg
+        items = NotifyOutbox.claim_due(cfg.OUTBOX_BATCH_SIZE, cfg.OUTBOX_CLAIM_TIMEOUT)
+        for i, item in enumerate(items):
+            # 一批可能耗时较长（每条最长 NOTIFY_TOTAL_TIMEOUT），逐条续租；
+            # 已领取的记录继续投递完，失去租约后不再领取新批次
+            if i:
+                self._renew_lease()
+            self._deliver(item)
+        return len(items)
+
+    def _deliver(self, item) -> None:
+        from .notification_service import notification_service
+
+        cfg = config.notify_cfg
+        channels = item.get_channels()
+        try:
+            result = notification_service.deliver(
+                title=item.title,
+                content=item.content,
+                channels=channels,
+                recipients=item.get_recipients(),
+            )
+        except Exception as e:
+            result = {"success": [], "failed": channels, "error": str(e)}
+
+        failed = result.get("failed", channels if "error" in result else [])
+        # 超时渠道的消息可能已送达，重试会重复发送：记为结果未知，不自动重试
+        unknown = result.get("timeout", [])
+        error = None
+        if failed:
+            error = result.get("error") or "失败渠道: " + ", ".join(failed)
+
+        # 限流合并的渠道已交给汇总队列，视为已投递（汇总失败时会重新入队）
+        item.record_attempt(
+            succeeded=result.get("success", []) + result.get("deferred", []),
+            failed=failed,
+            unknown=unknown,
+            error=error,
+            max_attempts=cfg.OUTBOX_MAX_ATTEMPTS,
+            backoff=backoff_seconds(item.attempts + 1),
+        )
+
+        if item.status == "sent":
+            logger.info(f"发件箱 #{item.id} 投递完成（第 {item.attempts} 次）")
+        elif item.status == "dead":
+            logger.error(f"发件箱 #{item.id} 已重试 {item.attempts} 次仍失败，转入死信: {error}")
+        else:
+            logger.warning(
+                f"发件箱 #{item.id} 第 {item.attempts} 次投递部分失败，"
+                f"{item.next_attempt_at:%H:%M:%S} 重试: {error}"
+            )
+
+
+# 全局单例
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,163 @@
+"""
+渠道消息体预渲染
+同一份报告发往多个渠道时，各渠道需要的格式（钉钉 Markdown、飞书 JSON、
+邮件 HTML/MIME 等）只构建一次，按报告哈希缓存，
+发件箱重试与多收件人邮件直接复用已编码的字节。
+
+只缓存与渠道配置无关的部分；token、chat_id、agentid、签名时间戳等
+仍由各渠道在发送时填入。
+"""
+import hashlib
+import json
+import threading
+import urllib.parse
+from collections import OrderedDict
+from email.mime.text import MIMEText
+from typing import Any, Callable
+
+# JSON 请求头（消息体为预编码的 UTF-8 字节）
+JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+
+
+def _json_bytes(obj: dict) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# ──────────────────────────────────────────
+# 各渠道消息体构建（纯函数，不读取渠道配置）
+# ──────────────────────────────────────────
+
+def build_dingtalk(title: str, content: str) -> bytes:
+    """钉钉 Markdown 消息（换行需两个空格 + 换行）"""
+    return _json_bytes({
+        "msgtype": "markdown",
+        "markdown": {
+            "title": title,
+            "text": f"**{title}**\n\n{content.replace(chr(10), '  ' + chr(10))}"
+        }
+    })
+
+
+def build_feishu(title: str, content: str) -> bytes:
+    """飞书自定义机器人文本消息"""
+    return _json_bytes({
+        "msg_type": "text",
+        "content": {"text": f"{title}\n{content}"}
+    })
+
+
+def build_wecom(title: str, content: str) -> dict:
+    """企业微信 textcard（agentid 发送时填入）"""
+    return {
+        "touser": "@all",
+        "msgtype": "textcard",
+        "textcard": {
+            "title": title,
+            "description": content,
+            "url": "https://github.com"
+        }
+    }
+
+
+def build_telegram(title: str, content: str) -> str:
+    return f"*{title}*\n\n{content}"
+
+
+def build_pushplus(title: str, content: str) -> dict:
+    """PushPlus 表单字段（token 发送时填入）"""
+    return {"title": title, "content": content, "template": "html"}
+
+
+def build_bark(title: str, content: str) -> str:
+    """Bark URL 路径部分 /标题/内容"""
+    return f"/{urllib.parse.quote(title)}/{urllib.parse.quote(content)}"
+
+
+def build_email(title: str, content: str) -> MIMEText:
+    """
+    邮件 HTML 正文部分（已完成 UTF-8 编码）。
+
+    同一正文对象可附加到多封邮件，发信时各自序列化，不会被修改。
+    """
+    html_content = f"""
+    <!DOCTYPE html>
+    <html><head><meta charset="utf-8"></head>
+    <body style="font-family: Arial, sans-serif; color: #333;">
+    {content}
+    <hr><p style="color:#888;font-size:12px;">来自 QDII 基金监控系统</p>
+    </body></html>
+    """
+    return MIMEText(html_content, "html", "utf-8")
+
+
+PAYLOAD_BUILDERS: dict[str, Callable[[str, str], Any]] = {
+    "dingtalk": build_dingtalk,
+    "feishu": build_feishu,
+    "wecom": build_wecom,
+    "telegram": build_telegram,
+    "pushplus": build_pushplus,
+    "bark": build_bark,
+    "email": build_email,
+}
+
+
+# ──────────────────────────────────────────
+# 按报告缓存
+# ──────────────────────────────────────────
+
+def report_key(title: str, content: str) -> str:
+    """报告哈希：标题 + 内容"""
+    h = hashlib.sha256()
+    h.update(title.encode("utf-8"))
+    h.update(b"\0")
+    h.update(content.encode("utf-8"))
+    return h.hexdigest()
+
+
+class PayloadCache:
+    """
+    报告哈希 → {渠道: 消息体} 的 LRU 缓存。
+
+    构建只涉及字符串处理，受 GIL 限制多线程并不会更快，
+    因此在发送前一次性串行构建，之后各渠道的发送线程只读取结果。
+    """
+
+    def __init__(self, max_reports: int = 32):
+        self.max_reports = max_reports
+        self._lock = threading.Lock()
+        self._reports: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    def prepare(self, title: str, content: str, channels: list[str]) -> dict[str, Any]:
+        """构建（或复用）一份报告在各渠道的消息体"""
+        key = report_key(title, content)
+        with self._lock:
+            payloads = self._reports.get(key)
+            if payloads is None:
+                payloads = self._reports[key] = {}
+                while len(self._reports) > self.max_reports:
+                    self._reports.popitem(last=False)
+            else:
+                self._reports.move_to_end(key)
+            missing = [
+                ch for ch in channels
+                if ch in PAYLOAD_BUILDERS and ch not in payloads
+            ]
+
+        # 构建放在锁外，结果写回（同一渠道重复构建时结果相同，后写覆盖无妨）
+        built = {ch: PAYLOAD_BUILDERS[ch](title, content) for ch in missing}
+        if built:
+            with self._lock:
+                payloads.update(built)
+        return payloads
+
+    def get(self, channel: str, title: str, content: str) -> Any:
+        """取单个渠道的消息体，未缓存时现场构建"""
+        return self.prepare(title, content, [channel]).get(channel)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reports.clear()
+
+
+# 全局单例
+payload_cache = PayloadCache()
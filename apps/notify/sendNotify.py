@@ -9,62 +9,43 @@ sendNotify - 多渠道通知模块
     send_notify('QDII 基金报告', '找到 5 只高溢价基金')
     notify('钉钉', '预警', '溢价率超过 5%')
 """
-import os
 import re
 import json
+import time
 import logging
-import smtplib
+import threading
 import urllib.parse
-from email.mime.text import MIMEText
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
 
 import requests
 
+import config
+from .channel_config import ChannelConfig
+from .payloads import JSON_HEADERS, payload_cache
+from .smtp_pool import SMTPSettings, smtp_pool
+from .throttle import ChannelThrottle, parse_rate_limits
+from .token_cache import token_cache
+
 logger = logging.getLogger(__name__)
 
 # ──────────────────────────────────────────
-# 渠道配置（从环境变量读取，可被运行时配置覆盖）
+# 渠道配置（环境变量默认值；DB 配置由 NotificationService 合并为快照后显式传入）
 # ──────────────────────────────────────────
 
-class ChannelConfig:
-    """通知渠道配置容器"""
-    def __init__(self):
-        self.dingtalk_token = os.getenv("DINGTALK_TOKEN", "")
-        self.dingtalk_secret = os.getenv("DINGTALK_SECRET", "")
-        self.feishu_token = os.getenv("FEISHU_TOKEN", "")
-        self.feishu_secret = os.getenv("FEISHU_SECRET", "")
-        self.wecom_corp_id = os.getenv("WECOM_CORP_ID", "")
-        self.wecom_agent_id = os.getenv("WECOM_AGENT_ID", "")
-        self.wecom_corp_secret = os.getenv("WECOM_CORP_SECRET", "")
-        self.telegram_token = os.getenv("TELEGRAM_TOKEN", "")
-        self.telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID", "")
-        self.pushplus_token = os.getenv("PUSHPLUS_TOKEN", "")
-        self.serverchan_sckey = os.getenv("SERVERCHAN_SCKEY", "")
-        self.bark_key = os.getenv("BARK_KEY", "")
-        self.igot_key = os.getenv("IGOT_KEY", "")
-        self.smtp_server = os.getenv("SMTP_SERVER", "")
-        self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        self.smtp_username = os.getenv("SMTP_USERNAME", "")
-        self.smtp_password = os.getenv("SMTP_PASSWORD", "")
-        self.smtp_sender = os.getenv("MAIL_SENDER", "")
-        self.smtp_use_ssl = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
-        self.custom_webhook = os.getenv("CUSTOM_WEBHOOK", "")
-
-    def update(self, **kwargs):
-        """运行时更新配置"""
-        for key, value in kwargs.items():
-            if hasattr(self, key) and value:
-                setattr(self, key, value)
-
-
-cfg = ChannelConfig()
+cfg = ChannelConfig.from_env()
 
 
 # ──────────────────────────────────────────
 # 通用工具
 # ──────────────────────────────────────────
 
+def _channel_timeout() -> float:
+    """单个渠道的网络超时（秒），与并发发送的单渠道截止时间一致"""
+    return config.notify_cfg.CHANNEL_TIMEOUT
+
+
 def is_empty(*values) -> bool:
     """检查是否有空值"""
     return all(bool(v) for v in values)
@@ -84,7 +65,7 @@ def http_post(url: str, data: dict = None,
 # 渠道 1：钉钉机器人
 # ──────────────────────────────────────────
 
-def send_dingtalk(title: str, content: str) -> bool:
+def send_dingtalk(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送钉钉机器人通知。
 
@@ -92,8 +73,9 @@ def send_dingtalk(title: str, content: str) -> bool:
     1. 环境变量：DINGTALK_TOKEN（安全模式需同时设置 DINGTALK_SECRET）
     2. 运行时：notify('钉钉', title, content, dingtalk_token='xxx')
     """
-    token = cfg.dingtalk_token
-    secret = cfg.dingtalk_secret
+    conf = conf or cfg
+    token = conf.dingtalk_token
+    secret = conf.dingtalk_secret
 
     if not token:
         logger.warning("钉钉 token 未配置")
@@ -101,8 +83,7 @@ def send_dingtalk(title: str, content: str) -> bool:
 
     url = f"https://oapi.dingtalk.com/robot/send?access_token={token}"
 
-    # 安全模式：签名校验
-    headers = {"Content-Type": "application/json"}
+    # 安全模式：签名校验（时间戳在 URL 中，消息体可复用）
     if secret:
         import time, hmac, hashlib, base64
         timestamp = str(int(time.time() * 1000))
@@ -112,16 +93,10 @@ def send_dingtalk(title: str, content: str) -> bool:
         ).decode()
         url += f"&timestamp={timestamp}&sign={urllib.parse.quote(sign)}"
 
-    payload = {
-        "msgtype": "markdown",
-        "markdown": {
-            "title": title,
-            "text": f"**{title}**\n\n{content.replace(chr(10), '  ' + chr(10))}"
-        }
-    }
+    body = payload_cache.get("dingtalk", title, content)
 
     try:
-        r = requests.post(url, json=payload, headers=headers, timeout=10)
+        r = requests.post(url, data=body, headers=JSON_HEADERS, timeout=_channel_timeout())
         result = r.json()
         if result.get("errcode") == 0:
             logger.info(f"钉钉通知发送成功: {title}")
@@ -138,49 +113,28 @@ def send_dingtalk(title: str, content: str) -> bool:
 # 渠道 2：飞书机器人
 # ──────────────────────────────────────────
 
-def send_feishu(title: str, content: str) -> bool:
+def send_feishu(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送飞书机器人通知。
 
     配置：FEISHU_TOKEN（机器人 Webhook 地址中的 token 部分）
          FEISHU_SECRET（可选，加签密钥）
     """
-    token = cfg.feishu_token
+    conf = conf or cfg
+    token = conf.feishu_token
     if not token:
         logger.warning("飞书 token 未配置")
         return False
 
-    # 获取 tenant_access_token
-    url = f"https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-    try:
-        r = requests.post(url, json={"app_id": token, "app_secret": cfg.feishu_secret or ""}, timeout=10)
-        resp = r.json()
-        tenant_token = resp.get("tenant_access_token", "")
-    except Exception as e:
-        logger.error(f"飞书认证失败: {e}")
-        return False
-
-    headers = {"Authorization": f"Bearer {tenant_token}", "Content-Type": "application/json"}
-    payload = {
-        "msg_type": "interactive",
-        "card": {
-            "header": {
-                "title": {"tag": "plain_text", "content": title},
-                "template": "purple"
-            },
-            "elements": [
-                {"tag": "div", "text": {"tag": "lark_md", "content": content}}
-            ]
-        }
-    }
-
-    # 直接发卡片消息（简化版，不依赖复杂 webhook）
+    # 自定义机器人 Webhook 以 URL 中的 token 鉴权，无需再换取 tenant_access_token
     try:
         webhook_url = f"https://open.feishu.cn/open-apis/bot/v2/hook/{token}"
-        r2 = requests.post(webhook_url, json={
-            "msg_type": "text",
-            "content": {"text": f"{title}\n{content}"}
-        }, timeout=10)
+        r2 = requests.post(
+            webhook_url,
+            data=payload_cache.get("feishu", title, content),
+            headers=JSON_HEADERS,
+            timeout=_channel_timeout(),
+        )
         result = r2.json()
         if result.get("code") == 0 or result.get("StatusCode") == 0:
             logger.info(f"飞书通知发送成功: {title}")
@@ -196,84 +150,93 @@ def send_feishu(title: str, content: str) -> bool:
 # 渠道 3：企业微信
 # ──────────────────────────────────────────
 
-def send_wecom(title: str, content: str) -> bool:
+# access_token 无效 / 已过期 / 凭证无效
+_WECOM_TOKEN_ERRORS = {40001, 40014, 42001}
+
+
+def send_wecom(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送企业微信应用通知。
 
     配置：WECOM_CORP_ID, WECOM_AGENT_ID, WECOM_CORP_SECRET
     """
-    corp_id = cfg.wecom_corp_id
-    agent_id = cfg.wecom_agent_id
-    corp_secret = cfg.wecom_corp_secret
+    conf = conf or cfg
+    corp_id = conf.wecom_corp_id
+    agent_id = conf.wecom_agent_id
+    corp_secret = conf.wecom_corp_secret
 
     if not all([corp_id, agent_id, corp_secret]):
         logger.warning("企业微信配置不完整")
         return False
 
-    # 获取 access_token
-    try:
+    # 发送消息
+    payload = {**payload_cache.get("wecom", title, content), "agentid": int(agent_id)}
+
+    token_key = ("wecom", corp_id, corp_secret)
+
+    def fetch_token() -> tuple[str, int]:
         r = requests.get(
             "https://qyapi.weixin.qq.com/cgi-bin/gettoken",
             params={"corpid": corp_id, "corpsecret": corp_secret},
-            timeout=10
+            timeout=_channel_timeout()
         )
         token_data = r.json()
         access_token = token_data.get("access_token")
         if not access_token:
-            logger.error(f"企业微信获取 token 失败: {token_data}")
+            raise RuntimeError(f"企业微信获取 token 失败: {token_data}")
+        return access_token, token_data.get("expires_in", 7200)
+
+    # access_token 缓存复用；服务端判定失效时作废并用新 token 重试一次
+    for attempt in (1, 2):
+        try:
+            access_token = token_cache.get(token_key, fetch_token)
+        except Exception as e:
+            logger.error(f"企业微信认证异常: {e}")
             return False
-    except Exception as e:
-        logger.error(f"企业微信认证异常: {e}")
-        return False
 
-    # 发送消息
-    payload = {
-        "touser": "@all",
-        "msgtype": "textcard",
-        "agentid": int(agent_id),
-        "textcard": {
-            "title": title,
-            "description": content,
-            "url": "https://github.com"
-        }
-    }
+        try:
+            r2 = requests.post(
+                f"https://qyapi.weixin.qq.com/cgi-bin/message/send",
+                params={"access_token": access_token},
+                json=payload,
+                timeout=_channel_timeout()
+            )
+            result = r2.json()
+        except Exception as e:
+            logger.error(f"企业微信通知异常: {e}")
+            return False
 
-    try:
-        r2 = requests.post(
-            f"https://qyapi.weixin.qq.com/cgi-bin/message/send",
-            params={"access_token": access_token},
-            json=payload,
-            timeout=10
-        )
-        result = r2.json()
         if result.get("errcode") == 0:
             logger.info(f"企业微信通知发送成功: {title}")
             return True
+        if result.get("errcode") in _WECOM_TOKEN_ERRORS and attempt == 1:
+            logger.info(f"企业微信 access_token 已失效（{result.get('errcode')}），刷新后重试")
+            token_cache.invalidate(token_key, access_token)
+            continue
         logger.error(f"企业微信通知失败: {result}")
         return False
-    except Exception as e:
-        logger.error(f"企业微信通知异常: {e}")
-        return False
+    return False
 
 
 # ──────────────────────────────────────────
 # 渠道 4：Telegram
 # ──────────────────────────────────────────
 
-def send_telegram(title: str, content: str) -> bool:
+def send_telegram(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送 Telegram Bot 通知。
 
     配置：TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
     """
-    token = cfg.telegram_token
-    chat_id = cfg.telegram_chat_id
+    conf = conf or cfg
+    token = conf.telegram_token
+    chat_id = conf.telegram_chat_id
 
     if not all([token, chat_id]):
         logger.warning("Telegram 配置不完整")
         return False
 
-    text = f"*{title}*\n\n{content}"
+    text = payload_cache.get("telegram", title, content)
     url = f"https://api.telegram.org/bot{token}/sendMessage"
 
     try:
@@ -281,7 +244,7 @@ def send_telegram(title: str, content: str) -> bool:
             "chat_id": chat_id,
             "text": text,
             "parse_mode": "Markdown"
-        }, timeout=10)
+        }, timeout=_channel_timeout())
         result = r.json()
         if result.get("ok"):
             logger.info(f"Telegram 通知发送成功: {title}")
@@ -297,13 +260,14 @@ def send_telegram(title: str, content: str) -> bool:
 # 渠道 5：PushPlus（微信推送）
 # ──────────────────────────────────────────
 
-def send_pushplus(title: str, content: str) -> bool:
+def send_pushplus(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送 PushPlus 微信推送。
 
     配置：PUSHPLUS_TOKEN
     """
-    token = cfg.pushplus_token
+    conf = conf or cfg
+    token = conf.pushplus_token
     if not token:
         logger.warning("PushPlus token 未配置")
         return False
@@ -311,13 +275,8 @@ def send_pushplus(title: str, content: str) -> bool:
     try:
         r = requests.post(
             "http://www.pushplus.plus/send",
-            data={
-                "token": token,
-                "title": title,
-                "content": content,
-                "template": "html"
-            },
-            timeout=10
+            data={"token": token, **payload_cache.get("pushplus", title, content)},
+            timeout=_channel_timeout()
         )
         result = r.json()
         if result.get("code") == 200:
@@ -334,13 +293,14 @@ def send_pushplus(title: str, content: str) -> bool:
 # 渠道 6：Server酱（微信推送）
 # ──────────────────────────────────────────
 
-def send_serverchan(title: str, content: str) -> bool:
+def send_serverchan(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送 Server酱 微信推送。
 
     配置：SERVERCHAN_SCKEY（GitHub SCKEY 或 Turbo SCKEY）
     """
-    sckey = cfg.serverchan_sckey
+    conf = conf or cfg
+    sckey = conf.serverchan_sckey
     if not sckey:
         logger.warning("ServerChan SCKEY 未配置")
         return False
@@ -354,7 +314,7 @@ def send_serverchan(title: str, content: str) -> bool:
         data = {"text": title, "desp": content}
 
     try:
-        r = requests.post(url, data=data, timeout=10)
+        r = requests.post(url, data=data, timeout=_channel_timeout())
         result = r.json()
         if result.get("code") == 0 or result.get("errno") == 0:
             logger.info(f"ServerChan 通知发送成功: {title}")
@@ -370,13 +330,14 @@ def send_serverchan(title: str, content: str) -> bool:
 # 渠道 7：Bark（iOS 推送）
 # ──────────────────────────────────────────
 
-def send_bark(title: str, content: str) -> bool:
+def send_bark(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送 Bark iOS 推送。
 
     配置：BARK_KEY（Server URL，如 https://api.day.app/YOUR_KEY）
     """
-    bark_key = cfg.bark_key
+    conf = conf or cfg
+    bark_key = conf.bark_key
     if not bark_key:
         logger.warning("Bark key 未配置")
         return False
@@ -385,10 +346,10 @@ def send_bark(title: str, content: str) -> bool:
     if not bark_key.startswith("http"):
         bark_key = f"https://api.day.app/{bark_key}"
 
-    url = f"{bark_key}/{urllib.parse.quote(title)}/{urllib.parse.quote(content)}"
+    url = bark_key.rstrip("/") + payload_cache.get("bark", title, content)
 
     try:
-        r = requests.get(url, timeout=10)
+        r = requests.get(url, timeout=_channel_timeout())
         result = r.json()
         if result.get("code") == 200:
             logger.info(f"Bark 通知发送成功: {title}")
@@ -404,13 +365,14 @@ def send_bark(title: str, content: str) -> bool:
 # 渠道 8：iGot
 # ──────────────────────────────────────────
 
-def send_igot(title: str, content: str) -> bool:
+def send_igot(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送 iGot 推送。
 
     配置：IGOT_KEY
     """
-    key = cfg.igot_key
+    conf = conf or cfg
+    key = conf.igot_key
     if not key:
         logger.warning("iGot key 未配置")
         return False
@@ -423,7 +385,7 @@ def send_igot(title: str, content: str) -> bool:
                 "content": content,
                 "tokey": key
             },
-            timeout=10
+            timeout=_channel_timeout()
         )
         if r.status_code == 200:
             logger.info(f"iGot 通知发送成功: {title}")
@@ -439,45 +401,39 @@ def send_igot(title: str, content: str) -> bool:
 # 渠道 9：邮件 SMTP
 # ──────────────────────────────────────────
 
-def send_email(title: str, content: str, recipients: list = None) -> bool:
+def send_email(title: str, content: str, recipients: list = None,
+               conf: ChannelConfig = None) -> bool:
     """
     发送邮件通知。
 
     配置：SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
           MAIL_SENDER, SMTP_USE_SSL
     """
-    if not all([cfg.smtp_server, cfg.smtp_username, cfg.smtp_password]):
+    conf = conf or cfg
+    if not all([conf.smtp_server, conf.smtp_username, conf.smtp_password]):
         logger.warning("邮件 SMTP 配置不完整")
         return False
 
     if not recipients:
-        recipients = [cfg.smtp_username]
+        recipients = [conf.smtp_username]
 
     msg = MIMEMultipart()
-    msg["From"] = f"{cfg.smtp_username}"
+    msg["From"] = f"{conf.smtp_username}"
     msg["To"] = ", ".join(recipients)
     msg["Subject"] = title
 
-    # HTML 内容
-    html_content = f"""
-    <!DOCTYPE html>
-    <html><head><meta charset="utf-8"></head>
-    <body style="font-family: Arial, sans-serif; color: #333;">
-    {content}
-    <hr><p style="color:#888;font-size:12px;">来自 QDII 基金监控系统</p>
-    </body></html>
-    """
-    msg.attach(MIMEText(html_content, "html"))
+    # HTML 正文按报告缓存，重试与多次发送复用已编码的正文
+    msg.attach(payload_cache.get("email", title, content))
 
+    settings = SMTPSettings(
+        server=conf.smtp_server,
+        port=int(conf.smtp_port),
+        username=conf.smtp_username,
+        password=conf.smtp_password,
+        use_ssl=bool(conf.smtp_use_ssl),
+    )
     try:
-        if cfg.smtp_use_ssl:
-            server = smtplib.SMTP_SSL(cfg.smtp_server, cfg.smtp_port)
-        else:
-            server = smtplib.SMTP(cfg.smtp_server, cfg.smtp_port)
-            server.starttls()
-        server.login(cfg.smtp_username, cfg.smtp_password)
-        server.send_message(msg)
-        server.quit()
+        smtp_pool.send(settings, msg, timeout=_channel_timeout())
         logger.info(f"邮件发送成功: {title} -> {recipients}")
         return True
     except Exception as e:
@@ -489,13 +445,14 @@ def send_email(title: str, content: str, recipients: list = None) -> bool:
 # 渠道 10：自定义 Webhook
 # ──────────────────────────────────────────
 
-def send_webhook(title: str, content: str) -> bool:
+def send_webhook(title: str, content: str, conf: ChannelConfig = None) -> bool:
     """
     发送自定义 Webhook（POST JSON）。
 
     配置：CUSTOM_WEBHOOK（URL）
     """
-    webhook = cfg.custom_webhook
+    conf = conf or cfg
+    webhook = conf.custom_webhook
     if not webhook:
         logger.warning("自定义 Webhook 未配置")
         return False
@@ -507,7 +464,7 @@ def send_webhook(title: str, content: str) -> bool:
     }
 
     try:
-        r = requests.post(webhook, json=payload, timeout=10)
+        r = requests.post(webhook, json=payload, timeout=_channel_timeout())
         if r.status_code < 400:
             logger.info(f"Webhook 通知发送成功: {title}")
             return True
@@ -559,6 +516,7 @@ def send_notify(
     content: str,
     channels: list = None,
     recipients: list = None,
+    conf: ChannelConfig = None,
     **channel_overrides,
 ) -> dict:
     """
@@ -570,61 +528,166 @@ def send_notify(
         channels: 要发送的渠道列表，如 ["email", "dingtalk", "pushplus"]
                   若为 None，则发送给所有已配置的渠道
         recipients: 邮件收件人列表（仅 email 渠道使用）
-        **channel_overrides: 运行时覆盖渠道配置
+        conf: 渠道配置快照，默认为环境变量配置
+        **channel_overrides: 仅本次发送覆盖渠道配置（不影响全局配置）
                             如 dingtalk_token='xxx'
 
+    超出渠道每分钟配额（NOTIFY_RATE_LIMITS）的消息不立即发送，
+    并入该渠道的汇总消息，待配额恢复后合并发送，记入 deferred。
+
+    各渠道在有界线程池中并发发送：单渠道超过 NOTIFY_CHANNEL_TIMEOUT、
+    或整体超过 NOTIFY_TOTAL_TIMEOUT 仍未完成的渠道记为超时，不再等待。
+    超时渠道的发送线程仍在运行、消息可能已送达，结果未知：只记入 timeout，
+    不记入 failed，调用方不应自动重试（否则可能重复发送）。
+
     返回:
-        dict: {"success": ["email", "pushplus"], "failed": ["dingtalk"]}
+        dict: {
+            "success": ["email", "pushplus"],
+            "failed": ["dingtalk"],
+            "timeout": ["telegram"],          # 超时，结果未知（不在 failed 中）
+            "deferred": ["serverchan"],       # 限流，已并入汇总消息稍后发送
+            "latency": {"email": 1.234, ...}, # 各渠道耗时（秒）
+        }
     """
-    # 更新运行时配置
+    conf = conf or cfg
     if channel_overrides:
-        cfg.update(**channel_overrides)
+        conf = conf.merged(**channel_overrides)
 
     if channels is None:
         # 发送给所有已配置渠道
         channels = [
             name for name, handler in CHANNEL_HANDLERS.items()
-            if _is_channel_configured(name)
+            if _is_channel_configured(name, conf)
         ]
 
-    results = {"success": [], "failed": []}
+    results = {"success": [], "failed": [], "timeout": [], "deferred": [], "latency": {}}
+
+    # 渲染阶段：各渠道消息体在发送前一次性构建（已缓存的报告直接复用）
+    payload_cache.prepare(title, content, channels)
 
-    for channel in channels:
+    channel_timeout = _channel_timeout()
+    t0 = time.monotonic()
+    deadline = t0 + config.notify_cfg.TOTAL_TIMEOUT
+
+    # 各渠道实际开始执行的时刻（排队中的渠道只受整体截止时间约束）
+    started: dict[str, float] = {}
+    pending = {}
+    for channel in dict.fromkeys(channels):
         handler = CHANNEL_HANDLERS.get(channel)
         if not handler:
             logger.warning(f"未知渠道: {channel}")
             results["failed"].append(channel)
             continue
-
-        try:
-            if channel == "email":
-                ok = handler(title, content, recipients or [])
-            else:
-                ok = handler(title, content)
-            if ok:
-                results["success"].append(channel)
-            else:
-                results["failed"].append(channel)
-        except Exception as e:
-            logger.error(f"渠道 {channel} 发送异常: {e}")
-            results["failed"].append(channel)
+        # 超出渠道配额：并入汇总消息稍后发送，不丢弃
+        if not throttle.admit(channel, title, content, recipients, context=conf):
+            results["deferred"].append(channel)
+            continue
+        future = _get_executor().submit(
+            _call_channel, channel, handler, title, content, recipients, conf, started
+        )
+        pending[future] = channel
+
+    while pending:
+        now = time.monotonic()
+
+        # 超过单渠道或整体截止时间的渠道记为超时，不再等待
+        for future, channel in list(pending.items()):
+            start = started.get(channel)
+            if now >= deadline or (start is not None and now - start >= channel_timeout):
+                future.cancel()
+                del pending[future]
+                results["timeout"].append(channel)
+                results["latency"][channel] = round(now - (start or t0), 3)
+                logger.error(f"渠道 {channel} 发送超时（{now - (start or t0):.1f}s），结果未知")
+        if not pending:
+            break
+
+        waits = [deadline - now] + [
+            started[ch] + channel_timeout - now for ch in pending.values() if ch in started
+        ]
+        done, _ = wait(list(pending), timeout=max(min(waits), 0.01), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            channel = pending.pop(future)
+            try:
+                ok, elapsed = future.result()
+            except Exception as e:
+                logger.error(f"渠道 {channel} 发送异常: {e}")
+                ok, elapsed = False, time.monotonic() - started.get(channel, t0)
+            results["latency"][channel] = round(elapsed, 3)
+            results["success" if ok else "failed"].append(channel)
 
     return results
 
 
-def _is_channel_configured(channel: str) -> bool:
+# ──────────────────────────────────────────
+# 并发发送
+# ──────────────────────────────────────────
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """所有发送共用的有界线程池（懒创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.notify_cfg.MAX_WORKERS,
+                    thread_name_prefix="notify",
+                )
+    return _executor
+
+
+def _call_channel(channel, handler, title, content, recipients, conf, started) -> tuple[bool, float]:
+    """在线程池中执行单个渠道，返回 (是否成功, 耗时秒)"""
+    start = started[channel] = time.monotonic()
+    if channel == "email":
+        ok = handler(title, content, recipients or [], conf=conf)
+    else:
+        ok = handler(title, content, conf=conf)
+    return bool(ok), time.monotonic() - start
+
+
+def _send_digest(channel: str, title: str, content: str, recipients: list,
+                 conf: ChannelConfig = None) -> bool:
+    """发送限流汇总消息（使用最后一条被合并消息的配置快照）"""
+    handler = CHANNEL_HANDLERS[channel]
+    if channel == "email":
+        return handler(title, content, recipients or [], conf=conf)
+    return handler(title, content, conf=conf)
+
+
+def _requeue_digest(channel: str, title: str, content: str, recipients: list) -> bool:
+    """汇总消息发送失败或进程退出时重新写入发件箱（未启用发件箱时返回 False）"""
+    from .outbox import outbox_dispatcher
+
+    return outbox_dispatcher.requeue(channel, title, content, recipients)
+
+
+throttle = ChannelThrottle(
+    parse_rate_limits(config.notify_cfg.RATE_LIMITS),
+    sender=_send_digest,
+    fallback=_requeue_digest,
+)
+
+
+def _is_channel_configured(channel: str, conf: ChannelConfig = None) -> bool:
     """检查渠道是否已配置"""
+    conf = conf or cfg
     config_map = {
-        "dingtalk": cfg.dingtalk_token,
-        "feishu": cfg.feishu_token,
-        "wecom": cfg.wecom_corp_id,
-        "telegram": cfg.telegram_token,
-        "pushplus": cfg.pushplus_token,
-        "serverchan": cfg.serverchan_sckey,
-        "bark": cfg.bark_key,
-        "igot": cfg.igot_key,
-        "email": cfg.smtp_server,
-        "webhook": cfg.custom_webhook,
+        "dingtalk": conf.dingtalk_token,
+        "feishu": conf.feishu_token,
+        "wecom": conf.wecom_corp_id,
+        "telegram": conf.telegram_token,
+        "pushplus": conf.pushplus_token,
+        "serverchan": conf.serverchan_sckey,
+        "bark": conf.bark_key,
+        "igot": conf.igot_key,
+        "email": conf.smtp_server,
+        "webhook": conf.custom_webhook,
     }
     return bool(config_map.get(channel))
 
@@ -0,0 +1,213 @@
+"""
+SMTP 连接池 - 复用已认证的 SMTP 会话
+按 服务器/端口/账号/SSL 分组缓存已登录的连接，避免每封邮件重复 TLS 握手与 AUTH。
+
+- 发送完成后连接归还池中，空闲超过 idle_timeout 秒自动关闭
+- 取出连接时用 NOOP 探活，服务器已断开则重新连接登录
+- 发送中途断线（含 421）自动重连并重试一次
+"""
+import atexit
+import logging
+import smtplib
+import threading
+import time
+from email.message import Message
+from typing import NamedTuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPSettings(NamedTuple):
+    """SMTP 连接参数，同时作为连接池的分组键"""
+    server: str
+    port: int
+    username: str
+    password: str
+    use_ssl: bool = True
+
+    def __repr__(self) -> str:
+        # 避免密码出现在日志中
+        return f"SMTPSettings({self.username}@{self.server}:{self.port}, ssl={self.use_ssl})"
+
+
+class _Reconnect(Exception):
+    """连接级错误：丢弃当前连接，重连后重试"""
+
+
+class SMTPPool:
+    """
+    按 SMTPSettings 分组的 SMTP 连接池。
+
+    连接在发送期间由调用线程独占，发送完成后归还；
+    每组最多保留 max_idle 个空闲连接。
+    """
+
+    def __init__(self, idle_timeout: int = 60, max_idle: int = 2):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        # 分组键 → [(连接, 归还时刻 monotonic)]
+        self._idle: dict[SMTPSettings, list[tuple[smtplib.SMTP, float]]] = {}
+        self._reaper: threading.Timer | None = None
+
+    # ──────────────────────────────────────────
+    # 对外接口
+    # ──────────────────────────────────────────
+
+    def send(self, settings: SMTPSettings, msg: Message, timeout: float = None) -> None:
+        """发送单封邮件，失败抛出 smtplib.SMTPException / OSError"""
+        if timeout is None:
+            timeout = config.notify_cfg.CHANNEL_TIMEOUT
+
+        for attempt in (1, 2):
+            conn = self._checkout(settings, timeout)
+            try:
+                self._send_one(conn, msg)
+            except _Reconnect as e:
+                self._close(conn)
+                if attempt == 2:
+                    raise e.__cause__
+                logger.info(f"SMTP 连接已断开，重新连接: {e.__cause__}")
+                continue
+            except BaseException:
+                self._close(conn)
+                raise
+            self._checkin(settings, conn)
+            return
+
+    def close(self) -> None:
+        """关闭全部空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            self._cancel_reaper()
+        for conns in idle.values():
+            for conn, _ in conns:
+                self._close(conn)
+
+    # ──────────────────────────────────────────
+    # 发送
+    # ──────────────────────────────────────────
+
+    @staticmethod
+    def _send_one(conn: smtplib.SMTP, msg: Message) -> None:
+        try:
+            conn.send_message(msg)
+        except smtplib.SMTPServerDisconnected as e:
+            raise _Reconnect() from e
+        except smtplib.SMTPResponseException as e:
+            # 421：服务器关闭会话（空闲超时/限流），可重连重试
+            if e.smtp_code == 421:
+                raise _Reconnect() from e
+            raise
+        except smtplib.SMTPException:
+            # SMTPException 是 OSError 子类，需在 OSError 之前原样抛出
+            raise
+        except OSError as e:
+            raise _Reconnect() from e
+
+    # ──────────────────────────────────────────
+    # 连接借还
+    # ──────────────────────────────────────────
+
+    def _checkout(self, settings: SMTPSettings, timeout: float) -> smtplib.SMTP:
+        """取出一个可用连接：优先复用空闲连接（NOOP 探活），否则新建并登录"""
+        while True:
+            with self._lock:
+                conns = self._idle.get(settings)
+                if not conns:
+                    break
+                conn, returned_at = conns.pop()
+            if time.monotonic() - returned_at > self.idle_timeout:
+                self._close(conn)
+                continue
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(conn)
+        return self._connect(settings, timeout)
+
+    def _checkin(self, settings: SMTPSettings, conn: smtplib.SMTP) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(settings, [])
+            if len(conns) < self.max_idle:
+                conns.append((conn, time.monotonic()))
+                if self._reaper is None:
+                    self._schedule_reaper()
+                return
+        self._close(conn)
+
+    @staticmethod
+    def _connect(settings: SMTPSettings, timeout: float) -> smtplib.SMTP:
+        start = time.perf_counter()
+        if settings.use_ssl:
+            conn = smtplib.SMTP_SSL(settings.server, settings.port, timeout=timeout)
+        else:
+            conn = smtplib.SMTP(settings.server, settings.port, timeout=timeout)
+            conn.starttls()
+        try:
+            conn.login(settings.username, settings.password)
+        except BaseException:
+            SMTPPool._close(conn)
+            raise
+        logger.info(f"SMTP 会话已建立 {settings!r}，耗时 {time.perf_counter() - start:.2f}s")
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # ──────────────────────────────────────────
+    # 空闲回收
+    # ──────────────────────────────────────────
+
+    def _schedule_reaper(self) -> None:
+        timer = threading.Timer(self.idle_timeout, self._reap)
+        timer.daemon = True
+        timer.start()
+        self._reaper = timer
+
+    def _cancel_reaper(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+    def _reap(self) -> None:
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            self._reaper = None
+            for settings in list(self._idle):
+                keep = []
+                for conn, returned_at in self._idle[settings]:
+                    if now - returned_at > self.idle_timeout:
+                        expired.append(conn)
+                    else:
+                        keep.append((conn, returned_at))
+                if keep:
+                    self._idle[settings] = keep
+                else:
+                    del self._idle[settings]
+            if self._idle:
+                self._schedule_reaper()
+        for conn in expired:
+            self._close(conn)
+        if expired:
+            logger.debug(f"已关闭 {len(expired)} 个空闲 SMTP 连接")
+
+
+# 全局单例
+smtp_pool = SMTPPool(
+    idle_timeout=config.mail.SMTP_POOL_IDLE_TIMEOUT,
+    max_idle=config.mail.SMTP_POOL_MAX_IDLE,
+)
+atexit.register(smtp_pool.close)
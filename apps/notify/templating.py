@@ -0,0 +1,141 @@
+"""
+通知模板编译与表格渲染
+模板在保存后编译一次（按模板 id + updated_at 缓存），渲染时单次拼接，
+不再对整段内容逐变量 str.replace；基金表格每份报告只渲染一次，各渠道共用。
+
+占位符格式：{{name}}，未提供的变量原样保留。
+"""
+import re
+import threading
+from typing import Any
+
+# {{变量名}}
+_PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+class CompiledTemplate:
+    """
+    预编译模板：拆分为 文本片段 与 变量名 交替的列表。
+
+    parts[0], parts[2], ... 为原样文本；parts[1], parts[3], ... 为变量名。
+    """
+
+    __slots__ = ("source", "parts", "names")
+
+    def __init__(self, source: str):
+        self.source = source or ""
+        self.parts = _PLACEHOLDER.split(self.source)
+        self.names = frozenset(self.parts[1::2])
+
+    def render(self, variables: dict) -> str:
+        parts = self.parts
+        if len(parts) == 1:
+            return parts[0]
+        out = parts[:]
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            if name in variables:
+                out[i] = str(variables[name])
+            else:
+                out[i] = f"{{{{{name}}}}}"
+        return "".join(out)
+
+
+# (模板 id, updated_at) → (标题, 内容) 编译结果
+_compiled: dict[tuple, tuple[CompiledTemplate, CompiledTemplate]] = {}
+_lock = threading.Lock()
+
+
+def compile_template(template) -> tuple[CompiledTemplate, CompiledTemplate]:
+    """
+    返回模板的编译结果，按 (id, updated_at) 缓存。
+
+    模板更新后 updated_at 变化，自动重新编译，同一 id 的旧版本随之淘汰。
+    未保存的模板（无 id）不缓存。
+    """
+    key = (template.id, template.updated_at)
+    if template.id is not None:
+        cached = _compiled.get(key)
+        if cached is not None:
+            return cached
+
+    compiled = (
+        CompiledTemplate(template.title_template),
+        CompiledTemplate(template.content_template),
+    )
+    if template.id is not None:
+        with _lock:
+            for old in [k for k in _compiled if k[0] == template.id]:
+                del _compiled[old]
+            _compiled[key] = compiled
+    return compiled
+
+
+def invalidate(template_id: int = None) -> None:
+    """清除编译缓存（不传 id 则全部清除）"""
+    with _lock:
+        if template_id is None:
+            _compiled.clear()
+        else:
+            for key in [k for k in _compiled if k[0] == template_id]:
+                del _compiled[key]
+
+
+# ──────────────────────────────────────────
+# 基金表格
+# ──────────────────────────────────────────
+
+_REPORT_HEADER = (
+    "| 市场 | 代码 | 名称 | 溢价率 | 变化 | 状态 |\n"
+    "|------|------|------|--------|------|------|"
+)
+
+
+def _fmt_change(change: Any) -> str:
+    if change is None:
+        return ""
+    icon = "🔺" if change > 0 else "🔻" if change < 0 else ""
+    return f"{icon}{change:+.2f}%"
+
+
+def render_fund_table(funds: list[dict], show_changes: bool = True) -> str:
+    """
+    渲染报告中的基金列表（Markdown）。
+
+    show_changes=True 时输出含溢价率变化的表格，否则输出简洁列表。
+    """
+    if not show_changes:
+        return "\n".join([
+            f"- **{f.get('fund_name')}** ({f.get('fund_code')}) "
+            f"溢价率 {f.get('premium', 'N/A')}%，状态：{f.get('status', '')}"
+            for f in funds
+        ])
+
+    lines = [_REPORT_HEADER]
+    append = lines.append
+    for f in funds:
+        premium = f.get("premium_today") or f.get("premium")
+        premium_str = f"{premium:.2f}%" if premium is not None else "N/A"
+        append(
+            f"|{f.get('source', '')}|{f.get('fund_code', '')}|"
+            f"{f.get('fund_name', '')}|{premium_str}|"
+            f"{_fmt_change(f.get('change'))}|{f.get('status', '')}|"
+        )
+    return "\n".join(lines)
+
+
+def render_table_variable(rows: list[dict]) -> str:
+    """
+    渲染模板变量 table 传入的已格式化行（code/name/premium/change 均为字符串）。
+    """
+    lines = [_REPORT_HEADER]
+    append = lines.append
+    for f in rows:
+        change = f.get("change", "")
+        icon = "🔺" if change.startswith("+") else "🔻" if change.startswith("-") else ""
+        append(
+            f"|{f.get('source', '')}|{f.get('code', '')}|"
+            f"{f.get('name', '')}|{f.get('premium', '')}|"
+            f"{icon}{change}|{f.get('status', '')}|"
+        )
+    return "\n".join(lines)
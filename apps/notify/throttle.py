@@ -0,0 +1,197 @@
+"""
+渠道限流与合并发送
+钉钉机器人、Server酱、PushPlus 等渠道有每分钟配额，突发的告警/报告超出后会被静默丢弃。
+
+- 每个渠道一个令牌桶，任意 60 秒内的发送数不超过配置的每分钟上限
+- 令牌不足时消息进入该渠道的汇总队列（而不是丢弃），
+  下一个令牌可用时合并为一条汇总消息发送
+- 某渠道已有待合并消息时，后续消息也进入队列，保证先后顺序
+- 汇总消息发送失败、或进程退出时仍有待合并消息，交给 fallback 回调
+  （发件箱重新入队，按正常的重试/死信流程处理），不静默丢弃
+
+配置：NOTIFY_RATE_LIMITS="dingtalk=20,serverchan=5"（每分钟条数，未列出的渠道不限流）
+限流状态保存在进程内。启用发件箱时只有持有 notify_outbox 租约的 worker 投递，
+限流对整个部署生效；未启用发件箱（各 worker 同步发送）时每个进程各自计数。
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def parse_rate_limits(spec: str) -> dict[str, int]:
+    """解析 "dingtalk=20,serverchan=5" 形式的配置，非法项忽略"""
+    limits = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            limit = int(value)
+        except ValueError:
+            logger.warning(f"忽略无效的限流配置: {part.strip()}")
+            continue
+        if limit > 0:
+            limits[name] = limit
+    return limits
+
+
+class TokenBucket:
+    """
+    令牌桶。
+
+    容量取每分钟上限的 1/4（至少 1），其余额度在 60 秒内匀速补充，
+    因此任意 60 秒窗口内的放行数不超过 per_minute。
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute // 4)
+        self.rate = max(per_minute - self.capacity, 1) / 60.0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """距离下一个令牌可用的秒数"""
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class ChannelThrottle:
+    """
+    按渠道限流，超限消息合并为汇总消息延后发送。
+
+    参数:
+        limits: 渠道 → 每分钟上限
+        sender: 发送汇总消息的回调 sender(channel, title, content, recipients, context) -> bool，
+                context 为最后一条被合并消息随附的上下文（如渠道配置快照）
+        fallback: 汇总消息未能发送时的回调 fallback(channel, title, content, recipients) -> bool，
+                  返回 False 表示无法转交（消息丢失，记录错误日志）
+    """
+
+    def __init__(self, limits: dict[str, int], sender: Callable[..., bool],
+                 fallback: Callable[..., bool] = None):
+        self.limits = limits
+        self.sender = sender
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._buckets = {ch: TokenBucket(n) for ch, n in limits.items()}
+        # 渠道 → [(title, content, recipients)]
+        self._pending: dict[str, list[tuple[str, str, list]]] = {}
+        # 渠道 → 最近一条待合并消息的上下文
+        self._context: dict[str, Any] = {}
+        self._timers: dict[str, threading.Timer] = {}
+
+    def admit(self, channel: str, title: str, content: str, recipients: list = None,
+              context: Any = None) -> bool:
+        """
+        申请立即发送。
+
+        返回 True 表示可以立即发送；False 表示已放入汇总队列，稍后合并发送。
+        """
+        bucket = self._buckets.get(channel)
+        if bucket is None:
+            return True
+
+        with self._lock:
+            pending = self._pending.get(channel)
+            if pending is None and bucket.try_acquire():
+                return True
+
+            if pending is None:
+                pending = self._pending[channel] = []
+            pending.append((title, content, list(recipients or [])))
+            self._context[channel] = context
+            if channel not in self._timers:
+                self._schedule(channel, bucket.wait_time())
+            logger.info(f"渠道 {channel} 触发限流，消息并入汇总（待发 {len(pending)} 条）")
+            return False
+
+    def pending_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._pending.get(channel, []))
+
+    # ──────────────────────────────────────────
+    # 汇总发送
+    # ──────────────────────────────────────────
+
+    def _schedule(self, channel: str, delay: float) -> None:
+        timer = threading.Timer(delay + 0.05, self._flush, args=[channel])
+        timer.daemon = True
+        self._timers[channel] = timer
+        timer.start()
+
+    def _flush(self, channel: str) -> None:
+        bucket = self._buckets[channel]
+        with self._lock:
+            self._timers.pop(channel, None)
+            items = self._pending.get(channel)
+            if not items:
+                return
+            if not bucket.try_acquire():
+                self._schedule(channel, bucket.wait_time())
+                return
+            del self._pending[channel]
+            context = self._context.pop(channel, None)
+
+        title, content, recipients = build_digest(items)
+        try:
+            ok = self.sender(channel, title, content, recipients, context)
+        except Exception as e:
+            logger.error(f"渠道 {channel} 汇总消息发送异常: {e}")
+            ok = False
+        if ok:
+            logger.info(f"渠道 {channel} 已发送汇总消息（合并 {len(items)} 条）")
+        else:
+            logger.warning(f"渠道 {channel} 汇总消息发送失败（合并 {len(items)} 条），转交重试")
+            self._hand_off(channel, title, content, recipients, len(items))
+
+    def drain(self) -> int:
+        """取消所有待发汇总并转交 fallback（进程退出前调用），返回转交的汇总条数"""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            pending, self._pending = self._pending, {}
+            self._context.clear()
+
+        for channel, items in pending.items():
+            title, content, recipients = build_digest(items)
+            self._hand_off(channel, title, content, recipients, len(items))
+        return len(pending)
+
+    def _hand_off(self, channel: str, title: str, content: str, recipients: list,
+                  merged: int) -> None:
+        try:
+            handed = self.fallback is not None and self.fallback(channel, title, content, recipients)
+        except Exception as e:
+            logger.error(f"渠道 {channel} 汇总消息转交异常: {e}")
+            handed = False
+        if not handed:
+            logger.error(f"渠道 {channel} 汇总消息未能发送，已丢弃（合并 {merged} 条）")
+
+
+def build_digest(items: list[tuple[str, str, list]]) -> tuple[str, str, list]:
+    """将多条消息合并为一条：返回 (标题, 内容, 合并后的收件人)"""
+    recipients = list(dict.fromkeys(r for _, _, rs in items for r in rs))
+    if len(items) == 1:
+        title, content, _ = items[0]
+        return title, content, recipients
+
+    title = f"[QDII汇总] {len(items)} 条通知"
+    sections = [f"### {i}. {t}\n\n{c}" for i, (t, c, _) in enumerate(items, 1)]
+    return title, "\n\n---\n\n".join(sections), recipients
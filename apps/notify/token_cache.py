@@ -0,0 +1,86 @@
+"""
+访问令牌缓存 - 企业微信 access_token 等按 expires_in 过期的凭证
+进程内共享，线程安全；临近过期提前刷新，同一凭证并发请求只刷新一次。
+
+使用方式:
+    token = token_cache.get(("wecom", corp_id, secret), fetch)
+    # fetch() 返回 (token, expires_in 秒)，失败时抛出异常
+
+    # 服务端返回 token 失效时作废并重试
+    token_cache.invalidate(key, token)
+"""
+import logging
+import threading
+import time
+from typing import Callable, Hashable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """
+    按键缓存访问令牌。
+
+    - 缓存有效期 = expires_in - 提前刷新余量（余量最多取有效期的一半）
+    - 每个键一把锁：并发的过期请求只触发一次 fetch
+    """
+
+    def __init__(self, refresh_margin: int = 300):
+        self.refresh_margin = refresh_margin
+        # 键 → (token, 需刷新的时刻 monotonic)
+        self._tokens: dict[Hashable, tuple[str, float]] = {}
+        self._locks: dict[Hashable, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: Hashable, fetch: Callable[[], tuple[str, int]]) -> str:
+        """返回有效令牌；缓存缺失或临近过期时调用 fetch() 刷新"""
+        token = self._valid(key)
+        if token is not None:
+            return token
+
+        with self._lock_for(key):
+            # 等锁期间可能已被其他线程刷新
+            token = self._valid(key)
+            if token is not None:
+                return token
+
+            token, expires_in = fetch()
+            expires_in = max(int(expires_in), 0)
+            margin = min(self.refresh_margin, expires_in / 2)
+            self._tokens[key] = (token, time.monotonic() + expires_in - margin)
+            logger.debug(f"访问令牌已刷新 [{key[0] if isinstance(key, tuple) else key}]，有效期 {expires_in}s")
+            return token
+
+    def invalidate(self, key: Hashable, token: str = None) -> None:
+        """
+        作废缓存的令牌。
+
+        传入 token 时仅当缓存的仍是该令牌才作废，避免误删其他线程刚刷新的新令牌。
+        """
+        with self._guard:
+            entry = self._tokens.get(key)
+            if entry is not None and (token is None or entry[0] == token):
+                del self._tokens[key]
+
+    def clear(self) -> None:
+        with self._guard:
+            self._tokens.clear()
+
+    def _valid(self, key: Hashable) -> str | None:
+        entry = self._tokens.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+        return None
+
+    def _lock_for(self, key: Hashable) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+
+# 全局单例
+token_cache = TokenCache(refresh_margin=config.notify_cfg.TOKEN_REFRESH_MARGIN)
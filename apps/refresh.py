@@ -0,0 +1,329 @@
+"""
+页面手动刷新任务（跨 worker 协调）
+刷新（抓取 → 清洗 → 筛选 → 保存快照）在后台线程中执行，SSE 请求只订阅进度：
+
+- 数据库租约 refresh 保证全系统同一时间只有一个刷新在执行，
+  抢到租约的 worker 执行刷新，执行期间定期续期
+- 各阶段事件追加写入 DATA_DIR/.refresh/<任务 id>.jsonl，
+  任意 worker 的订阅者按偏移量读取同一文件，从头回放并实时跟随
+- 刷新成功后租约不释放，而是续期为 FilterConfig.REFRESH_COOLDOWN 秒，
+  租约过期即冷却结束；刷新失败立即释放，允许马上重试
+- 执行刷新的 worker 崩溃时，进度文件不再更新、租约随后过期，
+  订阅者据此结束等待，之后可重新刷新
+- 页面默认短轮询进度（poll，每次请求立即返回），不占用 worker 线程；
+  SSE（follow）在整个刷新期间占用一个线程，仅适合异步 worker
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 租约名称
+REFRESH_LEASE = "refresh"
+# 保留的进度文件个数
+_KEEP_PROGRESS_FILES = 5
+# 订阅者轮询进度文件的间隔（秒）；同进程写入时会被立即唤醒
+_POLL_INTERVAL = 0.25
+# 事件终止状态
+_TERMINAL = ("completed", "error")
+# 任务 id 格式（轮询参数来自客户端，校验后才拼接文件路径）
+_JOB_ID_RE = re.compile(r"^\d{14}-[0-9a-f]{8}$")
+
+# 同进程内有新事件写入时唤醒订阅者
+_changed = threading.Condition()
+
+
+def _progress_dir() -> Path:
+    return config.spider.DATA_DIR / ".refresh"
+
+
+class RefreshJob:
+    """
+    一次刷新任务的进度文件（JSON Lines，追加写）。
+
+    事件为 dict：status（processing / completed / error）、message、
+    since_start（距任务开始秒数），阶段事件另含 stage 及该阶段的 info 字段。
+    """
+
+    def __init__(self, job_id: str):
+        if not _JOB_ID_RE.match(job_id):
+            raise ValueError(f"无效的刷新任务 id: {job_id}")
+        self.id = job_id
+        self.path = _progress_dir() / f"{job_id}.jsonl"
+        self.started = time.monotonic()
+        self._write_lock = threading.Lock()
+
+    # ──────────────────────────────────────────
+    # 写入（执行刷新的 worker）
+    # ──────────────────────────────────────────
+
+    def publish(self, status: str, message: str, stage: str = None, **info) -> None:
+        event = {
+            "status": status,
+            "message": message,
+            "since_start": round(time.monotonic() - self.started, 2),
+        }
+        if stage:
+            event["stage"] = stage
+        event.update(info)
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._write_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 整行一次写入，订阅者只读取到最后一个换行符为止
+            with open(self.path, "ab") as f:
+                f.write(line)
+        with _changed:
+            _changed.notify_all()
+
+    def on_stage(self, stage: str, message: str, info: dict) -> None:
+        """run_workflow 的阶段回调"""
+        self.publish("processing", message, stage=stage, **info)
+
+    def touch(self) -> None:
+        """刷新仍在执行（更新进度文件修改时间，订阅者据此判断是否中断）"""
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+
+    # ──────────────────────────────────────────
+    # 读取（任意 worker 的订阅者）
+    # ──────────────────────────────────────────
+
+    def read(self, offset: int = 0) -> tuple[list[dict], int]:
+        """从 offset 读取完整的事件行，返回 (事件列表, 新偏移量)"""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        end = data.rfind(b"\n") + 1
+        events = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        return events, offset + end
+
+    def is_finished(self) -> Optional[dict]:
+        """已结束时返回终止事件，否则 None（进度文件尚未创建也视为未结束）"""
+        events, _ = self.read()
+        if events and events[-1]["status"] in _TERMINAL:
+            return events[-1]
+        return None
+
+    def _is_stale(self, stale_after: float, since: float) -> bool:
+        try:
+            return time.time() - self.path.stat().st_mtime > stale_after
+        except FileNotFoundError:
+            # 执行者刚抢到租约、尚未写入第一条事件
+            return time.monotonic() - since > stale_after
+
+    def poll(self, offset: int, stale_after: float) -> tuple[list[dict], int, bool]:
+        """
+        短轮询：返回 offset 之后的事件、新偏移量、是否已结束（立即返回，不等待，需在 app context 中调用）。
+
+        进度文件超过 stale_after 秒未更新时追加一条中断错误并视为结束。
+        """
+        if not self.path.exists():
+            from models import Lease
+
+            lease = Lease.get_active(REFRESH_LEASE)
+            if lease is not None and lease.holder == self.id:
+                # 执行者刚抢到租约、尚未写入第一条事件
+                return [], offset, False
+            return [{"status": "error", "message": "刷新任务不存在或已清理"}], offset, True
+        events, offset = self.read(offset)
+        if events and events[-1]["status"] in _TERMINAL:
+            return events, offset, True
+        if self._is_stale(stale_after, time.monotonic()):
+            events.append({"status": "error", "message": "刷新任务已中断，请稍后重试"})
+            return events, offset, True
+        return events, offset, False
+
+    def follow(self, heartbeat: float, stale_after: float) -> Iterator[Optional[dict]]:
+        """
+        从第一条开始逐条产出事件，遇到终止事件后停止。
+
+        heartbeat 秒内没有新事件时产出 None，调用方据此发送心跳保持连接；
+        进度文件超过 stale_after 秒未更新视为执行刷新的 worker 已退出。
+        """
+        offset = 0
+        since = last_yield = time.monotonic()
+        while True:
+            events, offset = self.read(offset)
+            for event in events:
+                yield event
+                if event["status"] in _TERMINAL:
+                    return
+            now = time.monotonic()
+            if events:
+                last_yield = now
+            elif self._is_stale(stale_after, since):
+                yield {"status": "error", "message": "刷新任务已中断，请稍后重试"}
+                return
+            elif now - last_yield >= heartbeat:
+                yield None
+                last_yield = now
+
+            with _changed:
+                _changed.wait(_POLL_INTERVAL)
+
+
+class RefreshCoordinator:
+    """跨 worker 的手动刷新协调：租约选出唯一执行者，其余请求订阅其进度"""
+
+    def start(self, app) -> tuple[Optional[RefreshJob], Optional[str]]:
+        """
+        开始或加入刷新（需在 app context 中调用）。
+
+        返回 (任务, None)；冷却期内或无法订阅时返回 (None, 提示信息)。
+        """
+        from models import Lease
+
+        job_id = f"{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        ttl = config.refresh_cfg.LEASE_TTL
+
+        if Lease.acquire(REFRESH_LEASE, job_id, ttl):
+            job = RefreshJob(job_id)
+            self._cleanup_progress_files()
+            job.publish("processing", "准备抓取数据...", stage="start")
+            threading.Thread(
+                target=self._run, args=(app, job), name="manual-refresh", daemon=True
+            ).start()
+            return job, None
+
+        lease = Lease.get_active(REFRESH_LEASE)
+        if lease is None:
+            # 租约恰好在两次查询之间过期
+            return None, "刷新状态变化，请重试"
+
+        job = RefreshJob(lease.holder)
+        if job.is_finished() is None:
+            logger.info(f"刷新 {job.id} 进行中，订阅其进度")
+            return job, None
+        remaining = (lease.expires_at - datetime.now()).total_seconds()
+        return None, f"刷新太频繁，请等待 {max(int(remaining) + 1, 1)} 秒"
+
+    def _run(self, app, job: RefreshJob) -> None:
+        from apps.spider import run_workflow
+        from models import Lease
+
+        ttl = config.refresh_cfg.LEASE_TTL
+        stop = threading.Event()
+        renewer = threading.Thread(
+            target=self._renew, args=(app, job, ttl, stop),
+            name="manual-refresh-lease", daemon=True,
+        )
+        renewer.start()
+
+        df = None
+        error = None
+        try:
+            with app.app_context():
+                job.publish("processing", "正在抓取数据...", stage="fetch")
+                df, crawled_at = run_workflow(
+                    premium_min=config.filter_cfg.PREMIUM_THRESHOLD,
+                    status_filter=None,
+                    on_stage=job.on_stage,
+                )
+                self._save_snapshot(job, df, crawled_at)
+        except Exception as e:
+            logger.error(f"刷新出错: {e}", exc_info=True)
+            error = e
+        finally:
+            stop.set()
+            renewer.join()
+
+        # 成功：租约续期为冷却时间；失败：释放租约，允许立即重试
+        cooldown = config.filter_cfg.REFRESH_COOLDOWN
+        try:
+            with app.app_context():
+                if error is None and cooldown > 0:
+                    Lease.acquire(REFRESH_LEASE, job.id, cooldown)
+                else:
+                    Lease.release(REFRESH_LEASE, job.id)
+        except Exception as e:
+            logger.warning(f"更新刷新租约失败: {e}")
+
+        if error is not None:
+            job.publish("error", str(error))
+            return
+
+        note = "（数据与上次一致）" if df.attrs.get("unchanged") else ""
+        job.publish(
+            "completed",
+            f"抓取完成{note}，共 {len(df)} 条数据，正在刷新页面...",
+            count=len(df),
+        )
+        logger.info(f"手动刷新完成，耗时 {time.monotonic() - job.started:.2f}s")
+
+    @staticmethod
+    def _renew(app, job: RefreshJob, ttl: int, stop: threading.Event) -> None:
+        """执行期间定期续租，并更新进度文件时间戳"""
+        from models import Lease
+
+        interval = max(ttl / 3, 1)
+        with app.app_context():
+            while not stop.wait(interval):
+                job.touch()
+                try:
+                    if not Lease.acquire(REFRESH_LEASE, job.id, ttl):
+                        logger.warning(f"刷新 {job.id} 的租约已被其他节点接管")
+                except Exception as e:
+                    logger.warning(f"刷新租约续期失败: {e}")
+
+    @staticmethod
+    def _save_snapshot(job: RefreshJob, df, crawled_at: str) -> None:
+        """
+        保存全量清洗数据为今日快照（首页优先读取快照，不保存则看不到本次数据），
+        并追加一批盘中记录。数据未变化且今日快照已存在时只追加盘中记录。
+        """
+        from apps.latest_view import latest_view
+        from apps.spider.parser import last_clean_frame
+        from models import FundSnapshot, FundTick
+
+        start = time.perf_counter()
+        try:
+            df_all = last_clean_frame()
+            if df_all is None:
+                df_all = df
+            FundTick.append_from_df(df_all, crawled_at)
+            if df.attrs.get("unchanged") and FundSnapshot.has_date():
+                job.publish("processing", "数据未变化，跳过快照保存", stage="snapshot")
+                return
+            count = FundSnapshot.save_from_df(df_all)
+        except Exception as e:
+            logger.warning(f"快照保存失败（非致命）: {e}")
+            job.publish("processing", f"快照保存失败: {e}", stage="snapshot")
+            return
+        latest_view.invalidate()
+        elapsed = time.perf_counter() - start
+        job.publish(
+            "processing", f"快照已保存 {count} 条，耗时 {elapsed:.2f}s",
+            stage="snapshot", rows=count, elapsed=round(elapsed, 3),
+        )
+
+    @staticmethod
+    def _cleanup_progress_files() -> None:
+        """只保留最近几次刷新的进度文件"""
+        try:
+            files = sorted(_progress_dir().glob("*.jsonl"), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for path in files[:-_KEEP_PROGRESS_FILES]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+# 全局单例
+refresh_coordinator = RefreshCoordinator()
@@ -1,8 +1,18 @@
 """
 任务调度器 - 基于 APScheduler
 所有路径通过 config.spider 管理，无硬编码。
+
+多 worker 部署（gunicorn --workers N）时每个 worker 都会创建调度器，
+但只有持有数据库租约（models.Lease，名称 scheduler）的主节点注册并执行定时任务：
+- 心跳任务定期续租；租约过期（主节点退出/卡死）后其他 worker 自动接管
+- 主节点在心跳中与数据库同步任务列表，任一 worker 上的增删改都会生效
+- 每次执行前再次续租确认身份，保证同一次运行只在一个 worker 上发生
 """
+import atexit
 import logging
+import os
+import socket
+import uuid
 from datetime import datetime
 from typing import Optional
 
@@ -11,18 +21,28 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.jobstores.memory import MemoryJobStore
 
+import config
 from extensions import db
-from models import TaskSchedule, TaskLog
+from models import FundTick, Lease, TaskSchedule, TaskLog
+from apps.latest_view import latest_view
 from apps.notify import notification_service
 
 logger = logging.getLogger(__name__)
 
+# 调度主节点租约名称
+LEADER_LEASE = "scheduler"
+# 心跳任务 ID（与数字型任务 ID 区分）
+_HEARTBEAT_JOB_ID = "__scheduler_heartbeat__"
+# 盘中记录每日汇总任务 ID（仅主节点注册）
+_ROLLUP_JOB_ID = "__tick_rollup__"
+
 
 class TaskScheduler:
     """
     QDII 定时任务调度器。
 
     使用 APScheduler BackgroundScheduler，支持：
+    - 多 worker 主节点选举，定时任务只在主节点执行
     - 从数据库加载已有任务
     - 动态添加/删除/启停任务
     - 执行时抓取数据 → 筛选 → 发送邮件
@@ -34,6 +54,12 @@ class TaskScheduler:
             job_defaults={"coalesce": True, "max_instances": 1},
         )
         self.notify_svc = notification_service
+        self.app = None
+        # 进程唯一的租约持有者标识
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        # 已注册任务 ID → cron 表达式，用于与数据库增量同步
+        self._registered: dict[str, str] = {}
 
     # ──────────────────────────────────────────
     # 生命周期
@@ -41,61 +67,202 @@ class TaskScheduler:
 
     def init_scheduler(self, app) -> None:
         """
-        在 Flask app context 中初始化调度器，加载数据库中的活跃任务。
+        初始化调度器：立即参与一次主节点选举，并启动心跳任务。
         必须在 Flask 应用创建后调用。
         """
-        with app.app_context():
-            tasks = TaskSchedule.query.filter_by(is_active=True).all()
-            for task in tasks:
-                self.add_job(task)
-
-            if tasks:
-                self.scheduler.start()
-                logger.info(f"调度器启动，已加载 {len(tasks)} 个活跃任务")
-            else:
-                logger.info("调度器初始化完成，当前无活跃任务")
+        self.app = app
+        self._heartbeat()
+
+        self.scheduler.add_job(
+            func=self._heartbeat,
+            trigger="interval",
+            seconds=config.scheduler_cfg.HEARTBEAT_INTERVAL,
+            id=_HEARTBEAT_JOB_ID,
+            replace_existing=True,
+        )
+        self.scheduler.start()
+        atexit.register(self.shutdown)
+
+        role = "主节点" if self.is_leader else "备用节点"
+        logger.info(
+            f"调度器启动（{self.holder_id}，{role}），"
+            f"已加载 {len(self._registered)} 个活跃任务"
+        )
 
     def shutdown(self) -> None:
         if self.scheduler.running:
             self.scheduler.shutdown(wait=False)
             logger.info("调度器已关闭")
+        self._registered.clear()
+        # 主动释放租约，让其他 worker 立即接管而不必等待过期
+        if self.is_leader and self.app is not None:
+            self.is_leader = False
+            try:
+                with self.app.app_context():
+                    Lease.release(LEADER_LEASE, self.holder_id)
+            except Exception as e:
+                logger.warning(f"释放调度主节点租约失败: {e}")
 
     # ──────────────────────────────────────────
-    # 任务 CRUD
+    # 主节点选举
     # ──────────────────────────────────────────
 
-    def add_job(self, task: TaskSchedule) -> Optional:
-        """
-        向调度器添加一个任务。
+    def _renew_lease(self) -> bool:
+        """占有或续期主节点租约（需在 app context 中调用）"""
+        try:
+            return Lease.acquire(
+                LEADER_LEASE, self.holder_id, config.scheduler_cfg.LEASE_TTL
+            )
+        except Exception as e:
+            # 数据库不可用时主动退位，宁可少跑一次也不重复执行
+            logger.warning(f"调度主节点续租失败: {e}")
+            return False
 
-        参数:
-            task: TaskSchedule 模型实例
-        """
+    def _heartbeat(self) -> None:
+        """心跳：续租；主节点同步任务列表，失去租约则清空本地任务"""
+        with self.app.app_context():
+            leader = self._renew_lease()
+
+            if leader and not self.is_leader:
+                logger.info(f"当前 worker 成为调度主节点（{self.holder_id}）")
+            elif not leader and self.is_leader:
+                logger.warning(f"当前 worker 失去调度主节点身份（{self.holder_id}）")
+            self.is_leader = leader
+
+            if leader:
+                self._sync_jobs()
+            else:
+                self._clear_jobs()
+
+    def _sync_jobs(self) -> None:
+        """将本地已注册任务与数据库中的活跃任务对齐"""
+        self._ensure_rollup_job()
+
+        tasks = TaskSchedule.query.filter_by(is_active=True).all()
+        wanted = {str(t.id): t for t in tasks}
+
+        for job_id in list(self._registered):
+            if job_id not in wanted:
+                self._unregister(job_id)
+
+        for job_id, task in wanted.items():
+            if self._registered.get(job_id) == task.cron_expression:
+                continue
+            try:
+                self._register(task)
+            except ValueError:
+                # 无效表达式已记录错误日志，跳过
+                pass
+
+    def _clear_jobs(self) -> None:
+        for job_id in list(self._registered):
+            self._unregister(job_id)
+        if self.scheduler.get_job(_ROLLUP_JOB_ID) is not None:
+            self.scheduler.remove_job(_ROLLUP_JOB_ID)
+
+    # ──────────────────────────────────────────
+    # 盘中记录汇总（系统任务）
+    # ──────────────────────────────────────────
+
+    def _ensure_rollup_job(self) -> None:
+        """主节点注册每日汇总任务（SNAPSHOT_ROLLUP_AT）"""
+        if self.scheduler.get_job(_ROLLUP_JOB_ID) is not None:
+            return
+        rollup_at = config.snapshot_cfg.ROLLUP_AT
+        try:
+            hour, _, minute = rollup_at.partition(":")
+            trigger = CronTrigger(hour=int(hour), minute=int(minute or 0))
+        except ValueError as e:
+            logger.error(f"无效的汇总时间 SNAPSHOT_ROLLUP_AT={rollup_at}: {e}")
+            return
+        self.scheduler.add_job(
+            func=self._rollup_ticks,
+            trigger=trigger,
+            id=_ROLLUP_JOB_ID,
+            replace_existing=True,
+        )
+        logger.info(f"盘中记录汇总任务已注册（每日 {rollup_at}）")
+
+    def _rollup_ticks(self) -> None:
+        """将当日盘中记录汇总到快照，并清理过期盘中记录"""
+        with self.app.app_context():
+            if not self._renew_lease():
+                logger.warning("已不是调度主节点，跳过盘中记录汇总")
+                return
+            try:
+                count = FundTick.rollup_day()
+                deleted = FundTick.cleanup_old_ticks(config.snapshot_cfg.TICK_KEEP_DAYS)
+                latest_view.invalidate()
+                logger.info(f"盘中记录已汇总 {count} 只基金，清理过期记录 {deleted} 条")
+            except Exception as e:
+                logger.error(f"盘中记录汇总失败: {e}", exc_info=True)
+
+    # ──────────────────────────────────────────
+    # 任务 CRUD
+    # ──────────────────────────────────────────
+
+    @staticmethod
+    def _build_trigger(task: TaskSchedule) -> CronTrigger:
         try:
-            trigger = CronTrigger.from_crontab(task.cron_expression)
+            return CronTrigger.from_crontab(task.cron_expression)
         except Exception as e:
             logger.error(f"无效的 Cron 表达式 [{task.cron_expression}]: {e}")
             raise ValueError(f"无效的 Cron 表达式: {task.cron_expression}")
 
+    def _register(self, task: TaskSchedule):
         job = self.scheduler.add_job(
-            func=self._run_scheduled_report,
-            trigger=trigger,
+            func=self._run_job,
+            trigger=self._build_trigger(task),
             args=[task.id],
             id=str(task.id),
             replace_existing=True,
         )
+        self._registered[str(task.id)] = task.cron_expression
         logger.info(f"任务已添加: ID={task.id}, cron={task.cron_expression}")
         return job
 
-    def remove_job(self, task_id: int) -> bool:
-        """从调度器中移除任务"""
+    def _unregister(self, job_id: str) -> bool:
+        self._registered.pop(job_id, None)
         try:
-            self.scheduler.remove_job(str(task_id))
-            logger.info(f"任务已移除: ID={task_id}")
+            self.scheduler.remove_job(job_id)
+            logger.info(f"任务已移除: ID={job_id}")
             return True
         except Exception:
             return False
 
+    def add_job(self, task: TaskSchedule) -> Optional:
+        """
+        向调度器添加一个任务。
+
+        非主节点只校验 Cron 表达式，任务由主节点在下次心跳时从数据库加载。
+
+        参数:
+            task: TaskSchedule 模型实例
+        """
+        if not self.is_leader:
+            self._build_trigger(task)
+            logger.info(f"任务 ID={task.id} 已保存，将由调度主节点加载")
+            return None
+        return self._register(task)
+
+    def remove_job(self, task_id: int) -> bool:
+        """从调度器中移除任务（非主节点上无本地任务，由主节点同步移除）"""
+        return self._unregister(str(task_id))
+
+    # ──────────────────────────────────────────
+    # 定时任务入口
+    # ──────────────────────────────────────────
+
+    def _run_job(self, task_id: int) -> bool:
+        """APScheduler 回调：确认仍是主节点后，在 app context 中执行任务"""
+        with self.app.app_context():
+            if not self._renew_lease():
+                logger.warning(f"已不是调度主节点，跳过任务 ID={task_id}")
+                self.is_leader = False
+                self._clear_jobs()
+                return False
+            return self._run_scheduled_report(task_id)
+
     # ──────────────────────────────────────────
     # 定时任务执行体
     # ──────────────────────────────────────────
@@ -130,8 +297,6 @@ class TaskScheduler:
             conditions = task.get_conditions()
 
             # ── 步骤 1：抓取数据 ────────────────────────────
-            import config
-
             max_retries = config.spider.MAX_RETRIES if not is_test else 1
             retry_interval = config.spider.RETRY_INTERVAL
 
@@ -140,7 +305,7 @@ class TaskScheduler:
                 try:
                     from apps.spider import run_workflow
 
-                    df_filtered, _ = run_workflow(
+                    df_filtered, crawled_at = run_workflow(
                         premium_min=conditions.get("premium_min"),
                         status_filter=conditions.get("status_filter"),
                     )
@@ -163,20 +328,26 @@ class TaskScheduler:
                 error_msg = "数据抓取失败"
                 return False
 
+            # 源数据与上次抓取一致：快照无需重写，日志记为 unchanged
+            unchanged = bool(df_filtered.attrs.get("unchanged"))
+
             # ── 步骤 2：保存历史快照 ─────────────────────
             try:
                 from models import FundSnapshot
 
-                FundSnapshot.save_from_df(df_filtered)
+                self._save_snapshot(df_filtered, crawled_at, unchanged=unchanged)
                 # 清理过期快照
                 deleted = FundSnapshot.cleanup_old_snapshots(
                     config.snapshot_cfg.KEEP_DAYS
                 )
                 if deleted > 0:
+                    latest_view.invalidate()
                     logger.info(f"已清理 {deleted} 条过期快照")
             except Exception as e:
                 logger.warning(f"快照保存失败（非致命）: {e}")
 
+            df_filtered = self._filter_by_zscore(df_filtered, conditions)
+
             # ── 步骤 3：发送通知 ─────────────────────────
             if not df_filtered.empty:
                 filtered_count = len(df_filtered)
@@ -210,6 +381,9 @@ class TaskScheduler:
             task.last_run = datetime.now()
             db.session.commit()
 
+            if unchanged:
+                status = "unchanged"
+
         except Exception as e:
             logger.error(f"任务执行异常: {e}", exc_info=True)
             status = "error"
@@ -233,7 +407,61 @@ class TaskScheduler:
                     logger.error(f"日志写入失败: {e}")
                     db.session.rollback()
 
-        return status == "success"
+        return status in ("success", "unchanged")
+
+    @staticmethod
+    def _save_snapshot(
+        df_filtered: pd.DataFrame, crawled_at: str = None, unchanged: bool = False
+    ) -> None:
+        """
+        用本次抓取的完整清洗数据保存快照，并追加一批盘中记录。
+
+        多个任务共享一次抓取时各自的筛选条件不同，快照必须是全量数据，
+        否则后保存的任务会把其他任务关注的基金从当日快照中删掉。
+        同一份数据重复 upsert 是幂等的，共享抓取的任务也各自保存一次，
+        保证随后的今日/前日对比读到的是本次数据。
+
+        unchanged（源数据与上次抓取一致）时仅在今日快照已存在时跳过写入：
+        新交易日的首次抓取常与前一晚相同，仍须写入今日快照，否则今日/前日对比为空。
+        """
+        from apps.spider.parser import last_clean_frame
+        from models import FundSnapshot, FundTick
+
+        df_all = last_clean_frame()
+        if df_all is None:
+            df_all = df_filtered
+        if unchanged and FundSnapshot.has_date():
+            logger.info("jisilu 数据未变化且今日快照已存在，跳过快照保存")
+        else:
+            FundSnapshot.save_from_df(df_all)
+            latest_view.invalidate()
+        FundTick.append_from_df(df_all, crawled_at)
+
+    @staticmethod
+    def _filter_by_zscore(df_filtered: pd.DataFrame, conditions: dict) -> pd.DataFrame:
+        """
+        条件含 zscore_min 时，只保留最新溢价率滚动 z-score 不低于该值的基金
+        （与溢价率 / 申购状态条件同时满足）。须在保存快照之后调用，统计才包含本次数据。
+
+        统计不可用时记录警告并保持原筛选结果，不因分析失败漏发通知。
+        """
+        zscore_min = conditions.get("zscore_min")
+        if zscore_min in (None, "") or df_filtered.empty:
+            return df_filtered
+
+        from apps.analytics import rolling_stats
+
+        try:
+            zscore_min = float(zscore_min)
+            stats = rolling_stats.current()
+        except Exception as e:
+            logger.warning(f"z-score 条件无法计算，忽略该条件: {e}")
+            return df_filtered
+
+        hits = stats.index[stats["zscore"] >= zscore_min]
+        filtered = df_filtered[df_filtered["代码"].astype(str).isin(hits)]
+        logger.info(f"z-score ≥ {zscore_min}：{len(df_filtered)} → {len(filtered)} 只基金")
+        return filtered
 
     def _send_alert(self, recipients: list, title: str, content: str):
         """发送告警通知"""
@@ -267,10 +495,10 @@ class TaskScheduler:
             )
             # 保存快照
             try:
-                from models import FundSnapshot
-                FundSnapshot.save_from_df(df_filtered)
+                self._save_snapshot(df_filtered)
             except Exception as e:
                 logger.warning(f"快照保存失败: {e}")
+            df_filtered = self._filter_by_zscore(df_filtered, conditions)
 
             # 获取带变化对比的数据
             try:
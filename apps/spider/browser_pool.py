@@ -0,0 +1,161 @@
+"""
+无头浏览器池 - 长驻 Playwright Chromium
+登录重试与 HTML 降级抓取复用同一个浏览器/上下文，避免每次冷启动。
+
+Playwright 同步 API 绑定创建它的线程，因此所有浏览器操作都投递到
+池内专属的单线程执行器中运行，调用方可以来自任意线程（调度器、请求线程）。
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """
+    长驻浏览器池（单浏览器 + 单上下文）。
+
+    - 首次使用时启动 Chromium，之后复用
+    - 空闲超过 idle_timeout 秒自动关闭，下次使用再启动
+    - 累计使用 max_uses 次后回收重建，防止内存泄漏
+    """
+
+    def __init__(self, idle_timeout: int = 300, max_uses: int = 50):
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="browser-pool"
+        )
+        self._lock = threading.Lock()
+        self._idle_timer: threading.Timer | None = None
+        self._last_used = 0.0
+        # 以下对象只能在池线程内访问
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._uses = 0
+
+    # ──────────────────────────────────────────
+    # 对外接口
+    # ──────────────────────────────────────────
+
+    def run(self, func: Callable[[Any], Any], timeout: float = 120) -> Any:
+        """
+        在池线程中执行 func(context) 并返回结果。
+
+        func 内可自由创建/关闭 page，但不要关闭 context 本身。
+        """
+        with self._lock:
+            self._cancel_idle_timer()
+        try:
+            future = self._executor.submit(self._run_in_thread, func)
+            return future.result(timeout=timeout)
+        finally:
+            with self._lock:
+                self._last_used = time.monotonic()
+                self._schedule_idle_timer()
+
+    def close(self) -> None:
+        """立即关闭浏览器（下次 run 时会重新启动）。"""
+        with self._lock:
+            self._cancel_idle_timer()
+        if not self.is_running:
+            return
+        try:
+            self._executor.submit(self._shutdown_in_thread).result(timeout=30)
+        except Exception as e:
+            logger.warning(f"关闭浏览器池失败: {e}")
+
+    @property
+    def is_running(self) -> bool:
+        return self._browser is not None
+
+    # ──────────────────────────────────────────
+    # 池线程内部实现
+    # ──────────────────────────────────────────
+
+    def _run_in_thread(self, func: Callable[[Any], Any]) -> Any:
+        if self._context is not None and self._uses >= self.max_uses:
+            logger.info(f"浏览器已使用 {self._uses} 次，回收重建")
+            self._shutdown_in_thread()
+        if self._context is None:
+            self._start_in_thread()
+        self._uses += 1
+        try:
+            return func(self._context)
+        except Exception:
+            # 浏览器崩溃/断开时下次重建
+            if self._browser is not None and not self._browser.is_connected():
+                logger.warning("浏览器连接已断开，将在下次使用时重建")
+                self._shutdown_in_thread()
+            raise
+
+    def _start_in_thread(self) -> None:
+        from playwright.sync_api import sync_playwright
+
+        start = time.perf_counter()
+        self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True)
+        self._context = self._browser.new_context()
+        self._uses = 0
+        logger.info(f"无头浏览器已启动，耗时 {time.perf_counter() - start:.2f}s")
+
+    def _shutdown_in_thread(self) -> None:
+        for obj, name in (
+            (self._context, "context"),
+            (self._browser, "browser"),
+        ):
+            if obj is not None:
+                try:
+                    obj.close()
+                except Exception as e:
+                    logger.debug(f"关闭 {name} 出错: {e}")
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception as e:
+                logger.debug(f"停止 playwright 出错: {e}")
+        if self._browser is not None:
+            logger.info("无头浏览器已关闭")
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._uses = 0
+
+    # ──────────────────────────────────────────
+    # 空闲关闭
+    # ──────────────────────────────────────────
+
+    def _schedule_idle_timer(self) -> None:
+        self._cancel_idle_timer()
+        timer = threading.Timer(self.idle_timeout, self._on_idle)
+        timer.daemon = True
+        timer.start()
+        self._idle_timer = timer
+
+    def _cancel_idle_timer(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _on_idle(self) -> None:
+        with self._lock:
+            if time.monotonic() - self._last_used < self.idle_timeout:
+                return
+            self._idle_timer = None
+        logger.info(f"浏览器空闲超过 {self.idle_timeout}s，自动关闭")
+        self._executor.submit(self._shutdown_in_thread)
+
+
+# 全局单例
+browser_pool = BrowserPool(
+    idle_timeout=config.spider.BROWSER_IDLE_TIMEOUT,
+    max_uses=config.spider.BROWSER_MAX_USES,
+)
+atexit.register(browser_pool.close)
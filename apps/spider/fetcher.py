@@ -2,25 +2,72 @@
 数据抓取器 - Playwright 浏览器自动化
 所有路径通过 config.spider 管理，无硬编码。
 """
+import hashlib
 import io
+import json
 import logging
 import os
 import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
 import numpy as np
+import requests
 from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
 
 import config
+from . import storage
+from .browser_pool import browser_pool
+from .progress import StageCallback, emit
 
 logger = logging.getLogger(__name__)
 
 # Cookie 缓存文件路径
 _COOKIE_FILE = config.spider.DATA_DIR / ".jisilu_cookies.pkl"
 
+# API 市场标签页：对应关系 #qdiie → E(欧美) + C(商品), #qdiia → A(亚洲)
+API_MARKETS = [
+    ("E", "欧美市场"),
+    ("C", "商品市场"),
+    ("A", "亚洲市场"),
+]
+
+# 共享的 keep-alive 会话（进程内复用 TCP/TLS 连接）
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+# 最近一次抓取各市场的耗时（秒），供日志/进度展示使用
+last_fetch_timings: dict[str, float] = {}
+
+# 各市场上次成功响应的校验信息：{suffix: {"etag", "last_modified", "digest", "rows"}}
+# 用于条件请求（If-None-Match / If-Modified-Since）和内容哈希比对
+_api_state: dict[str, dict] = {}
+_api_state_lock = threading.Lock()
+
+# 上一次 API 抓取得到的原始数据（数据未变化时直接复用）
+_last_raw: pd.DataFrame | None = None
+
+
+def _get_session() -> requests.Session:
+    """获取进程级共享的 HTTP 会话，连接池大小与市场数一致。"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=max(len(API_MARKETS), config.spider.API_POOL_SIZE),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
 
 def _get_login_credentials() -> tuple[str, str] | None:
     """从环境变量获取登录凭证。"""
@@ -75,7 +122,7 @@ def _is_logged_in(context) -> bool:
 def _login(context) -> bool:
     """
     尝试用用户名密码登录 jisilu.cn。
-    返回是否登录成功。
+    返回是否登录成功；成功时 Cookie 已写入 _COOKIE_FILE（调用方从文件重新加载）。
 
     注意：集思录可能在多次失败后要求图形验证码，
     此时登录会超时，但 Session Cookie 仍可能保存部分有效数据。
@@ -97,6 +144,8 @@ def _login(context) -> bool:
         if page.url != "https://www.jisilu.cn/login/" and "/login" not in page.url:
             logger.info("Cookie 已登录，跳过表单登录")
             page.close()
+            # 浏览器池的上下文长期存活，登录态可能比 Cookie 文件新，同样写回缓存
+            _save_cookies(context)
             return True
 
         # 检查是否有登录表单
@@ -131,73 +180,194 @@ def _login(context) -> bool:
         return False
 
 
-def _fetch_api(suffix: str, headers: dict) -> list[dict]:
-    """通过 JSON API 获取指定市场数据。返回空列表表示需要重新登录。"""
-    import requests
+def _rows_digest(rows: list[dict]) -> str:
+    """计算 rows 内容哈希（只哈希数据行，忽略响应外层可能变化的字段）。"""
+    payload = json.dumps(rows, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _api_failed(suffix: str) -> tuple[list[dict], bool]:
+    """
+    市场抓取失败：丢弃该市场的校验信息后返回空结果。
+
+    否则恢复后的首次抓取会与失败前的摘要比对，把缺失该市场的
+    上次原始数据当作"未变化"复用。
+    """
+    with _api_state_lock:
+        _api_state.pop(suffix, None)
+    return [], False
+
+
+def _fetch_api(suffix: str, headers: dict) -> tuple[list[dict], bool]:
+    """
+    通过 JSON API 获取指定市场数据。
+
+    返回: (rows, unchanged)
+        rows 为空列表表示抓取失败（可能需要重新登录），同时丢弃该市场的校验信息；
+        unchanged 为 True 表示内容与上次成功抓取一致（304 或哈希相同）。
+    """
     url = f"https://www.jisilu.cn/data/qdii/qdii_list/{suffix}"
+    with _api_state_lock:
+        state = dict(_api_state.get(suffix, {}))
+
+    req_headers = dict(headers)
+    if state.get("etag"):
+        req_headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        req_headers["If-Modified-Since"] = state["last_modified"]
+
     try:
-        r = requests.get(url, headers=headers, timeout=15)
+        r = _get_session().get(url, headers=req_headers, timeout=config.spider.API_TIMEOUT)
+        if r.status_code == 304 and state.get("rows"):
+            logger.info(f"API {suffix}: 304 Not Modified")
+            return state["rows"], True
         if r.status_code == 200:
             data = r.json()
             if data.get("isError"):
                 msg = data.get("msg", "")
                 if "登录" in msg:
                     logger.warning(f"API {suffix}: Cookie 已过期，需要重新登录")
-                    return []  # 触发重新登录
+                    return _api_failed(suffix)  # 触发重新登录
                 logger.warning(f"API {suffix} 错误: {msg}")
-                return []
-            return data.get("rows", [])
+                return _api_failed(suffix)
+            rows = data.get("rows", [])
+            if not rows:
+                return _api_failed(suffix)
+            digest = _rows_digest(rows)
+            unchanged = digest == state.get("digest")
+            with _api_state_lock:
+                _api_state[suffix] = {
+                    "etag": r.headers.get("ETag"),
+                    "last_modified": r.headers.get("Last-Modified"),
+                    "digest": digest,
+                    "rows": rows,
+                }
+            return rows, unchanged
         elif r.status_code in (401, 403):
             logger.warning(f"API {suffix}: HTTP {r.status_code}，Cookie 无效")
-            return []
+            return _api_failed(suffix)
         else:
             logger.warning(f"API {suffix} 返回状态码 {r.status_code}")
-            return []
+            return _api_failed(suffix)
     except Exception as e:
         logger.warning(f"API {suffix} 请求失败: {e}")
-        return []
+        return _api_failed(suffix)
+
+
+def _fetch_api_timed(
+    suffix: str, headers: dict, label: str = "", on_stage: StageCallback = None
+) -> tuple[list[dict], bool, float]:
+    """调用 _fetch_api 并记录耗时（秒），完成时上报 fetch 阶段。"""
+    start = time.perf_counter()
+    rows, unchanged = _fetch_api(suffix, headers)
+    elapsed = time.perf_counter() - start
+    emit(
+        on_stage, "fetch",
+        f"[{label}] {len(rows)} 行{'（未变化）' if unchanged else ''}，耗时 {elapsed:.2f}s",
+        market=label, rows=len(rows), unchanged=unchanged, elapsed=round(elapsed, 3),
+    )
+    return rows, unchanged, elapsed
+
+
+def _fetch_markets(
+    headers: dict, on_stage: StageCallback = None
+) -> list[tuple[str, list[dict], bool]]:
+    """
+    并发抓取全部市场，共享同一个 keep-alive 会话。
+
+    返回: [(label, rows, unchanged), ...]，顺序与 API_MARKETS 一致
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(
+        max_workers=len(API_MARKETS), thread_name_prefix="jisilu-api"
+    ) as pool:
+        futures = [
+            pool.submit(_fetch_api_timed, suffix, headers, label, on_stage)
+            for suffix, label in API_MARKETS
+        ]
+        results = [f.result() for f in futures]
+
+    timings = {}
+    markets = []
+    for (suffix, label), (rows, unchanged, elapsed) in zip(API_MARKETS, results):
+        timings[label] = round(elapsed, 3)
+        logger.info(
+            f"API [{label}] 耗时 {elapsed:.2f}s，返回 {len(rows)} 行"
+            f"{'（未变化）' if unchanged else ''}"
+        )
+        markets.append((label, rows, unchanged))
+
+    last_fetch_timings.clear()
+    last_fetch_timings.update(timings)
+    logger.info(f"并发抓取 {len(API_MARKETS)} 个市场总耗时 {time.perf_counter() - start:.2f}s")
+    return markets
+
+
+# API cell 字段 → 原始数据列名（顺序即输出列顺序）
+# "名称"、"溢价率"、"溢价率_t1"、"来源" 需要特殊处理，不在此表中
+_API_TEXT_FIELDS = {
+    "代码": "fund_id",
+    "溢价率_str": "nav_discount_rt",
+    "当前价": "price",
+    "最新净值": "fund_nav",
+    "净值日期": "nav_dt",
+    "T-2净值": "fund_nav",
+    "T-2净值日期": "nav_dt",
+    "参考指数": "index_nm",
+    "参考指数涨跌幅": "ref_increase_rt",
+    "申购状态": "apply_status",
+    "赎回状态": "redeem_status",
+    "管理费": "m_fee",
+    "托管费": "mt_fee",
+    "成交额(万)": "volume",
+}
+_API_RAW_COLUMNS = [
+    "代码", "名称", "溢价率", "溢价率_str", "当前价", "最新净值", "净值日期",
+    "T-2净值", "T-2净值日期", "参考指数", "参考指数涨跌幅", "申购状态",
+    "赎回状态", "管理费", "托管费", "成交额(万)", "溢价率_t1", "来源",
+]
 
 
 def _api_rows_to_df(rows: list, source: str) -> pd.DataFrame:
-    """将 API 行数据转换为 DataFrame。"""
-    records = []
-    for row in rows:
-        cell = row.get("cell", {})
-        premium_str = cell.get("nav_discount_rt", "")
-        # 溢价率可能是 "-" 或空
-        try:
-            premium = float(premium_str)
-        except (TypeError, ValueError):
-            premium = None
-        records.append({
-            "代码": cell.get("fund_id", ""),
-            "名称": cell.get("fund_nm_color", "") or cell.get("fund_nm", ""),
-            "溢价率": premium,
-            "溢价率_str": premium_str,
-            "当前价": cell.get("price", ""),
-            "最新净值": cell.get("fund_nav", ""),
-            "净值日期": cell.get("nav_dt", ""),
-            "T-2净值": cell.get("fund_nav", ""),
-            "T-2净值日期": cell.get("nav_dt", ""),
-            "参考指数": cell.get("index_nm", ""),
-            "参考指数涨跌幅": cell.get("ref_increase_rt", ""),
-            "申购状态": cell.get("apply_status", ""),
-            "赎回状态": cell.get("redeem_status", ""),
-            "管理费": cell.get("m_fee", ""),
-            "托管费": cell.get("mt_fee", ""),
-            "成交额(万)": cell.get("volume", ""),
-            "溢价率_t1": None,  # API 只提供 T-2
-            "来源": source,
-        })
-    return pd.DataFrame(records)
-
-
-def fetch_qdii_data() -> pd.DataFrame:
+    """
+    将 API 行数据转换为 DataFrame（列式构建）。
+
+    按字段一次性展开所有 cell 为列数组，溢价率用 pd.to_numeric 向量化解析，
+    最后一次性构建 DataFrame，输出列与旧版逐行构建完全一致。
+    """
+    if not rows:
+        return pd.DataFrame()
+
+    cells = [row.get("cell") or {} for row in rows]
+    # 每个字段只展开一次（fund_nav / nav_dt 在输出中各出现两次）
+    values = {
+        field: [c.get(field, "") for c in cells]
+        for field in set(_API_TEXT_FIELDS.values())
+    }
+    columns = {col: values[field] for col, field in _API_TEXT_FIELDS.items()}
+    # 名称优先取带颜色标记的 fund_nm_color，为空时回退 fund_nm
+    columns["名称"] = [c.get("fund_nm_color", "") or c.get("fund_nm", "") for c in cells]
+    # 溢价率可能是 "-" 或空，无法解析的记为 NaN
+    columns["溢价率"] = pd.to_numeric(
+        pd.Series(values["nav_discount_rt"], dtype=object), errors="coerce"
+    ).to_numpy()
+    columns["溢价率_t1"] = [None] * len(cells)  # API 只提供 T-2
+    columns["来源"] = [source] * len(cells)
+    return pd.DataFrame(columns, columns=_API_RAW_COLUMNS)
+
+
+def fetch_qdii_data(on_stage: StageCallback = None) -> pd.DataFrame:
     """
     通过 JSON API 抓取 jisilu.cn QDII 基金数据。
     优先使用 API，失败则降级为 Playwright HTML 抓取。
+    三个市场通过共享会话并发请求，总耗时约等于最慢的市场。
+
+    若所有市场内容都与上次一致（304 或内容哈希相同），直接返回上次的
+    原始数据并设置 df.attrs["unchanged"] = True，不再重复保存 CSV。
+
+    on_stage: 阶段回调（fetch / login / fallback），见 apps.spider.progress
     """
-    import requests
+    global _last_raw
 
     config.spider.DATA_DIR.mkdir(parents=True, exist_ok=True)
     now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -224,17 +394,20 @@ def fetch_qdii_data() -> pd.DataFrame:
     if cookie_str:
         base_headers["Cookie"] = cookie_str
 
-    # ── API 抓取（3个市场标签页） ─────────────────────────────
-    # 对应关系：#qdiie → E(欧美) + C(商品), #qdiia → A(亚洲)
-    api_map = [
-        ("E", "欧美市场"),
-        ("C", "商品市场"),
-        ("A", "亚洲市场"),
-    ]
-
+    # ── API 抓取（3个市场标签页，并发） ───────────────────────
     api_success = False
-    for suffix, label in api_map:
-        rows = _fetch_api(suffix, base_headers)
+    markets = _fetch_markets(base_headers, on_stage)
+    # 本次每个市场都返回了数据（才可作为下次"未变化"时复用的原始数据）
+    api_complete = all(rows for _, rows, _ in markets)
+
+    # 所有市场都未变化：复用上次的原始数据，跳过转换与保存
+    if _last_raw is not None and all(rows and unchanged for _, rows, unchanged in markets):
+        logger.info("所有市场数据与上次抓取一致，跳过后续处理")
+        df_raw = _last_raw.copy(deep=False)
+        df_raw.attrs["unchanged"] = True
+        return df_raw
+
+    for label, rows, _ in markets:
         if rows:
             df = _api_rows_to_df(rows, label)
             if not df.empty:
@@ -247,78 +420,97 @@ def fetch_qdii_data() -> pd.DataFrame:
     # ── Cookie 过期：尝试用户名密码登录 ───────────────────────
     if not api_success and _get_login_credentials():
         logger.info("Cookie 可能过期，尝试用户名密码登录...")
+        emit(on_stage, "login", "Cookie 可能过期，尝试用户名密码登录...")
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context()
-                if _login(context):
-                    # 登录成功，重新构建 Cookie
-                    new_cookies = context.cookies()
-                    _save_cookies(context)
-                    # 从新保存的 Cookie 文件重新加载（确保格式正确）
-                    new_cache = pickle.loads(_COOKIE_FILE.read_bytes())
-                    cookie_str = "; ".join(f"{c['name']}={c['value']}" for c in new_cache)
-                    base_headers["Cookie"] = cookie_str
-                    # 重试 API
-                    for suffix, label in api_map:
-                        rows = _fetch_api(suffix, base_headers)
-                        if rows:
-                            df = _api_rows_to_df(rows, label)
-                            if not df.empty:
-                                all_raw.append(df)
-                                logger.info(f"重试抓取 [{label}] 成功: {len(df)} 条")
-                                api_success = True
-                browser.close()
+            logged_in = browser_pool.run(_login)
+            if logged_in and not _COOKIE_FILE.exists():
+                logger.warning("登录成功但 Cookie 未能缓存，跳过 API 重试")
+            elif logged_in:
+                # 登录成功（_login 已保存 Cookie），从缓存文件重新加载（确保格式正确）
+                new_cache = pickle.loads(_COOKIE_FILE.read_bytes())
+                cookie_str = "; ".join(f"{c['name']}={c['value']}" for c in new_cache)
+                base_headers["Cookie"] = cookie_str
+                # 重试 API
+                markets = _fetch_markets(base_headers, on_stage)
+                api_complete = all(rows for _, rows, _ in markets)
+                for label, rows, _ in markets:
+                    if rows:
+                        df = _api_rows_to_df(rows, label)
+                        if not df.empty:
+                            all_raw.append(df)
+                            logger.info(f"重试抓取 [{label}] 成功: {len(df)} 条")
+                            api_success = True
         except Exception as e:
             logger.error(f"用户名密码登录尝试失败: {e}")
 
     # ── 降级：Playwright HTML 抓取 ─────────────────────────────
     if not api_success:
         logger.warning("API 抓取失败，降级为 Playwright HTML 抓取")
+        emit(on_stage, "fallback", "API 抓取失败，降级为浏览器抓取...")
+        fallback_start = time.perf_counter()
         _fetch_via_playwright(all_raw, now_str)
+        emit(
+            on_stage, "fallback",
+            f"浏览器抓取完成，耗时 {time.perf_counter() - fallback_start:.2f}s",
+            rows=sum(len(df) for df in all_raw),
+            elapsed=round(time.perf_counter() - fallback_start, 3),
+        )
 
     if all_raw:
         df_raw = pd.concat(all_raw, ignore_index=True)
-        raw_path = config.spider.DATA_DIR / f"qdii_all_raw_{now_str}.csv"
-        df_raw.to_csv(raw_path, index=False, encoding="utf-8-sig")
+        raw_path = storage.save_raw(df_raw, now_str)
         logger.info(f"原始数据已保存: {raw_path}")
+        # 只缓存各市场都成功的纯 API 结果；部分市场失败或 HTML 降级的数据不参与变化比对，
+        # 否则之后各市场"未变化"时会复用缺失市场的数据
+        _last_raw = df_raw if api_success and api_complete else None
         return df_raw
     else:
         logger.error("未抓取到任何数据")
+        # 抓取全部失败：清空变化比对状态，恢复后的首次抓取必须完整处理，
+        # 不能因摘要未变而复用失败前的数据
+        _last_raw = None
+        with _api_state_lock:
+            _api_state.clear()
         return pd.DataFrame()
 
 
 def _fetch_via_playwright(all_raw: list, now_str: str) -> None:
-    """降级方案：通过 Playwright 解析 HTML 获取数据。"""
+    """降级方案：通过 Playwright 解析 HTML 获取数据（复用浏览器池）。"""
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context()
-            page = context.new_page()
-
-            _load_cached_cookies(context)
-
-            for url, labels in config.spider.JISILU_URLS:
-                page.goto(url, wait_until="networkidle", timeout=30000)
-                page.wait_for_selector("table", timeout=15000)
-                html = page.content()
-                soup = BeautifulSoup(html, "html.parser")
-                tables = soup.find_all("table")
-
-                if not tables:
-                    continue
-
-                for i, label in enumerate(labels):
-                    if i >= len(tables):
-                        break
-                    try:
-                        df = pd.read_html(io.StringIO(str(tables[i])), header=1)[0]
-                        df.insert(0, "来源", label)
-                        all_raw.append(df)
-                        logger.info(f"Playwright 抓取 [{label}]: {len(df)} 条")
-                    except Exception as e:
-                        logger.warning(f"表格解析失败 [{label}]: {e}")
-
-            browser.close()
+        pages_html = browser_pool.run(_render_jisilu_pages)
     except Exception as e:
         logger.error(f"Playwright 降级抓取失败: {e}")
+        return
+
+    for html, labels in pages_html:
+        soup = BeautifulSoup(html, "html.parser")
+        tables = soup.find_all("table")
+
+        if not tables:
+            continue
+
+        for i, label in enumerate(labels):
+            if i >= len(tables):
+                break
+            try:
+                df = pd.read_html(io.StringIO(str(tables[i])), header=1)[0]
+                df.insert(0, "来源", label)
+                all_raw.append(df)
+                logger.info(f"Playwright 抓取 [{label}]: {len(df)} 条")
+            except Exception as e:
+                logger.warning(f"表格解析失败 [{label}]: {e}")
+
+
+def _render_jisilu_pages(context) -> list[tuple[str, list[str]]]:
+    """在浏览器池线程中渲染各 QDII 页面，返回 [(html, labels), ...]。"""
+    _load_cached_cookies(context)
+    page = context.new_page()
+    try:
+        results = []
+        for url, labels in config.spider.JISILU_URLS:
+            page.goto(url, wait_until="networkidle", timeout=30000)
+            page.wait_for_selector("table", timeout=15000)
+            results.append((page.content(), labels))
+        return results
+    finally:
+        page.close()
@@ -2,16 +2,19 @@
 数据解析器 - 清洗与筛选
 """
 import logging
-from pathlib import Path
+import threading
+import time
+from typing import NamedTuple
 
 import pandas as pd
-import numpy as np
 
 import config
+from . import storage
+from .progress import StageCallback, emit
 
 logger = logging.getLogger(__name__)
 
-# 目标列名（清洗后标准列名）
+# 目标列名（HTML 降级格式清洗后保留的列）
 TARGET_COLS = ["代码", "名称", "T-2净值 溢价率", "申购状态", "来源"]
 # jisilu.cn HTML 表格实际列名映射
 HTML_COL_MAP = {
@@ -24,6 +27,43 @@ HTML_COL_MAP = {
 # 需要过滤掉的占位符值
 PLACEHOLDER_VALUES = {"登录", "会员", "-"}
 
+# 清洗后标准列定义：列名 → dtype（顺序即输出顺序）
+# 低基数文本用 category；溢价率会进入 JSON / 报告，保持 float64；
+# 净值、涨跌幅只用于展示，保留原文本（不逐行解析）
+CLEAN_SCHEMA = {
+    "代码": "str",
+    "名称": "str",
+    "溢价率": "float64",
+    "净值": "str",
+    "净值日期": "str",
+    "参考指数": "str",
+    "参考指数涨跌幅": "str",
+    "申购状态": "category",
+    "赎回状态": "category",
+    "来源": "category",
+}
+# 原始列名 → 标准列名
+_SOURCE_RENAME = {
+    "T-2净值": "净值",
+    "T-2净值 溢价率": "溢价率",
+}
+
+
+def _to_numeric(series: pd.Series) -> pd.Series:
+    """数值列解析：兼容 "1.23%"、"-"、"登录" 等文本，无法解析的记为 NaN。"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return pd.to_numeric(series.astype(str).str.rstrip("%"), errors="coerce")
+
+
+def _coerce(series: pd.Series, dtype: str) -> pd.Series:
+    """按 CLEAN_SCHEMA 声明的类型转换单列（类型已符合时不复制）。"""
+    if dtype.startswith("float"):
+        return _to_numeric(series).astype(dtype, copy=False)
+    if dtype == "str" and pd.api.types.is_string_dtype(series):
+        return series
+    return series.astype(dtype)
+
 
 def clean_and_extract(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -35,80 +75,81 @@ def clean_and_extract(df: pd.DataFrame) -> pd.DataFrame:
     2. HTML 格式（降级抓取）：列名含 "T-2净值 溢价率" (带 % 符号，需过滤 "登录" 占位符)
 
     溢价率列需要登录才显示真实数据，未登录时显示"登录"/"会员"等占位符。
+
+    不修改输入 DataFrame：先计算保留行的布尔掩码，按掩码一次取出
+    CLEAN_SCHEMA 需要的列（只分配一次行索引），再逐列转换类型。
     """
     if df.empty:
         return pd.DataFrame()
 
-    df = df.copy()
-
     # ── 判断数据格式 ───────────────────────────────────────────
     has_api_premium = "溢价率" in df.columns and "溢价率_str" in df.columns
     has_html_premium = "T-2净值 溢价率" in df.columns
 
     if has_api_premium:
-        # API 格式：溢价率已是数值（float 或 None）
-        rate_col = "溢价率"
-        df[rate_col] = pd.to_numeric(df[rate_col], errors="coerce")
-
-        # 只保留有溢价率数值的行（过滤掉无法计算的）
-        before = len(df)
-        df = df.dropna(subset=[rate_col])
-        after = len(df)
-        if before != after:
-            logger.info(f"过滤无溢价率数据行：{before} → {after}")
-
-        # 统一列名
-        if "T-2净值" in df.columns:
-            df = df.rename(columns={"T-2净值": "净值"})
-
-        out_cols = ["代码", "名称", "溢价率", "净值", "净值日期", "参考指数",
-                    "参考指数涨跌幅", "申购状态", "赎回状态", "来源"]
-        out_cols = [c for c in out_cols if c in df.columns]
-        df = df[out_cols].copy()
+        # API 格式：溢价率已是数值（float 或 None），只保留有溢价率数值的行
+        premium = _to_numeric(df["溢价率"])
+        converted = {"溢价率": premium}
+        keep = premium.notna()
+        if not keep.all():
+            logger.info(f"过滤无溢价率数据行：{len(df)} → {int(keep.sum())}")
 
     elif has_html_premium:
         # HTML 格式：需自动定位表头
         for i in range(min(5, len(df))):
             row_vals = df.iloc[i].astype(str).tolist()
             if all(col in row_vals for col in ["代码", "名称", "T-2净值 溢价率"]):
-                df.columns = df.iloc[i].tolist()
-                df = df.iloc[i + 1:].reset_index(drop=True)
+                header = df.iloc[i].tolist()
+                df = df.iloc[i + 1:].set_axis(header, axis=1)
                 logger.info(f"自动表头定位成功，跳过前 {i+1} 行")
                 break
 
-        rate_col = "T-2净值 溢价率"
-        status_col = "申购状态"
-
-        # 过滤登录占位符行
-        if rate_col in df.columns:
-            df = df[~df[rate_col].isin(PLACEHOLDER_VALUES)].copy()
-            logger.info(f"过滤登录占位符后剩余 {len(df)} 条")
-
-        # 溢价率去掉 % 符号并转为数值
-        if rate_col in df.columns:
-            df[rate_col] = (
-                df[rate_col]
-                .replace("-", np.nan)
-                .astype(str)
-                .str.rstrip("%")
-            )
-            df[rate_col] = pd.to_numeric(df[rate_col], errors="coerce")
+        # 过滤登录占位符行，溢价率去掉 % 符号并转为数值
+        rate = df["T-2净值 溢价率"]
+        keep = ~rate.isin(PLACEHOLDER_VALUES)
+        premium = _to_numeric(rate)
+        converted = {"溢价率": premium}
+        logger.info(f"过滤登录占位符后剩余 {int(keep.sum())} 条")
 
         # 清理申购状态字段
-        if status_col in df.columns:
-            df[status_col] = df[status_col].astype(str).str.strip()
-
-        # 统一溢价率列名
-        df = df.rename(columns={"T-2净值 溢价率": "溢价率"})
-
-        out_cols = [c for c in TARGET_COLS if c in df.columns]
-        df = df[out_cols].copy()
+        if "申购状态" in df.columns:
+            converted["申购状态"] = df["申购状态"].astype(str).str.strip()
+        # HTML 格式只保留 TARGET_COLS 对应列
+        df = df[[c for c in TARGET_COLS if c in df.columns]]
     else:
         logger.warning(f"无法识别数据格式，列名: {list(df.columns)}")
+        return df.dropna(subset=["代码", "名称"])
+
+    # 去掉代码/名称为空的行
+    keep &= df["代码"].notna() & df["名称"].notna()
+
+    # ── 按 schema 组装输出 ─────────────────────────────────────
+    renamed = {_SOURCE_RENAME.get(c, c): c for c in df.columns}
+    cols = [c for c in CLEAN_SCHEMA if c in renamed]
+    out = df.loc[keep, [renamed[c] for c in cols]].set_axis(cols, axis=1)
+    for col in cols:
+        series = converted[col][keep] if col in converted else out[col]
+        out[col] = _coerce(series, CLEAN_SCHEMA[col])
+    return out
 
-    # 去掉全空行
-    df = df.dropna(subset=["代码", "名称"])
-    return df
+
+def _apply_filter(
+    df: pd.DataFrame,
+    premium_min: float = None,
+    status_filter: str = None,
+) -> pd.DataFrame:
+    """按溢价率下限与申购状态筛选（纯内存操作，不写文件）。"""
+    if df.empty or premium_min is None:
+        return df
+
+    # 溢价率筛选（NaN 不参与比较）
+    mask = df["溢价率"].fillna(-999) >= premium_min
+
+    # 状态筛选
+    if status_filter and status_filter != "all":
+        mask &= df["申购状态"].str.contains(status_filter, na=False)
+
+    return df[mask]
 
 
 def filter_data(
@@ -129,50 +170,145 @@ def filter_data(
 
     if premium_min is None:
         # 无门槛：返回全部清洗后数据
-        df.to_csv(config.spider.output_clean_path, index=False, encoding="utf-8-sig")
-        logger.info(f"无门槛筛选，清洗数据已保存: {config.spider.output_clean_path}")
+        path = storage.save_clean(df)
+        logger.info(f"无门槛筛选，清洗数据已保存: {path}")
         return df
 
-    df = df.copy()
-    # 溢价率筛选（NaN 不参与比较）
-    mask_rate = df["溢价率"].fillna(-999) >= premium_min
-
-    # 状态筛选
-    if status_filter and status_filter != "all":
-        mask_status = df["申购状态"].str.contains(status_filter, na=False)
-        filtered = df[mask_rate & mask_status]
-    else:
-        filtered = df[mask_rate]
+    filtered = _apply_filter(df, premium_min, status_filter)
 
     # 保存筛选结果
     if not filtered.empty:
         # 保存到 qdii_tables/
-        filtered.to_csv(config.spider.output_filtered_path, index=False, encoding="utf-8-sig")
-        logger.info(f"筛选结果已保存: {config.spider.output_filtered_path}，共 {len(filtered)} 条")
+        path = storage.save_filtered(filtered)
+        logger.info(f"筛选结果已保存: {path}，共 {len(filtered)} 条")
 
     # 同时保存清洗后完整数据
-    df.to_csv(config.spider.output_clean_path, index=False, encoding="utf-8-sig")
-    logger.info(f"清洗数据已保存: {config.spider.output_clean_path}")
+    path = storage.save_clean(df)
+    logger.info(f"清洗数据已保存: {path}")
 
     return filtered
 
 
+# ──────────────────────────────────────────
+# 单飞抓取：同一时间窗口内的调用共享一次抓取+清洗
+# ──────────────────────────────────────────
+
+class CrawlResult(NamedTuple):
+    """一次抓取+清洗的结果"""
+    clean: pd.DataFrame
+    now_str: str
+    # 源数据与上一次抓取一致（复用了上次清洗结果）
+    unchanged: bool
+    # 复用了窗口内其他调用方的抓取结果（本次未实际抓取）
+    shared: bool
+
+
+# 上一次清洗结果（源数据未变化时直接复用）
+_last_clean: pd.DataFrame | None = None
+# 最近一次抓取：(完成时刻 monotonic, 结果)
+_last_crawl: tuple[float, CrawlResult] | None = None
+_crawl_lock = threading.Lock()
+
+
+def crawl_shared(max_age: float = None, on_stage: StageCallback = None) -> CrawlResult:
+    """
+    抓取并清洗全部数据；max_age 秒内已有结果时直接复用。
+
+    同时触发的多个调用在锁上排队：第一个实际抓取，其余拿到同一份清洗结果，
+    N 个同时触发的任务只产生一次抓取。
+
+    抓取失败（API 与浏览器降级都未取到数据）时抛出 RuntimeError：
+    空结果不进入复用窗口，也不覆盖上次清洗结果，排队者会各自重试。
+
+    参数:
+        max_age: 结果复用窗口（秒），默认 config.spider.SHARED_CRAWL_WINDOW，0 表示强制抓取
+        on_stage: 阶段回调（fetch / login / fallback / shared / clean）
+    """
+    from apps.spider.fetcher import fetch_qdii_data
+
+    global _last_clean, _last_crawl
+
+    if max_age is None:
+        max_age = config.spider.SHARED_CRAWL_WINDOW
+
+    with _crawl_lock:
+        if _last_crawl is not None and max_age > 0:
+            finished_at, result = _last_crawl
+            age = time.monotonic() - finished_at
+            if age < max_age:
+                logger.info(f"复用 {age:.1f} 秒前的抓取结果（{result.now_str}）")
+                emit(on_stage, "shared", f"复用 {age:.0f} 秒前的抓取结果", age=round(age, 1))
+                return result._replace(shared=True)
+
+        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        df_raw = fetch_qdii_data(on_stage)
+        if df_raw.empty:
+            raise RuntimeError("未抓取到任何数据")
+
+        unchanged = (
+            bool(df_raw.attrs.get("unchanged"))
+            and _last_clean is not None
+            and not _last_clean.empty
+        )
+        if unchanged:
+            logger.info("源数据未变化，复用上次清洗结果")
+            emit(on_stage, "clean", "源数据未变化，复用上次清洗结果", rows=len(_last_clean))
+        else:
+            start = time.perf_counter()
+            _last_clean = clean_and_extract(df_raw)
+            elapsed = time.perf_counter() - start
+            emit(
+                on_stage, "clean", f"清洗完成 {len(_last_clean)} 条，耗时 {elapsed:.2f}s",
+                rows=len(_last_clean), elapsed=round(elapsed, 3),
+            )
+
+        result = CrawlResult(_last_clean, now_str, unchanged, False)
+        _last_crawl = (time.monotonic(), result)
+        return result
+
+
+def last_clean_frame() -> pd.DataFrame | None:
+    """最近一次清洗后的完整数据（未抓取过时为 None）"""
+    return _last_clean
+
+
 def run_workflow(
     premium_min: float = None,
     status_filter: str = None,
+    on_stage: StageCallback = None,
 ) -> tuple[pd.DataFrame, str]:
     """
     运行完整抓取 → 清洗 → 筛选流程。
 
-    返回: (filtered_df, now_str)
+    抓取与清洗经 crawl_shared() 在时间窗口内共享，调用方只做各自的筛选。
+    filtered_df.attrs 标记：
+    - unchanged: jisilu 数据与上次抓取一致，跳过清洗与文件保存
+    - shared: 复用了其他调用方刚完成的抓取，数据文件已由其保存
+
+    on_stage: 阶段回调，各阶段开始/完成时调用，见 apps.spider.progress
+
+    返回: (filtered_df, now_str)；未抓取到任何数据时抛出 RuntimeError
     """
-    from apps.spider.fetcher import fetch_qdii_data
+    from apps.latest_view import latest_view
+
+    result = crawl_shared(on_stage=on_stage)
 
-    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    df_raw = fetch_qdii_data()
-    df_clean = clean_and_extract(df_raw)
-    df_filtered = filter_data(df_clean, premium_min, status_filter)
-    return df_filtered, now_str
+    start = time.perf_counter()
+    if result.unchanged or result.shared:
+        df_filtered = _apply_filter(result.clean, premium_min, status_filter)
+    else:
+        df_filtered = filter_data(result.clean, premium_min, status_filter)
+        latest_view.invalidate()
+    elapsed = time.perf_counter() - start
+    emit(
+        on_stage, "filter", f"筛选出 {len(df_filtered)} 条，耗时 {elapsed:.2f}s",
+        rows=len(df_filtered), elapsed=round(elapsed, 3),
+    )
+
+    df_filtered = df_filtered.copy(deep=False)
+    df_filtered.attrs["unchanged"] = result.unchanged
+    df_filtered.attrs["shared"] = result.shared
+    return df_filtered, result.now_str
 
 
 # 本地 import 避免循环
@@ -0,0 +1,31 @@
+"""
+抓取流程阶段回调
+run_workflow → crawl_shared → fetch_qdii_data 逐层传递可选的 on_stage 回调，
+各阶段开始/完成时调用 on_stage(stage, message, info)，供 SSE 等实时展示进度。
+
+阶段（stage）：
+    fetch     各市场 API 抓取（每个市场完成时一次，info 含 market/rows/elapsed）
+    login     Cookie 失效后用户名密码登录
+    fallback  API 失败，降级为 Playwright HTML 抓取
+    shared    复用窗口内其他调用方的抓取结果
+    clean     数据清洗
+    filter    条件筛选与保存
+
+回调可能在抓取线程池中被调用，实现需线程安全；回调抛出的异常只记录日志，不影响抓取。
+"""
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+StageCallback = Callable[[str, str, dict], None]
+
+
+def emit(on_stage: Optional[StageCallback], stage: str, message: str, **info) -> None:
+    """调用阶段回调（未设置时忽略）"""
+    if on_stage is None:
+        return
+    try:
+        on_stage(stage, message, info)
+    except Exception as e:
+        logger.warning(f"进度回调异常 [{stage}]: {e}")
@@ -0,0 +1,191 @@
+"""
+数据文件存储 - 原始/清洗/筛选数据落盘与读取
+所有路径通过 config.spider 管理，无硬编码。
+
+支持两种后端（config.spider.STORAGE_FORMAT）：
+- csv（默认）：兼容旧版，qdii_all_raw_<ts>.csv / qdii_all_clean.csv / qdii_filtered.csv
+- parquet：列式存储（需安装 pyarrow），按日期分区、zstd 压缩，读取时按列裁剪
+
+Parquet 目录结构：
+    DATA_DIR/parquet/raw/date=2025-05-14/qdii_all_raw_134022.parquet
+    DATA_DIR/parquet/clean/date=2025-05-14/qdii_all_clean.parquet
+    DATA_DIR/parquet/filtered/date=2025-05-14/qdii_filtered.parquet
+"""
+import importlib.util
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_PARQUET_ROOT = "parquet"
+_warned_no_pyarrow = False
+
+
+def _use_parquet() -> bool:
+    """是否启用 Parquet 后端（未安装 pyarrow 时回退 CSV 并只告警一次）。"""
+    global _warned_no_pyarrow
+    if config.spider.STORAGE_FORMAT != "parquet":
+        return False
+    if importlib.util.find_spec("pyarrow") is not None:
+        return True
+    if not _warned_no_pyarrow:
+        logger.warning("STORAGE_FORMAT=parquet 但未安装 pyarrow，回退为 CSV 存储")
+        _warned_no_pyarrow = True
+    return False
+
+
+def _partition_dir(kind: str, date_str: str) -> Path:
+    return config.spider.DATA_DIR / _PARQUET_ROOT / kind / f"date={date_str}"
+
+
+def _arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """原始数据的 object 列可能混合数值与空字符串，统一转为字符串以便写入 Parquet。"""
+    obj_cols = [c for c in df.columns if df[c].dtype == object]
+    if not obj_cols:
+        return df
+    return df.assign(**{
+        c: df[c].where(df[c].isna(), df[c].astype(str)) for c in obj_cols
+    })
+
+
+def _write_parquet(df: pd.DataFrame, path: Path) -> None:
+    """写入临时文件后原子替换，避免其他 worker 读到半个文件。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    _arrow_safe(df).to_parquet(
+        tmp,
+        engine="pyarrow",
+        compression=config.spider.PARQUET_COMPRESSION,
+        index=False,
+    )
+    os.replace(tmp, path)
+
+
+def _latest_parquet(kind: str) -> Optional[Path]:
+    """返回最新日期分区中最新的文件。"""
+    root = config.spider.DATA_DIR / _PARQUET_ROOT / kind
+    if not root.exists():
+        return None
+    for part in sorted(root.glob("date=*"), reverse=True):
+        files = sorted(part.glob("*.parquet"))
+        if files:
+            return files[-1]
+    return None
+
+
+# ──────────────────────────────────────────
+# 写入
+# ──────────────────────────────────────────
+
+def save_raw(df: pd.DataFrame, now_str: str) -> Path:
+    """保存一次抓取的原始数据（每次抓取一个文件）。"""
+    if _use_parquet():
+        date_str = datetime.strptime(now_str, "%Y%m%d_%H%M%S").strftime("%Y-%m-%d")
+        path = _partition_dir("raw", date_str) / f"qdii_all_raw_{now_str[-6:]}.parquet"
+        _write_parquet(df, path)
+        prune_partitions()
+    else:
+        path = config.spider.DATA_DIR / f"qdii_all_raw_{now_str}.csv"
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    return path
+
+
+def save_clean(df: pd.DataFrame) -> Path:
+    """保存清洗后完整数据（同一天覆盖写）。"""
+    if _use_parquet():
+        path = _partition_dir("clean", datetime.now().strftime("%Y-%m-%d")) / "qdii_all_clean.parquet"
+        _write_parquet(df, path)
+    else:
+        path = config.spider.output_clean_path
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    return path
+
+
+def save_filtered(df: pd.DataFrame) -> Path:
+    """保存筛选结果（同一天覆盖写）。"""
+    if _use_parquet():
+        path = _partition_dir("filtered", datetime.now().strftime("%Y-%m-%d")) / "qdii_filtered.parquet"
+        _write_parquet(df, path)
+    else:
+        path = config.spider.output_filtered_path
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    return path
+
+
+# ──────────────────────────────────────────
+# 读取
+# ──────────────────────────────────────────
+
+def clean_path() -> Optional[Path]:
+    """最新清洗数据文件路径，不存在返回 None。"""
+    if _use_parquet():
+        path = _latest_parquet("clean")
+        if path is not None:
+            return path
+    path = config.spider.output_clean_path
+    return path if path.exists() else None
+
+
+def load_clean(columns: list[str] = None) -> Optional[pd.DataFrame]:
+    """
+    读取最新清洗数据。
+
+    参数:
+        columns: 需要的列（不存在的列自动忽略）；Parquet 后端只读取这些列
+    返回: DataFrame；无数据时返回 None
+    """
+    path = clean_path()
+    if path is None:
+        return None
+
+    if path.suffix == ".parquet":
+        if columns is not None:
+            import pyarrow.parquet as pq
+
+            names = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in names]
+        return pd.read_parquet(path, columns=columns)
+
+    if columns is not None:
+        wanted = set(columns)
+        return pd.read_csv(path, usecols=lambda c: c in wanted)
+    return pd.read_csv(path)
+
+
+def clean_updated_at() -> Optional[str]:
+    """最新清洗数据的更新时间（YYYY-MM-DD HH:MM:SS），无数据返回 None。"""
+    path = clean_path()
+    if path is None:
+        return None
+    return datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ──────────────────────────────────────────
+# 清理
+# ──────────────────────────────────────────
+
+def prune_partitions(keep_days: int = None) -> int:
+    """删除超过保留期的 Parquet 日期分区，返回删除的分区数。keep_days<=0 表示不清理。"""
+    if keep_days is None:
+        keep_days = config.spider.STORAGE_KEEP_DAYS
+    if keep_days <= 0:
+        return 0
+
+    cutoff = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+    removed = 0
+    root = config.spider.DATA_DIR / _PARQUET_ROOT
+    for part in root.glob("*/date=*"):
+        if part.name.split("=", 1)[1] < cutoff:
+            shutil.rmtree(part, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"已清理 {removed} 个过期数据分区（保留 {keep_days} 天）")
+    return removed
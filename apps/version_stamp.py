@@ -0,0 +1,50 @@
+"""
+跨进程版本戳
+gunicorn 多个 worker 之间通过 DATA_DIR 下的小文件共享“数据已变化”信号，
+各 worker 只需读取一个文件即可判断进程内缓存是否过期，无需每次查询数据库。
+"""
+import logging
+import os
+import time
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class VersionStamp:
+    """
+    基于文件的单调版本号。
+
+    bump() 写入新版本（原子替换），current() 读取当前版本；
+    文件不存在时版本为 "0"。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def path(self) -> Path:
+        return config.spider.DATA_DIR / ".versions" / self.name
+
+    def current(self) -> str:
+        try:
+            return self.path.read_text(encoding="utf-8").strip() or "0"
+        except FileNotFoundError:
+            return "0"
+        except OSError as e:
+            logger.warning(f"读取版本戳 {self.name} 失败: {e}")
+            return "0"
+
+    def bump(self) -> str:
+        version = f"{time.time_ns()}-{os.getpid()}"
+        path = self.path
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(version, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"写入版本戳 {self.name} 失败: {e}")
+        return version
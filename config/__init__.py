@@ -6,16 +6,24 @@ from .settings import (
     DBConfig,
     SpiderConfig,
     MailConfig,
+    NotifyConfig,
     FilterConfig,
     SnapshotConfig,
+    SchedulerConfig,
+    RefreshConfig,
+    AnalyticsConfig,
     LogConfig,
     flask,
     db,
     spider,
     mail,
+    notify_cfg,
     filter_cfg,
     log_cfg,
     snapshot_cfg,
+    scheduler_cfg,
+    refresh_cfg,
+    analytics_cfg,
     PROJECT_ROOT,
 )
 
@@ -24,15 +32,23 @@ __all__ = [
     "DBConfig",
     "SpiderConfig",
     "MailConfig",
+    "NotifyConfig",
     "FilterConfig",
     "SnapshotConfig",
+    "SchedulerConfig",
+    "RefreshConfig",
+    "AnalyticsConfig",
     "LogConfig",
     "flask",
     "db",
     "spider",
     "mail",
+    "notify_cfg",
     "filter_cfg",
     "log_cfg",
     "snapshot_cfg",
+    "scheduler_cfg",
+    "refresh_cfg",
+    "analytics_cfg",
     "PROJECT_ROOT",
 ]
@@ -61,12 +61,29 @@ class SpiderConfig:
     OUTPUT_CLEAN = os.getenv("OUTPUT_CLEAN", "qdii_all_clean.csv")
     OUTPUT_FILTERED = os.getenv("OUTPUT_FILTERED", "qdii_filtered.csv")
 
+    # 数据文件存储后端：csv（默认）/ parquet（需安装 pyarrow）
+    STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "csv").lower()
+    PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+    # Parquet 日期分区保留天数（0 表示不清理）
+    STORAGE_KEEP_DAYS = int(os.getenv("STORAGE_KEEP_DAYS", "30"))
+
     # 抓取 URLs
     JISILU_URLS = [
         ("https://www.jisilu.cn/data/qdii/#qdiie", ["欧美市场", "商品市场"]),
         ("https://www.jisilu.cn/data/qdii/#qdiia", ["亚洲市场"]),
     ]
 
+    # JSON API 请求配置
+    API_TIMEOUT = int(os.getenv("SPIDER_API_TIMEOUT", "15"))
+    API_POOL_SIZE = int(os.getenv("SPIDER_API_POOL_SIZE", "4"))
+
+    # 无头浏览器池：空闲自动关闭（秒）、累计使用 N 次后回收重建
+    BROWSER_IDLE_TIMEOUT = int(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+    BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "50"))
+
+    # 抓取结果共享窗口（秒）：窗口内同时触发的任务复用同一次抓取，0 表示不共享
+    SHARED_CRAWL_WINDOW = int(os.getenv("SPIDER_SHARED_CRAWL_WINDOW", "60"))
+
     # 重试配置
     MAX_RETRIES = int(os.getenv("SPIDER_MAX_RETRIES", "3"))
     RETRY_INTERVAL = int(os.getenv("SPIDER_RETRY_INTERVAL", "30"))
@@ -91,6 +108,44 @@ class MailConfig:
     MAIL_SENDER = os.getenv("MAIL_SENDER", "")
     MAIL_SENDER_NAME = os.getenv("MAIL_SENDER_NAME", "QDII基金监控系统")
     SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+    # SMTP 连接池：已登录会话空闲保留秒数、每个账号最多保留的空闲连接数
+    SMTP_POOL_IDLE_TIMEOUT = int(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60"))
+    SMTP_POOL_MAX_IDLE = int(os.getenv("SMTP_POOL_MAX_IDLE", "2"))
+
+
+# ──────────────────────────────────────────
+# 多渠道通知发送配置
+# ──────────────────────────────────────────
+class NotifyConfig:
+    # 并发发送线程数上限（所有发送共用）
+    MAX_WORKERS = int(os.getenv("NOTIFY_MAX_WORKERS", "8"))
+    # 单个渠道截止时间（秒），同时作为各渠道的网络超时
+    CHANNEL_TIMEOUT = float(os.getenv("NOTIFY_CHANNEL_TIMEOUT", "10"))
+    # 一次发送的整体截止时间（秒）
+    TOTAL_TIMEOUT = float(os.getenv("NOTIFY_TOTAL_TIMEOUT", "20"))
+    # 访问令牌（企业微信 access_token 等）提前刷新的秒数
+    TOKEN_REFRESH_MARGIN = int(os.getenv("NOTIFY_TOKEN_REFRESH_MARGIN", "300"))
+
+    # 各渠道每分钟发送上限（渠道=条数，逗号分隔；未列出的渠道不限流），超限消息合并为汇总
+    RATE_LIMITS = os.getenv(
+        "NOTIFY_RATE_LIMITS",
+        "dingtalk=20,feishu=100,wecom=30,telegram=20,pushplus=10,serverchan=5,bark=60,igot=30,webhook=60",
+    )
+
+    # 发件箱：定时任务只入队，后台投递器异步发送并按指数退避重试
+    OUTBOX_ENABLED = os.getenv("NOTIFY_OUTBOX_ENABLED", "true").lower() == "true"
+    OUTBOX_POLL_INTERVAL = float(os.getenv("NOTIFY_OUTBOX_POLL_INTERVAL", "5"))
+    OUTBOX_BATCH_SIZE = int(os.getenv("NOTIFY_OUTBOX_BATCH_SIZE", "10"))
+    # 最大投递次数，超过后转为死信
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("NOTIFY_OUTBOX_MAX_ATTEMPTS", "6"))
+    # 重试间隔：BASE * 2^(次数-1) 秒，不超过 MAX
+    OUTBOX_BACKOFF_BASE = float(os.getenv("NOTIFY_OUTBOX_BACKOFF_BASE", "30"))
+    OUTBOX_BACKOFF_MAX = float(os.getenv("NOTIFY_OUTBOX_BACKOFF_MAX", "3600"))
+    # 领取后多久未回写视为投递进程崩溃，可被重新领取（秒）
+    OUTBOX_CLAIM_TIMEOUT = int(os.getenv("NOTIFY_OUTBOX_CLAIM_TIMEOUT", "120"))
+    # 投递主节点租约有效期（秒）：只有主节点投递，渠道限流对所有 worker 生效；
+    # 需大于 NOTIFY_TOTAL_TIMEOUT（逐条续租），主节点崩溃后最迟这么久由其他 worker 接管
+    OUTBOX_LEASE_TTL = int(os.getenv("NOTIFY_OUTBOX_LEASE_TTL", "60"))
 
 
 # ──────────────────────────────────────────
@@ -107,6 +162,43 @@ class FilterConfig:
 # ──────────────────────────────────────────
 class SnapshotConfig:
     KEEP_DAYS = int(os.getenv("SNAPSHOT_KEEP_DAYS", "30"))
+    # 历史查询接口每页默认条数与上限
+    PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "100"))
+    MAX_PAGE_SIZE = int(os.getenv("SNAPSHOT_MAX_PAGE_SIZE", "500"))
+    # 盘中记录（fund_ticks）保留天数；每日汇总到快照的时间（HH:MM，调度主节点执行）
+    TICK_KEEP_DAYS = int(os.getenv("SNAPSHOT_TICK_KEEP_DAYS", "7"))
+    ROLLUP_AT = os.getenv("SNAPSHOT_ROLLUP_AT", "23:50")
+
+
+# ──────────────────────────────────────────
+# 调度器配置（多 worker 主节点选举）
+# ──────────────────────────────────────────
+class SchedulerConfig:
+    # 主节点租约有效期（秒）：主节点崩溃后最迟这么久由其他 worker 接管
+    LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "60"))
+    # 心跳间隔（秒）：续租、同步数据库中的任务变更
+    HEARTBEAT_INTERVAL = int(os.getenv("SCHEDULER_HEARTBEAT_INTERVAL", "15"))
+
+
+# ──────────────────────────────────────────
+# 手动刷新配置（页面“刷新数据”按钮）
+# ──────────────────────────────────────────
+class RefreshConfig:
+    # 进度流心跳间隔（秒）：长时间无新阶段时发送心跳，需小于前端 15 秒的超时
+    HEARTBEAT_INTERVAL = float(os.getenv("REFRESH_HEARTBEAT_INTERVAL", "5"))
+    # 刷新租约有效期（秒）：执行中定期续期，执行刷新的 worker 崩溃后最迟这么久可重新刷新
+    LEASE_TTL = int(os.getenv("REFRESH_LEASE_TTL", "120"))
+    # 页面短轮询进度的间隔（秒）：默认方式，不像 SSE 那样在刷新期间占用 worker 线程
+    POLL_INTERVAL = float(os.getenv("REFRESH_POLL_INTERVAL", "1"))
+
+
+# ──────────────────────────────────────────
+# 溢价率分析配置
+# ──────────────────────────────────────────
+class AnalyticsConfig:
+    # 滚动统计窗口（快照日数，含当日）；样本数少于 MIN_PERIODS 时均值/标准差/z-score 为空
+    ROLLING_WINDOW = int(os.getenv("ANALYTICS_ROLLING_WINDOW", "20"))
+    ROLLING_MIN_PERIODS = int(os.getenv("ANALYTICS_ROLLING_MIN_PERIODS", "5"))
 
 
 # ──────────────────────────────────────────
@@ -124,6 +216,10 @@ flask = FlaskConfig()
 db = DBConfig()
 spider = SpiderConfig()
 mail = MailConfig()
+notify_cfg = NotifyConfig()
 filter_cfg = FilterConfig()
 log_cfg = LogConfig()
 snapshot_cfg = SnapshotConfig()
+scheduler_cfg = SchedulerConfig()
+refresh_cfg = RefreshConfig()
+analytics_cfg = AnalyticsConfig()
@@ -28,8 +28,9 @@ def run_crawl(save_snapshot: bool = True):
     运行爬虫并可选保存历史快照。
     Snapshot 模式保存全部数据（不过滤溢价率）。
     """
+    from apps.latest_view import latest_view
     from apps.spider import run_workflow
-    from models import FundSnapshot
+    from models import FundSnapshot, FundTick
     import config
 
     # Snapshot 保存全部数据；普通抓取走默认筛选门槛
@@ -45,6 +46,8 @@ def run_crawl(save_snapshot: bool = True):
         app = create_app()
         with app.app_context():
             saved = FundSnapshot.save_from_df(df)
+            FundTick.append_from_df(df, now_str)
+            latest_view.invalidate()
             logger.info(f"历史快照已保存: {saved} 条")
 
 
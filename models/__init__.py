@@ -8,6 +8,9 @@ from .email_config import EmailConfigModel
 from .notify_channel import NotifyChannel, init_builtin_channels
 from .notify_template import NotifyTemplate
 from .fund_snapshot import FundSnapshot
+from .fund_tick import FundTick
+from .lease import Lease
+from .notify_outbox import NotifyOutbox
 
 __all__ = [
     "TaskSchedule",
@@ -16,5 +19,8 @@ __all__ = [
     "NotifyChannel",
     "NotifyTemplate",
     "FundSnapshot",
+    "FundTick",
+    "Lease",
+    "NotifyOutbox",
     "init_builtin_channels",
 ]
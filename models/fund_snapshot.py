@@ -25,11 +25,17 @@ class FundSnapshot(db.Model):
     status = db.Column(db.String(50), nullable=True, comment="申购状态")
     created_at = db.Column(db.DateTime, default=datetime.now)
 
-    # 复合唯一索引
+    # 复合唯一索引 + 按基金查历史的索引（用于前一交易日对比）
+    # + 按日期范围、溢价率排序分页的索引（/api/history）
     __table_args__ = (
         db.UniqueConstraint("snapshot_date", "fund_code", name="uq_date_code"),
+        db.Index("ix_fund_snapshots_code_date", "fund_code", "snapshot_date"),
+        db.Index("ix_fund_snapshots_date_premium", "snapshot_date", "premium"),
     )
 
+    # 分页排序字段白名单
+    SORT_FIELDS = ("snapshot_date", "premium", "fund_code")
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -59,12 +65,64 @@ class FundSnapshot(db.Model):
             for f in cls.query.filter_by(snapshot_date=target_date).all()
         }
 
+    @classmethod
+    def _records_from_df(cls, df, snapshot_date) -> list[dict]:
+        """按列向量化构造待写入记录（同一基金代码只保留最后一条）。"""
+        import pandas as pd
+
+        n = len(df)
+
+        def text_col(name):
+            if name not in df.columns:
+                return pd.Series([""] * n, index=df.index)
+            return df[name].astype(str)
+
+        premium_col = "溢价率" if "溢价率" in df.columns else "T-1溢价率"
+        if premium_col in df.columns:
+            # 溢价率统一保留 4 位小数（HTML 降级数据解析自文本，可能带二进制误差）
+            premium = pd.to_numeric(df[premium_col], errors="coerce").astype("float64").round(4)
+        else:
+            premium = pd.Series([None] * n, index=df.index, dtype="float64")
+
+        frame = pd.DataFrame({
+            "fund_code": text_col("代码"),
+            "fund_name": text_col("名称"),
+            "source": text_col("来源"),
+            "status": text_col("申购状态"),
+            "premium": premium.astype(object).where(premium.notna(), None),
+        }).drop_duplicates("fund_code", keep="last")
+
+        now = datetime.now()
+        codes = frame["fund_code"].tolist()
+        names = frame["fund_name"].tolist()
+        sources = frame["source"].tolist()
+        statuses = frame["status"].tolist()
+        premiums = frame["premium"].tolist()
+        return [
+            {
+                "snapshot_date": snapshot_date,
+                "fund_code": code,
+                "fund_name": name,
+                "source": source,
+                "status": status,
+                "premium": premium_val,
+                "created_at": now,
+            }
+            for code, name, source, status, premium_val
+            in zip(codes, names, sources, statuses, premiums)
+        ]
+
     @classmethod
     def save_from_df(cls, df, snapshot_date=None):
         """
-        从 Pandas DataFrame 保存快照。
+        从 Pandas DataFrame 保存快照（按 snapshot_date + fund_code 批量 upsert）。
 
         DataFrame 须包含列：代码, 名称, 溢价率, 申购状态, 来源（可选）
+
+        整个写入在一个事务内完成：SQLite/PostgreSQL 使用
+        INSERT ... ON CONFLICT DO UPDATE，其他数据库回退为先删后插；
+        当日已不存在的基金同一事务内删除。读者不会看到空的一天。
+        df 没有有效记录时不做任何修改（返回 0），避免一次失败的抓取清空当日快照。
         """
         if snapshot_date is None:
             snapshot_date = datetime.now().date()
@@ -72,69 +130,226 @@ class FundSnapshot(db.Model):
             from datetime import datetime as dt
             snapshot_date = dt.strptime(snapshot_date, "%Y-%m-%d").date()
 
-        # 删除同日旧数据（支持重复抓取）
-        cls.query.filter_by(snapshot_date=snapshot_date).delete()
-        db.session.commit()
+        records = cls._records_from_df(df, snapshot_date)
+        if not records:
+            return 0
+        table = cls.__table__
+        dialect = db.session.get_bind().dialect.name
+
+        try:
+            if dialect in ("sqlite", "postgresql"):
+                if dialect == "sqlite":
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert
+
+                stmt = insert(table)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.snapshot_date, table.c.fund_code],
+                    set_={
+                        col: stmt.excluded[col]
+                        for col in ("source", "fund_name", "premium", "status", "created_at")
+                    },
+                )
+                db.session.execute(stmt, records)
+            else:
+                db.session.execute(table.delete().where(table.c.snapshot_date == snapshot_date))
+                db.session.execute(table.insert(), records)
 
-        records = []
-        for _, row in df.iterrows():
-            premium_val = row.get("溢价率")
-            if premium_val is None:
-                premium_val = row.get("T-1溢价率")
-            records.append(cls(
-                snapshot_date=snapshot_date,
-                source=str(row.get("来源", "")),
-                fund_code=str(row.get("代码", "")),
-                fund_name=str(row.get("名称", "")),
-                premium=float(premium_val) if premium_val is not None and premium_val != "" else None,
-                status=str(row.get("申购状态", "")),
-            ))
-
-        if records:
-            db.session.bulk_save_objects(records)
+            # 删除当日已不在本次结果中的基金（支持重复抓取）
+            codes = [r["fund_code"] for r in records]
+            db.session.execute(
+                table.delete().where(
+                    table.c.snapshot_date == snapshot_date,
+                    table.c.fund_code.notin_(codes),
+                )
+            )
             db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
         return len(records)
 
+    @classmethod
+    def has_date(cls, snapshot_date=None) -> bool:
+        """某日（默认今日）是否已有快照"""
+        if snapshot_date is None:
+            snapshot_date = datetime.now().date()
+        return (
+            db.session.query(cls.id).filter(cls.snapshot_date == snapshot_date).first()
+            is not None
+        )
+
+    @classmethod
+    def get_previous_date(cls, current_date):
+        """获取 current_date 之前最近一个有快照的日期（跳过周末/节假日），没有则返回 None"""
+        return (
+            db.session.query(db.func.max(cls.snapshot_date))
+            .filter(cls.snapshot_date < current_date)
+            .scalar()
+        )
+
     @classmethod
     def compare_today_vs_yesterday(cls, today_date=None):
         """
-        对比今日与昨日的溢价率变化。
+        对比今日与上一个有快照的交易日的溢价率变化。
+
+        单条 SQL 完成：子查询取前一个快照日期，自连接得到昨日溢价率，
+        由数据库按溢价率降序排序（空值在后）。
 
         返回: list of {fund_code, fund_name, premium_today, premium_yesterday,
                        change, status_today}
         """
-        from datetime import timedelta
+        from sqlalchemy.orm import aliased
 
         if today_date is None:
             today_date = datetime.now().date()
 
-        today_snapshots = cls.get_latest(today_date)
-        if not today_snapshots:
-            return []
+        prev = aliased(cls)
+        prev_date = (
+            db.select(db.func.max(cls.snapshot_date))
+            .where(cls.snapshot_date < today_date)
+            .scalar_subquery()
+        )
+        rows = (
+            db.session.query(
+                cls.source,
+                cls.fund_code,
+                cls.fund_name,
+                cls.premium,
+                cls.status,
+                prev.premium.label("premium_yesterday"),
+                (cls.premium - prev.premium).label("change"),
+            )
+            .outerjoin(
+                prev,
+                db.and_(prev.fund_code == cls.fund_code, prev.snapshot_date == prev_date),
+            )
+            .filter(cls.snapshot_date == today_date)
+            .order_by(cls.premium.is_(None), cls.premium.desc())
+            .all()
+        )
 
-        yesterday_snapshots = cls.get_previous(today_date, days=1)
-        today_by_code = {s.fund_code: s for s in today_snapshots}
+        return [
+            {
+                "source": r.source,
+                "fund_code": r.fund_code,
+                "fund_name": r.fund_name,
+                "premium_today": r.premium,
+                "premium_yesterday": r.premium_yesterday,
+                "change": round(r.change, 2) if r.change is not None else None,
+                "status": r.status,
+            }
+            for r in rows
+        ]
 
-        result = []
-        for code, today_fund in today_by_code.items():
-            yesterday_fund = yesterday_snapshots.get(code)
-            change = None
-            if yesterday_fund and yesterday_fund.premium is not None and today_fund.premium is not None:
-                change = round(today_fund.premium - yesterday_fund.premium, 2)
+    @classmethod
+    def page(
+        cls,
+        start_date=None,
+        end_date=None,
+        source: str = None,
+        status: str = None,
+        premium_min: float = None,
+        premium_max: float = None,
+        fund_code: str = None,
+        sort: str = "snapshot_date",
+        desc: bool = True,
+        limit: int = 100,
+        after: tuple = None,
+    ) -> tuple[list, tuple | None]:
+        """
+        按条件分页查询快照，过滤、排序、分页全部在 SQL 中完成。
 
-            result.append({
-                "source": today_fund.source,
-                "fund_code": code,
-                "fund_name": today_fund.fund_name,
-                "premium_today": today_fund.premium,
-                "premium_yesterday": yesterday_fund.premium if yesterday_fund else None,
-                "change": change,
-                "status": today_fund.status,
-            })
-
-        # 按溢价率降序排列
-        result.sort(key=lambda x: x["premium_today"] or -999, reverse=True)
-        return result
+        使用键集分页（keyset）：按 (排序字段, id) 排序，after 为上一页最后一条的
+        (排序字段值, id)，查询只扫描本页所需的行，翻到多深都不需要 OFFSET。
+        溢价率为空的记录始终排在最后。
+
+        参数:
+            start_date / end_date: 快照日期范围（含两端）
+            source: 市场来源（精确匹配）
+            status: 申购状态子串
+            premium_min / premium_max: 溢价率范围（含两端）
+            fund_code: 基金代码（精确匹配）
+            sort: 排序字段，见 SORT_FIELDS
+            desc: 是否降序
+            limit: 每页条数
+            after: 上一页返回的游标
+        返回: (本页记录, 下一页游标)，没有下一页时游标为 None
+        """
+        if sort not in cls.SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort}")
+
+        query = cls.query
+        if start_date is not None:
+            query = query.filter(cls.snapshot_date >= start_date)
+        if end_date is not None:
+            query = query.filter(cls.snapshot_date <= end_date)
+        if source:
+            query = query.filter(cls.source == source)
+        if status:
+            query = query.filter(cls.status.contains(status, autoescape=True))
+        if premium_min is not None:
+            query = query.filter(cls.premium >= premium_min)
+        if premium_max is not None:
+            query = query.filter(cls.premium <= premium_max)
+        if fund_code:
+            query = query.filter(cls.fund_code == fund_code)
+
+        column = getattr(cls, sort)
+        nullable = sort == "premium"
+        if after is not None:
+            query = query.filter(cls._after(column, after, desc, nullable))
+
+        order = [column.desc(), cls.id.desc()] if desc else [column.asc(), cls.id.asc()]
+        if nullable:
+            order.insert(0, column.is_(None))
+        rows = query.order_by(*order).limit(limit + 1).all()
+
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (getattr(last, sort), last.id)
+
+    @classmethod
+    def _after(cls, column, cursor: tuple, desc: bool, nullable: bool):
+        """键集分页条件：排在游标 (value, id) 之后的记录"""
+        value, last_id = cursor
+        beyond = (lambda a, b: a < b) if desc else (lambda a, b: a > b)
+
+        if value is None:
+            # 游标已进入空值段（空值排在最后），只需按 id 继续
+            return db.and_(column.is_(None), beyond(cls.id, last_id))
+
+        condition = db.or_(
+            beyond(column, value),
+            db.and_(column == value, beyond(cls.id, last_id)),
+        )
+        if nullable:
+            condition = db.or_(condition, column.is_(None))
+        return condition
+
+    @classmethod
+    def list_dates(cls, limit: int = None) -> list[dict]:
+        """各快照日期及基金数（日期降序）"""
+        query = (
+            db.session.query(cls.snapshot_date, db.func.count(cls.id))
+            .group_by(cls.snapshot_date)
+            .order_by(cls.snapshot_date.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+        return [
+            {"snapshot_date": d.isoformat(), "count": n}
+            for d, n in query.all()
+        ]
+
+    @classmethod
+    def ensure_indexes(cls):
+        """为已存在的旧表补建索引（db.create_all 不会给已有表加索引）"""
+        for index in cls.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
 
     @classmethod
     def cleanup_old_snapshots(cls, keep_days: int = 30):
@@ -0,0 +1,258 @@
+"""
+基金盘中行情模型
+每次实际抓取追加一批记录（同一批次共用 captured_at），只追加不覆盖，
+保留盘中溢价率变化；每日由调度主节点汇总到 fund_snapshots（当日最后一笔）。
+
+列只保留随时间变化的字段（代码 / 时间 / 溢价率 / 申购状态），
+名称、市场等静态信息仍在 fund_snapshots 中。
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+
+
+class FundTick(db.Model):
+    """盘中溢价率记录（追加写）"""
+    __tablename__ = "fund_ticks"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    captured_at = db.Column(db.DateTime, nullable=False, comment="抓取时间（同一批次相同）")
+    fund_code = db.Column(db.String(12), nullable=False, comment="基金代码")
+    premium = db.Column(db.Float, nullable=True, comment="溢价率（%）")
+    status = db.Column(db.String(20), nullable=True, comment="申购状态")
+
+    # 同一批次每只基金只有一条（多个任务共享同一次抓取并发写入时去重），
+    # 其索引同时用于 max(captured_at) 查最新批次；单只基金最新/盘中序列：(fund_code, captured_at)
+    __table_args__ = (
+        db.UniqueConstraint("captured_at", "fund_code", name="uq_tick_time_code"),
+        db.Index("ix_fund_ticks_code_time", "fund_code", "captured_at"),
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            "captured_at": self.captured_at.isoformat() if self.captured_at else None,
+            "fund_code": self.fund_code,
+            "premium": self.premium,
+            "status": self.status,
+        }
+
+    # ──────────────────────────────────────────
+    # 写入
+    # ──────────────────────────────────────────
+
+    @classmethod
+    def append_from_df(cls, df, captured_at: datetime | str = None) -> int:
+        """
+        追加一批记录（清洗后数据，须含 代码 / 溢价率 列，申购状态 可选）。
+
+        captured_at 传抓取时间戳（datetime 或 run_workflow 返回的 "%Y%m%d_%H%M%S"），
+        多个任务共享同一次抓取时该批次只写入一次：SQLite/PostgreSQL 使用
+        INSERT ... ON CONFLICT DO NOTHING，其他数据库遇到唯一约束冲突时整批放弃。
+        返回本次实际写入的条数。
+        """
+        import pandas as pd
+
+        if df is None or df.empty or "代码" not in df.columns:
+            return 0
+        if captured_at is None:
+            captured_at = datetime.now().replace(microsecond=0)
+        elif isinstance(captured_at, str):
+            captured_at = datetime.strptime(captured_at, "%Y%m%d_%H%M%S")
+
+        if "溢价率" in df.columns:
+            premium = pd.to_numeric(df["溢价率"], errors="coerce").astype("float64").round(4)
+        else:
+            premium = pd.Series(float("nan"), index=df.index)
+        frame = pd.DataFrame({
+            "fund_code": df["代码"].astype(str),
+            "premium": premium.astype(object).where(premium.notna(), None),
+            "status": (
+                df["申购状态"].astype(str) if "申购状态" in df.columns else None
+            ),
+        }).drop_duplicates("fund_code", keep="last")
+
+        records = [
+            {"captured_at": captured_at, "fund_code": code, "premium": p, "status": s}
+            for code, p, s in zip(
+                frame["fund_code"].tolist(),
+                frame["premium"].tolist(),
+                frame["status"].tolist(),
+            )
+        ]
+        if not records:
+            return 0
+        table = cls.__table__
+        dialect = db.session.get_bind().dialect.name
+
+        try:
+            if dialect in ("sqlite", "postgresql"):
+                if dialect == "sqlite":
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert
+
+                stmt = insert(table).on_conflict_do_nothing(
+                    index_elements=[table.c.captured_at, table.c.fund_code],
+                )
+                written = db.session.execute(stmt, records).rowcount
+            else:
+                db.session.execute(table.insert(), records)
+                written = len(records)
+            db.session.commit()
+        except IntegrityError:
+            # 其他任务已写入同一批次
+            db.session.rollback()
+            return 0
+        except Exception:
+            db.session.rollback()
+            raise
+        return written
+
+    # ──────────────────────────────────────────
+    # 查询
+    # ──────────────────────────────────────────
+
+    @classmethod
+    def latest_time(cls):
+        """最近一批的抓取时间（索引查找，不扫描整天）"""
+        return db.session.query(db.func.max(cls.captured_at)).scalar()
+
+    @classmethod
+    def latest_batch(cls) -> tuple[datetime | None, list]:
+        """最近一批的全部记录：(抓取时间, 记录列表)"""
+        latest = cls.latest_time()
+        if latest is None:
+            return None, []
+        return latest, cls.query.filter(cls.captured_at == latest).all()
+
+    @classmethod
+    def latest_for(cls, fund_code: str):
+        """单只基金的最新一条记录"""
+        return (
+            cls.query
+            .filter(cls.fund_code == fund_code)
+            .order_by(cls.captured_at.desc())
+            .first()
+        )
+
+    @classmethod
+    def intraday(cls, fund_code: str, day=None) -> list:
+        """单只基金某日（默认今日）的盘中记录，按时间升序"""
+        if day is None:
+            day = datetime.now().date()
+        start = datetime.combine(day, datetime.min.time())
+        return (
+            cls.query
+            .filter(
+                cls.fund_code == fund_code,
+                cls.captured_at >= start,
+                cls.captured_at < start + timedelta(days=1),
+            )
+            .order_by(cls.captured_at)
+            .all()
+        )
+
+    # ──────────────────────────────────────────
+    # 汇总与清理
+    # ──────────────────────────────────────────
+
+    @classmethod
+    def rollup_day(cls, day=None) -> int:
+        """
+        将某日（默认今日）的盘中记录汇总到 fund_snapshots：
+        每只基金取当日最后一笔的溢价率与申购状态。
+
+        已有快照行只更新溢价率与状态；缺失的行以该基金最近一次快照的
+        名称/市场补建。返回汇总的基金数。
+        """
+        from .fund_snapshot import FundSnapshot
+
+        if day is None:
+            day = datetime.now().date()
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+
+        last_time = (
+            db.select(cls.fund_code, db.func.max(cls.captured_at).label("last_at"))
+            .where(cls.captured_at >= start, cls.captured_at < end)
+            .group_by(cls.fund_code)
+            .subquery()
+        )
+        closes = db.session.execute(
+            db.select(cls.fund_code, cls.premium, cls.status)
+            .join(
+                last_time,
+                db.and_(
+                    cls.fund_code == last_time.c.fund_code,
+                    cls.captured_at == last_time.c.last_at,
+                ),
+            )
+        ).all()
+        if not closes:
+            return 0
+
+        codes = [c.fund_code for c in closes]
+        existing = {
+            s.fund_code: s
+            for s in FundSnapshot.query.filter(
+                FundSnapshot.snapshot_date == day,
+                FundSnapshot.fund_code.in_(codes),
+            )
+        }
+        # 缺失行的名称/市场取该基金最近一次快照
+        missing = [c for c in codes if c not in existing]
+        latest_info = {}
+        if missing:
+            latest_date = (
+                db.select(
+                    FundSnapshot.fund_code,
+                    db.func.max(FundSnapshot.snapshot_date).label("d"),
+                )
+                .where(FundSnapshot.fund_code.in_(missing))
+                .group_by(FundSnapshot.fund_code)
+                .subquery()
+            )
+            latest_info = {
+                s.fund_code: s
+                for s in FundSnapshot.query.join(
+                    latest_date,
+                    db.and_(
+                        FundSnapshot.fund_code == latest_date.c.fund_code,
+                        FundSnapshot.snapshot_date == latest_date.c.d,
+                    ),
+                )
+            }
+
+        try:
+            for c in closes:
+                snap = existing.get(c.fund_code)
+                if snap is not None:
+                    snap.premium = c.premium
+                    snap.status = c.status
+                    continue
+                info = latest_info.get(c.fund_code)
+                db.session.add(FundSnapshot(
+                    snapshot_date=day,
+                    fund_code=c.fund_code,
+                    fund_name=info.fund_name if info else c.fund_code,
+                    source=info.source if info else None,
+                    premium=c.premium,
+                    status=c.status,
+                ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(closes)
+
+    @classmethod
+    def cleanup_old_ticks(cls, keep_days: int = 7) -> int:
+        """清理超过保留期的盘中记录（已汇总到 fund_snapshots）"""
+        cutoff = datetime.combine(
+            datetime.now().date() - timedelta(days=keep_days), datetime.min.time()
+        )
+        deleted = cls.query.filter(cls.captured_at < cutoff).delete()
+        db.session.commit()
+        return deleted
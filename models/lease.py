@@ -0,0 +1,106 @@
+"""
+分布式租约模型
+多个 gunicorn worker（或多台机器）共享同一数据库时，用一行记录协调“谁来做”。
+
+- acquire()：租约空闲、已过期或本来就归自己时，原子地占有/续期
+- release()：主动释放（仅持有者可释放）
+租约依靠过期时间自动失效，持有者崩溃后其他进程可在 TTL 后接管。
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+
+
+class Lease(db.Model):
+    """按名称唯一的租约，如 scheduler（调度主节点）"""
+    __tablename__ = "leases"
+
+    name = db.Column(db.String(64), primary_key=True, comment="租约名称")
+    holder = db.Column(db.String(128), nullable=False, comment="当前持有者标识")
+    expires_at = db.Column(db.DateTime, nullable=False, comment="过期时间")
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    @classmethod
+    def acquire(cls, name: str, holder: str, ttl: int) -> bool:
+        """
+        尝试占有或续期租约。
+
+        单条条件 UPDATE 保证并发下只有一个持有者胜出；
+        记录不存在时插入，插入冲突说明被别人抢先，视为失败。
+
+        参数:
+            name: 租约名称
+            holder: 持有者标识（进程唯一）
+            ttl: 有效期（秒）
+        返回: 是否持有租约
+        """
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=ttl)
+        try:
+            updated = (
+                cls.query
+                .filter(
+                    cls.name == name,
+                    db.or_(cls.holder == holder, cls.expires_at < now),
+                )
+                .update(
+                    {"holder": holder, "expires_at": expires_at, "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            if updated:
+                db.session.commit()
+                return True
+
+            if db.session.get(cls, name) is not None:
+                db.session.rollback()
+                return False
+
+            db.session.add(cls(name=name, holder=holder, expires_at=expires_at, updated_at=now))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def release(cls, name: str, holder: str) -> bool:
+        """释放租约（仅当前持有者有效），返回是否释放成功"""
+        try:
+            deleted = (
+                cls.query
+                .filter_by(name=name, holder=holder)
+                .delete(synchronize_session=False)
+            )
+            db.session.commit()
+            return bool(deleted)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def get_active(cls, name: str):
+        """返回未过期的租约记录（从数据库重新读取），无人持有时返回 None"""
+        lease = db.session.get(cls, name, populate_existing=True)
+        if lease is None or lease.expires_at < datetime.now():
+            return None
+        return lease
+
+    @classmethod
+    def current_holder(cls, name: str):
+        """返回未过期租约的持有者，无人持有时返回 None"""
+        lease = cls.get_active(name)
+        return lease.holder if lease is not None else None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "holder": self.holder,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
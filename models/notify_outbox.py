@@ -0,0 +1,193 @@
+"""
+通知发件箱模型
+定时任务只把渲染好的通知写入发件箱，由后台投递器异步发送。
+
+状态流转：
+    pending ──投递成功──▶ sent
+       ▲  │
+       │  └──部分/全部渠道失败──▶ pending（指数退避后只重试失败渠道）
+       │                          └──超过最大次数──▶ dead（死信，可手动重投）
+    sending（已被某个 worker 领取；领取超时视为 pending，可被重新领取）
+"""
+import json
+from datetime import datetime, timedelta
+
+from extensions import db
+
+
+class NotifyOutbox(db.Model):
+    """待投递的通知"""
+    __tablename__ = "notify_outbox"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    idempotency_key = db.Column(db.String(128), nullable=False, unique=True, comment="幂等键，重复入队会被忽略")
+    kind = db.Column(db.String(20), nullable=False, default="report", comment="类型：report/alert/digest")
+    title = db.Column(db.String(500), nullable=False, comment="通知标题")
+    content = db.Column(db.Text, nullable=False, comment="通知内容")
+    # JSON 列表：尚未投递成功的渠道、邮件收件人
+    channels = db.Column(db.Text, nullable=False, default="[]", comment="待投递渠道 JSON")
+    recipients = db.Column(db.Text, nullable=False, default="[]", comment="邮件收件人 JSON")
+    # JSON 列表：已投递成功的渠道
+    delivered = db.Column(db.Text, nullable=False, default="[]", comment="已成功渠道 JSON")
+    status = db.Column(db.String(20), nullable=False, default="pending", comment="pending/sending/sent/dead")
+    attempts = db.Column(db.Integer, nullable=False, default=0, comment="已投递次数")
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now, comment="下次投递时间")
+    locked_until = db.Column(db.DateTime, nullable=True, comment="领取超时时间")
+    last_error = db.Column(db.Text, nullable=True, comment="最近一次失败原因")
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_notify_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+    def get_channels(self) -> list:
+        return json.loads(self.channels or "[]")
+
+    def get_recipients(self) -> list:
+        return json.loads(self.recipients or "[]")
+
+    def get_delivered(self) -> list:
+        return json.loads(self.delivered or "[]")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "idempotency_key": self.idempotency_key,
+            "kind": self.kind,
+            "title": self.title,
+            "channels": self.get_channels(),
+            "delivered": self.get_delivered(),
+            "status": self.status,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "sent_at": self.sent_at.isoformat() if self.sent_at else None,
+        }
+
+    # ──────────────────────────────────────────
+    # 入队 / 领取 / 结果回写
+    # ──────────────────────────────────────────
+
+    @classmethod
+    def enqueue(
+        cls,
+        idempotency_key: str,
+        title: str,
+        content: str,
+        channels: list[str],
+        recipients: list[str] = None,
+        kind: str = "report",
+    ) -> tuple["NotifyOutbox", bool]:
+        """
+        写入发件箱。
+
+        返回: (记录, 是否新建)；幂等键已存在时返回已有记录，不重复入队
+        """
+        existing = cls.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing, False
+
+        item = cls(
+            idempotency_key=idempotency_key,
+            kind=kind,
+            title=title,
+            content=content,
+            channels=json.dumps(list(channels), ensure_ascii=False),
+            recipients=json.dumps(list(recipients or []), ensure_ascii=False),
+            next_attempt_at=datetime.now(),
+        )
+        db.session.add(item)
+        try:
+            db.session.commit()
+        except Exception:
+            # 并发入队同一幂等键：唯一约束冲突，返回胜出的那条
+            db.session.rollback()
+            existing = cls.query.filter_by(idempotency_key=idempotency_key).first()
+            if existing is None:
+                raise
+            return existing, False
+        return item, True
+
+    @classmethod
+    def claim_due(cls, limit: int, claim_timeout: int) -> list["NotifyOutbox"]:
+        """
+        领取到期的待投递记录。
+
+        逐条条件 UPDATE 领取，多个 worker 同时轮询时每条只会被一个领取；
+        sending 状态但领取已超时的记录（投递进程崩溃）也会被重新领取。
+        """
+        now = datetime.now()
+        due = db.or_(
+            db.and_(cls.status == "pending", cls.next_attempt_at <= now),
+            db.and_(cls.status == "sending", cls.locked_until < now),
+        )
+        candidate_ids = [
+            row.id for row in
+            cls.query.with_entities(cls.id).filter(due)
+            .order_by(cls.next_attempt_at).limit(limit).all()
+        ]
+
+        claimed = []
+        locked_until = now + timedelta(seconds=claim_timeout)
+        for item_id in candidate_ids:
+            updated = (
+                cls.query.filter(cls.id == item_id, due)
+                .update({"status": "sending", "locked_until": locked_until},
+                        synchronize_session=False)
+            )
+            db.session.commit()
+            if updated:
+                claimed.append(item_id)
+
+        if not claimed:
+            return []
+        return cls.query.filter(cls.id.in_(claimed)).order_by(cls.next_attempt_at).all()
+
+    def record_attempt(
+        self,
+        succeeded: list[str],
+        failed: list[str],
+        error: str = None,
+        max_attempts: int = 6,
+        backoff: float = 30,
+        unknown: list[str] = (),
+    ) -> None:
+        """
+        回写一次投递结果。
+
+        成功渠道移入 delivered；仍有失败渠道时按 backoff 秒后重试，
+        达到最大次数转为死信。unknown 为超时、结果未知的渠道：
+        不再重试（避免重复发送），记入 last_error 备查。
+        """
+        now = datetime.now()
+        self.attempts += 1
+        self.delivered = json.dumps(self.get_delivered() + list(succeeded), ensure_ascii=False)
+        self.channels = json.dumps(list(failed), ensure_ascii=False)
+        self.locked_until = None
+        if unknown:
+            note = "超时未确认（不自动重试）: " + ", ".join(unknown)
+            error = f"{error}；{note}" if error else note
+
+        if not failed:
+            self.status = "sent"
+            self.sent_at = now
+            self.last_error = error
+        elif self.attempts >= max_attempts:
+            self.status = "dead"
+            self.last_error = error
+        else:
+            self.status = "pending"
+            self.next_attempt_at = now + timedelta(seconds=backoff)
+            self.last_error = error
+        db.session.commit()
+
+    def requeue(self) -> None:
+        """死信手动重投：重置次数，立即投递"""
+        self.status = "pending"
+        self.attempts = 0
+        self.next_attempt_at = datetime.now()
+        self.locked_until = None
+        db.session.commit()
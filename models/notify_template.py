@@ -44,33 +44,16 @@ class NotifyTemplate(db.Model):
             "funds": [{"name": "xxx", "premium": "5.2%", "change": "+1.5%"}, ...],
         }
         """
-        title = self.title_template
-        content = self.content_template
+        from apps.notify.templating import compile_template, render_table_variable
 
-        for key, value in variables.items():
-            placeholder = f"{{{{{key}}}}}"
-            # funds 特殊处理
-            if key == "table" and isinstance(value, list):
-                # 渲染 Markdown 表格
-                rows = ["| 市场 | 代码 | 名称 | 溢价率 | 变化 | 状态 |",
-                        "|------|------|------|--------|------|------|"]
-                for f in value:
-                    change = f.get("change", "")
-                    change_icon = ""
-                    if change.startswith("+"):
-                        change_icon = "🔺"
-                    elif change.startswith("-"):
-                        change_icon = "🔻"
-                    rows.append(
-                        f"|{f.get('source', '')}|{f.get('code', '')}|"
-                        f"{f.get('name', '')}|{f.get('premium', '')}|"
-                        f"{change_icon}{change}|{f.get('status', '')}|"
-                    )
-                value = "\n".join(rows)
-            title = title.replace(placeholder, str(value))
-            content = content.replace(placeholder, str(value))
+        # table 传入行列表时渲染为 Markdown 表格
+        table = variables.get("table")
+        if isinstance(table, list):
+            variables = {**variables, "table": render_table_variable(table)}
 
-        return title, content
+        # 编译结果按 (id, updated_at) 缓存，单次拼接完成替换
+        title_tpl, content_tpl = compile_template(self)
+        return title_tpl.render(variables), content_tpl.render(variables)
 
     @classmethod
     def get_default(cls) -> "NotifyTemplate":
@@ -0,0 +1,114 @@
+"""
+_api_rows_to_df 微基准：列式构建 vs 旧版逐行构建
+
+用法:
+  python scripts/bench_api_rows.py            # 默认 120 行（真实规模）与 100 倍合成数据
+  python scripts/bench_api_rows.py --rows 300 --repeat 20
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+
+from apps.spider.fetcher import _api_rows_to_df
+
+
+def legacy_api_rows_to_df(rows: list, source: str) -> pd.DataFrame:
+    """旧版实现：逐行构建 18 键字典，float() + try/except 解析溢价率。"""
+    records = []
+    for row in rows:
+        cell = row.get("cell", {})
+        premium_str = cell.get("nav_discount_rt", "")
+        try:
+            premium = float(premium_str)
+        except (TypeError, ValueError):
+            premium = None
+        records.append({
+            "代码": cell.get("fund_id", ""),
+            "名称": cell.get("fund_nm_color", "") or cell.get("fund_nm", ""),
+            "溢价率": premium,
+            "溢价率_str": premium_str,
+            "当前价": cell.get("price", ""),
+            "最新净值": cell.get("fund_nav", ""),
+            "净值日期": cell.get("nav_dt", ""),
+            "T-2净值": cell.get("fund_nav", ""),
+            "T-2净值日期": cell.get("nav_dt", ""),
+            "参考指数": cell.get("index_nm", ""),
+            "参考指数涨跌幅": cell.get("ref_increase_rt", ""),
+            "申购状态": cell.get("apply_status", ""),
+            "赎回状态": cell.get("redeem_status", ""),
+            "管理费": cell.get("m_fee", ""),
+            "托管费": cell.get("mt_fee", ""),
+            "成交额(万)": cell.get("volume", ""),
+            "溢价率_t1": None,
+            "来源": source,
+        })
+    return pd.DataFrame(records)
+
+
+def make_rows(n: int, seed: int = 42) -> list[dict]:
+    """生成与 jisilu qdii_list 接口结构一致的合成数据。"""
+    rnd = random.Random(seed)
+    statuses = ["开放申购", "限100", "限1000", "暂停申购"]
+    rows = []
+    for i in range(n):
+        premium = rnd.choice(["-", "", f"{rnd.uniform(-3, 30):.2f}"])
+        rows.append({
+            "id": str(i),
+            "cell": {
+                "fund_id": f"{159000 + i}",
+                "fund_nm": f"基金{i}",
+                "fund_nm_color": rnd.choice(["", f"<span>基金{i}</span>"]),
+                "nav_discount_rt": premium,
+                "price": f"{rnd.uniform(0.5, 3):.3f}",
+                "fund_nav": f"{rnd.uniform(0.5, 3):.4f}",
+                "nav_dt": "2025-05-12",
+                "index_nm": "标普500",
+                "ref_increase_rt": f"{rnd.uniform(-2, 2):.2f}%",
+                "apply_status": rnd.choice(statuses),
+                "redeem_status": "开放赎回",
+                "m_fee": "0.60",
+                "mt_fee": "0.15",
+                "volume": f"{rnd.uniform(0, 200000):.2f}",
+            },
+        })
+    return rows
+
+
+def bench(rows: list[dict], repeat: int) -> None:
+    expected = legacy_api_rows_to_df(rows, "欧美市场")
+    actual = _api_rows_to_df(rows, "欧美市场")
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    legacy = min(timeit.repeat(
+        lambda: legacy_api_rows_to_df(rows, "欧美市场"), number=1, repeat=repeat
+    ))
+    columnar = min(timeit.repeat(
+        lambda: _api_rows_to_df(rows, "欧美市场"), number=1, repeat=repeat
+    ))
+    print(
+        f"{len(rows):>7} 行 | 旧版 {legacy * 1000:8.2f} ms | 列式 {columnar * 1000:8.2f} ms"
+        f" | 加速 {legacy / columnar:5.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="_api_rows_to_df 微基准")
+    parser.add_argument("--rows", type=int, default=120, help="真实规模行数（默认 120）")
+    parser.add_argument("--scale", type=int, default=100, help="合成数据放大倍数（默认 100）")
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数，取最小值")
+    args = parser.parse_args()
+
+    for n in (args.rows, args.rows * args.scale):
+        bench(make_rows(n), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+clean_and_extract 基准：按 schema 单次组装 vs 旧版多次整表复制
+
+对比两种实现的耗时与内存（tracemalloc 峰值 + 输出 DataFrame 深度内存占用）。
+
+用法:
+  python scripts/bench_clean.py                 # 默认 120 行与 100 倍合成数据
+  python scripts/bench_clean.py --rows 300 --repeat 20
+"""
+import argparse
+import logging
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from apps.spider.fetcher import _api_rows_to_df
+from apps.spider.parser import PLACEHOLDER_VALUES, TARGET_COLS, clean_and_extract
+from bench_api_rows import make_rows
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_clean_and_extract(df: pd.DataFrame) -> pd.DataFrame:
+    """旧版实现：整表 copy → 列选择后再 copy → HTML 分支过滤后再 copy。"""
+    if df.empty:
+        return pd.DataFrame()
+
+    df = df.copy()
+
+    # ── 判断数据格式 ───────────────────────────────────────────
+    has_api_premium = "溢价率" in df.columns and "溢价率_str" in df.columns
+    has_html_premium = "T-2净值 溢价率" in df.columns
+
+    if has_api_premium:
+        # API 格式：溢价率已是数值（float 或 None）
+        rate_col = "溢价率"
+        df[rate_col] = pd.to_numeric(df[rate_col], errors="coerce")
+
+        # 只保留有溢价率数值的行（过滤掉无法计算的）
+        before = len(df)
+        df = df.dropna(subset=[rate_col])
+        after = len(df)
+        if before != after:
+            logger.info(f"过滤无溢价率数据行：{before} → {after}")
+
+        # 统一列名
+        if "T-2净值" in df.columns:
+            df = df.rename(columns={"T-2净值": "净值"})
+
+        out_cols = ["代码", "名称", "溢价率", "净值", "净值日期", "参考指数",
+                    "参考指数涨跌幅", "申购状态", "赎回状态", "来源"]
+        out_cols = [c for c in out_cols if c in df.columns]
+        df = df[out_cols].copy()
+
+    elif has_html_premium:
+        # HTML 格式：需自动定位表头
+        for i in range(min(5, len(df))):
+            row_vals = df.iloc[i].astype(str).tolist()
+            if all(col in row_vals for col in ["代码", "名称", "T-2净值 溢价率"]):
+                df.columns = df.iloc[i].tolist()
+                df = df.iloc[i + 1:].reset_index(drop=True)
+                logger.info(f"自动表头定位成功，跳过前 {i+1} 行")
+                break
+
+        rate_col = "T-2净值 溢价率"
+        status_col = "申购状态"
+
+        # 过滤登录占位符行
+        if rate_col in df.columns:
+            df = df[~df[rate_col].isin(PLACEHOLDER_VALUES)].copy()
+            logger.info(f"过滤登录占位符后剩余 {len(df)} 条")
+
+        # 溢价率去掉 % 符号并转为数值
+        if rate_col in df.columns:
+            df[rate_col] = (
+                df[rate_col]
+                .replace("-", np.nan)
+                .astype(str)
+                .str.rstrip("%")
+            )
+            df[rate_col] = pd.to_numeric(df[rate_col], errors="coerce")
+
+        # 清理申购状态字段
+        if status_col in df.columns:
+            df[status_col] = df[status_col].astype(str).str.strip()
+
+        # 统一溢价率列名
+        df = df.rename(columns={"T-2净值 溢价率": "溢价率"})
+
+        out_cols = [c for c in TARGET_COLS if c in df.columns]
+        df = df[out_cols].copy()
+    else:
+        logger.warning(f"无法识别数据格式，列名: {list(df.columns)}")
+
+    # 去掉全空行
+    df = df.dropna(subset=["代码", "名称"])
+    return df
+
+
+def make_raw(n: int) -> pd.DataFrame:
+    """按三个市场拆分合成 API 原始数据。"""
+    rows = make_rows(n)
+    step = max(1, n // 3)
+    parts = [
+        _api_rows_to_df(rows[i:i + step], label)
+        for i, label in zip(range(0, n, step), ["欧美市场", "商品市场", "亚洲市场"])
+    ]
+    return pd.concat(parts, ignore_index=True)
+
+
+def measure(func, df: pd.DataFrame, repeat: int) -> tuple[float, int, int]:
+    """返回 (最短耗时秒, tracemalloc 峰值字节, 输出深度内存字节)。"""
+    elapsed = min(timeit.repeat(lambda: func(df), number=1, repeat=repeat))
+    tracemalloc.start()
+    out = func(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, int(out.memory_usage(deep=True).sum())
+
+
+def bench(n: int, repeat: int) -> None:
+    df_raw = make_raw(n)
+    old = legacy_clean_and_extract(df_raw)
+    new = clean_and_extract(df_raw)
+    assert list(old["代码"]) == list(new["代码"])
+    np.testing.assert_allclose(old["溢价率"], new["溢价率"], rtol=1e-6)
+
+    old_t, old_peak, old_mem = measure(legacy_clean_and_extract, df_raw, repeat)
+    new_t, new_peak, new_mem = measure(clean_and_extract, df_raw, repeat)
+    kb = 1024
+    print(
+        f"{len(df_raw):>7} 行 | 耗时 旧版 {old_t * 1000:7.2f} ms / 新版 {new_t * 1000:7.2f} ms"
+        f" | 峰值 {old_peak / kb:8.1f} KB / {new_peak / kb:8.1f} KB"
+        f" | 输出 {old_mem / kb:8.1f} KB / {new_mem / kb:8.1f} KB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="clean_and_extract 基准")
+    parser.add_argument("--rows", type=int, default=120, help="真实规模行数（默认 120）")
+    parser.add_argument("--scale", type=int, default=100, help="合成数据放大倍数（默认 100）")
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数，取最小值")
+    args = parser.parse_args()
+
+    for n in (args.rows, args.rows * args.scale):
+        bench(n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+通知模板渲染微基准：预编译单次拼接 vs 旧版逐变量 str.replace
+
+覆盖报告渲染的两步：
+  1. 基金表格（send_qdii_report 中的 Markdown 表格）
+  2. 模板变量替换（NotifyTemplate.render）
+
+用法:
+  python scripts/bench_template.py                    # 默认 50 / 2000 / 10000 行
+  python scripts/bench_template.py --rows 5000 --repeat 20
+"""
+import argparse
+import random
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from apps.notify.templating import compile_template, render_fund_table
+
+TITLE_TEMPLATE = "QDII基金报告 {{date}}"
+CONTENT_TEMPLATE = (
+    "找到 **{{count}}** 条符合条件的数据：\n\n"
+    "{{table}}\n\n"
+    "筛选条件：溢价率 >= {{premium_min}}%，状态包含「{{status_filter}}」\n"
+    "来源：集思录 | QDII监控系统"
+)
+
+
+def legacy_table(funds: list[dict]) -> str:
+    """旧版 send_qdii_report 中的表格渲染。"""
+    rows = [
+        "| 市场 | 代码 | 名称 | 溢价率 | 变化 | 状态 |",
+        "|------|------|------|--------|------|------|"
+    ]
+    for f in funds:
+        change = f.get("change")
+        change_icon = ""
+        change_str = ""
+        if change is not None:
+            if change > 0:
+                change_icon = "🔺"
+            elif change < 0:
+                change_icon = "🔻"
+            change_str = f"{change_icon}{change:+.2f}%"
+        premium = f.get("premium_today") or f.get("premium")
+        premium_str = f"{premium:.2f}%" if premium is not None else "N/A"
+        rows.append(
+            f"|{f.get('source', '')}|{f.get('fund_code', '')}|"
+            f"{f.get('fund_name', '')}|{premium_str}|"
+            f"{change_str}|{f.get('status', '')}|"
+        )
+    return "\n".join(rows)
+
+
+def legacy_render(title: str, content: str, variables: dict) -> tuple[str, str]:
+    """旧版 NotifyTemplate.render：每个变量对标题与全文各 replace 一次。"""
+    for key, value in variables.items():
+        placeholder = f"{{{{{key}}}}}"
+        title = title.replace(placeholder, str(value))
+        content = content.replace(placeholder, str(value))
+    return title, content
+
+
+def make_funds(n: int, seed: int = 42) -> list[dict]:
+    rnd = random.Random(seed)
+    statuses = ["开放申购", "限100", "限1000", "暂停申购"]
+    return [
+        {
+            "source": rnd.choice(["欧美市场", "亚洲市场", "商品市场"]),
+            "fund_code": f"{159000 + i}",
+            "fund_name": f"基金{i}",
+            "premium_today": round(rnd.uniform(-3, 30), 2),
+            "change": rnd.choice([None, round(rnd.uniform(-2, 2), 2)]),
+            "status": rnd.choice(statuses),
+        }
+        for i in range(n)
+    ]
+
+
+def bench(n: int, repeat: int) -> None:
+    funds = make_funds(n)
+    template = SimpleNamespace(
+        id=1,
+        updated_at=datetime(2025, 5, 14),
+        title_template=TITLE_TEMPLATE,
+        content_template=CONTENT_TEMPLATE,
+    )
+
+    def variables(table: str) -> dict:
+        return {
+            "date": "2025-05-14",
+            "count": n,
+            "table": table,
+            "premium_min": 3.5,
+            "status_filter": "限",
+        }
+
+    def run_legacy():
+        return legacy_render(TITLE_TEMPLATE, CONTENT_TEMPLATE, variables(legacy_table(funds)))
+
+    def run_compiled():
+        title_tpl, content_tpl = compile_template(template)
+        v = variables(render_fund_table(funds))
+        return title_tpl.render(v), content_tpl.render(v)
+
+    assert run_legacy() == run_compiled(), "渲染结果不一致"
+
+    legacy = min(timeit.repeat(run_legacy, number=1, repeat=repeat))
+    compiled = min(timeit.repeat(run_compiled, number=1, repeat=repeat))
+
+    # 单看变量替换（表格已渲染好，内容越大旧版多次扫描越明显）
+    table = render_fund_table(funds)
+    legacy_sub = min(timeit.repeat(
+        lambda: legacy_render(TITLE_TEMPLATE, CONTENT_TEMPLATE, variables(table)),
+        number=1, repeat=repeat,
+    ))
+    title_tpl, content_tpl = compile_template(template)
+    compiled_sub = min(timeit.repeat(
+        lambda: (title_tpl.render(variables(table)), content_tpl.render(variables(table))),
+        number=1, repeat=repeat,
+    ))
+
+    print(
+        f"{n:>7} 行 | 整体 旧版 {legacy * 1000:8.2f} ms  编译 {compiled * 1000:8.2f} ms"
+        f" ({legacy / compiled:4.1f}x)"
+        f" | 变量替换 旧版 {legacy_sub * 1000:7.3f} ms  编译 {compiled_sub * 1000:7.3f} ms"
+        f" ({legacy_sub / compiled_sub:4.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通知模板渲染微基准")
+    parser.add_argument("--rows", type=int, nargs="*", default=[50, 2000, 10000],
+                        help="报告行数（可多个）")
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数，取最小值")
+    args = parser.parse_args()
+
+    for n in args.rows:
+        bench(n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
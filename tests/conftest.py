@@ -0,0 +1,49 @@
+"""
+测试公共夹具
+整个测试会话使用临时 SQLite 数据库与数据目录（须在导入 config 之前设置环境变量），
+不启动调度器与发件箱投递线程；每个测试前重建全部表。
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="qdii-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/app.db"
+os.environ["DATA_DIR"] = f"{_TMP}/data"
+os.environ["NOTIFY_OUTBOX_ENABLED"] = "false"
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+@pytest.fixture(scope="session")
+def app():
+    from apps import app_factory
+
+    # 后台调度器会占用租约、执行定时任务，测试中不启动
+    original = app_factory._init_scheduler
+    app_factory._init_scheduler = lambda app: None
+    try:
+        application = app_factory.create_app({"TESTING": True, "WTF_CSRF_ENABLED": False})
+    finally:
+        app_factory._init_scheduler = original
+    yield application
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+@pytest.fixture
+def db(app):
+    """进入 app context 并重建全部表，返回 db 对象"""
+    from extensions import db as _db
+
+    with app.app_context():
+        _db.session.remove()
+        _db.drop_all()
+        _db.create_all()
+        yield _db
+        _db.session.remove()
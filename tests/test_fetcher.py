@@ -0,0 +1,102 @@
+"""
+fetch_qdii_data：各市场未变化时复用上次原始数据，部分市场失败后不得复用残缺数据
+"""
+import pytest
+
+
+def _rows(market, n=2):
+    return [
+        {"cell": {"fund_id": f"{market}{i:05d}", "fund_nm": f"{market}基金{i}", "nav_discount_rt": "1.5"}}
+        for i in range(n)
+    ]
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """按市场后缀返回固定数据；failing 中的市场返回 HTTP 500"""
+
+    def __init__(self):
+        self.failing = set()
+
+    def get(self, url, headers=None, timeout=None):
+        suffix = url.rsplit("/", 1)[-1]
+        if suffix in self.failing:
+            return FakeResponse(500)
+        return FakeResponse(200, {"rows": _rows(suffix)})
+
+
+@pytest.fixture
+def session(monkeypatch):
+    from apps.spider import fetcher
+
+    session = FakeSession()
+    monkeypatch.setattr(fetcher, "_get_session", lambda: session)
+    monkeypatch.setattr(fetcher, "_get_login_credentials", lambda: None)
+    monkeypatch.setattr(fetcher.storage, "save_raw", lambda df, now_str: "raw.csv")
+    monkeypatch.setattr(fetcher, "_api_state", {})
+    monkeypatch.setattr(fetcher, "_last_raw", None)
+    return session
+
+
+def _sources(df):
+    return set(df["来源"])
+
+
+def test_unchanged_markets_reuse_last_raw(session):
+    from apps.spider.fetcher import fetch_qdii_data
+
+    first = fetch_qdii_data()
+    again = fetch_qdii_data()
+
+    assert not first.attrs.get("unchanged")
+    assert again.attrs.get("unchanged") is True
+    assert _sources(again) == {"欧美市场", "商品市场", "亚洲市场"}
+
+
+def test_partial_failure_not_reused_as_unchanged(session):
+    from apps.spider import fetcher
+    from apps.spider.fetcher import fetch_qdii_data
+
+    fetch_qdii_data()
+
+    session.failing = {"C"}
+    partial = fetch_qdii_data()
+    assert _sources(partial) == {"欧美市场", "亚洲市场"}
+    assert fetcher._last_raw is None
+    assert "C" not in fetcher._api_state
+
+    # 恢复后各市场内容与之前相同：必须完整处理，不能复用缺失商品市场的数据
+    session.failing = set()
+    recovered = fetch_qdii_data()
+    assert not recovered.attrs.get("unchanged")
+    assert _sources(recovered) == {"欧美市场", "商品市场", "亚洲市场"}
+
+    again = fetch_qdii_data()
+    assert again.attrs.get("unchanged") is True
+    assert _sources(again) == {"欧美市场", "商品市场", "亚洲市场"}
+
+
+def test_partial_failure_with_stale_cache_never_unchanged(session):
+    """即使上次原始数据已缓存，失败市场的旧摘要也不能让下一次被判定为未变化"""
+    from apps.spider import fetcher
+    from apps.spider.fetcher import fetch_qdii_data
+
+    fetch_qdii_data()
+    cached = fetcher._last_raw
+
+    session.failing = {"C"}
+    fetch_qdii_data()
+    fetcher._last_raw = cached
+
+    session.failing = set()
+    recovered = fetch_qdii_data()
+    assert not recovered.attrs.get("unchanged")
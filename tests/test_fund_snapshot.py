@@ -0,0 +1,99 @@
+"""
+FundSnapshot.save_from_df：按 (snapshot_date, fund_code) 批量 upsert
+"""
+from datetime import date
+
+import pandas as pd
+
+DAY = date(2026, 10, 16)
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["代码", "名称", "溢价率", "申购状态", "来源"])
+
+
+def _snapshot(day=DAY):
+    from models import FundSnapshot
+
+    return {
+        s.fund_code: (s.fund_name, s.premium, s.status, s.source)
+        for s in FundSnapshot.query.filter_by(snapshot_date=day)
+    }
+
+
+def test_insert_then_update_in_place(db):
+    from models import FundSnapshot
+
+    df = _frame([
+        ["513100", "纳指ETF", 5.12345, "限100", "欧美市场"],
+        ["159941", "纳指ETF广发", 3.0, "开放申购", "欧美市场"],
+    ])
+    assert FundSnapshot.save_from_df(df, DAY) == 2
+    ids = {s.fund_code: s.id for s in FundSnapshot.query}
+
+    df = _frame([
+        ["513100", "纳指ETF", 6.5, "暂停申购", "欧美市场"],
+        ["159941", "纳指ETF广发", None, "开放申购", "欧美市场"],
+    ])
+    assert FundSnapshot.save_from_df(df, DAY) == 2
+
+    assert _snapshot() == {
+        "513100": ("纳指ETF", 6.5, "暂停申购", "欧美市场"),
+        "159941": ("纳指ETF广发", None, "开放申购", "欧美市场"),
+    }
+    # upsert 更新原有行，不是删除重建
+    assert {s.fund_code: s.id for s in FundSnapshot.query} == ids
+
+
+def test_premium_rounded_to_four_decimals(db):
+    from models import FundSnapshot
+
+    FundSnapshot.save_from_df(_frame([["513100", "纳指ETF", 9.489999771118164, "限100", "欧美市场"]]), DAY)
+
+    assert _snapshot()["513100"][1] == 9.49
+
+
+def test_codes_missing_from_new_frame_are_removed(db):
+    from models import FundSnapshot
+
+    FundSnapshot.save_from_df(_frame([
+        ["513100", "纳指ETF", 5.0, "限100", "欧美市场"],
+        ["159941", "纳指ETF广发", 3.0, "开放申购", "欧美市场"],
+        ["164906", "中概互联", 1.0, "开放申购", "亚洲市场"],
+    ]), DAY)
+    FundSnapshot.save_from_df(_frame([
+        ["513100", "纳指ETF", 5.5, "限100", "欧美市场"],
+        ["501018", "南方原油", 2.0, "暂停申购", "商品市场"],
+    ]), DAY)
+
+    assert set(_snapshot()) == {"513100", "501018"}
+
+
+def test_other_days_are_untouched(db):
+    from models import FundSnapshot
+
+    other = date(2026, 10, 15)
+    FundSnapshot.save_from_df(_frame([["159941", "纳指ETF广发", 3.0, "开放申购", "欧美市场"]]), other)
+    FundSnapshot.save_from_df(_frame([["513100", "纳指ETF", 5.0, "限100", "欧美市场"]]), DAY)
+
+    assert set(_snapshot(other)) == {"159941"}
+    assert set(_snapshot(DAY)) == {"513100"}
+
+
+def test_duplicate_codes_keep_last_row(db):
+    from models import FundSnapshot
+
+    FundSnapshot.save_from_df(_frame([
+        ["513100", "纳指ETF", 5.0, "限100", "欧美市场"],
+        ["513100", "纳指ETF", 7.0, "暂停申购", "欧美市场"],
+    ]), DAY)
+
+    assert _snapshot() == {"513100": ("纳指ETF", 7.0, "暂停申购", "欧美市场")}
+
+
+def test_string_date_accepted(db):
+    from models import FundSnapshot
+
+    FundSnapshot.save_from_df(_frame([["513100", "纳指ETF", 5.0, "限100", "欧美市场"]]), "2026-10-16")
+
+    assert set(_snapshot()) == {"513100"}
@@ -0,0 +1,80 @@
+"""
+FundTick.append_from_df：同一批次只写入一次
+"""
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+NOW = "20261016_103000"
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["代码", "溢价率", "申购状态"])
+
+
+DF = _frame([
+    ["513100", 5.12345, "限100"],
+    ["159941", None, "开放申购"],
+])
+
+
+def test_append_batch_once(db):
+    from models import FundTick
+
+    assert FundTick.append_from_df(DF, NOW) == 2
+    assert FundTick.append_from_df(DF, NOW) == 0
+
+    captured_at, ticks = FundTick.latest_batch()
+    assert captured_at == datetime(2026, 10, 16, 10, 30)
+    assert sorted((t.fund_code, t.premium, t.status) for t in ticks) == [
+        ("159941", None, "开放申购"),
+        ("513100", 5.1234, "限100"),
+    ]
+
+
+def test_partially_written_batch_completed(db):
+    from models import FundTick
+
+    FundTick.append_from_df(DF.iloc[:1], NOW)
+
+    assert FundTick.append_from_df(DF, NOW) == 1
+    assert FundTick.query.count() == 2
+
+
+def test_new_batch_appended(db):
+    from models import FundTick
+
+    FundTick.append_from_df(DF, NOW)
+    FundTick.append_from_df(DF, "20261016_110000")
+
+    assert [t.premium for t in FundTick.intraday("513100", datetime(2026, 10, 16).date())] == [
+        5.1234, 5.1234,
+    ]
+
+
+def test_concurrent_tasks_share_one_batch(app, db):
+    """多个任务共享同一次抓取、从调度线程同时写入时不产生重复批次"""
+    from models import FundTick
+
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def task():
+        with app.app_context():
+            try:
+                barrier.wait()
+                FundTick.append_from_df(DF, NOW)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=task) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert FundTick.query.count() == 2
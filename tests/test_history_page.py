@@ -0,0 +1,117 @@
+"""
+FundSnapshot.page 键集分页与 /api/history 游标
+"""
+from datetime import date, timedelta
+
+import pytest
+
+START = date(2026, 10, 1)
+
+
+@pytest.fixture
+def snapshots(db):
+    """3 天 × 7 只基金；溢价率含重复值与空值"""
+    from models import FundSnapshot
+
+    premiums = [2.5, None, 1.0, 2.5, None, -0.5, 1.0]
+    for d in range(3):
+        for i, premium in enumerate(premiums):
+            db.session.add(FundSnapshot(
+                snapshot_date=START + timedelta(days=d),
+                fund_code=f"5{i:05d}",
+                fund_name=f"基金{i}",
+                source="欧美市场" if i % 2 else "亚洲市场",
+                premium=None if premium is None else premium + d,
+                status="限100" if i % 3 == 0 else "开放申购",
+            ))
+    db.session.commit()
+    return FundSnapshot.query.all()
+
+
+def _expected(rows, sort, desc):
+    """Python 参考排序：(排序字段, id)，溢价率为空的记录始终在最后"""
+    present = [r for r in rows if getattr(r, sort) is not None]
+    missing = [r for r in rows if getattr(r, sort) is None]
+    present.sort(key=lambda r: (getattr(r, sort), r.id), reverse=desc)
+    missing.sort(key=lambda r: r.id, reverse=desc)
+    return [r.id for r in present + missing]
+
+
+def _walk(limit, **kwargs):
+    from models import FundSnapshot
+
+    ids, after, pages = [], None, 0
+    while True:
+        rows, after = FundSnapshot.page(limit=limit, after=after, **kwargs)
+        ids.extend(r.id for r in rows)
+        pages += 1
+        assert pages < 100
+        if after is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort", ["premium", "snapshot_date", "fund_code"])
+@pytest.mark.parametrize("desc", [True, False])
+@pytest.mark.parametrize("limit", [1, 4, 7, 50])
+def test_pages_match_reference_order(snapshots, sort, desc, limit):
+    assert _walk(limit, sort=sort, desc=desc) == _expected(snapshots, sort, desc)
+
+
+@pytest.mark.parametrize("desc", [True, False])
+def test_null_premiums_paged_after_values(snapshots, desc):
+    ids = _walk(2, sort="premium", desc=desc)
+    by_id = {r.id: r.premium for r in snapshots}
+    premiums = [by_id[i] for i in ids]
+    first_null = premiums.index(None)
+    assert all(p is None for p in premiums[first_null:])
+    assert None not in premiums[:first_null]
+    assert len(ids) == len(set(ids)) == len(snapshots)
+
+
+def test_filters_applied_before_paging(snapshots):
+    ids = _walk(
+        3, sort="premium", desc=True,
+        start_date=START + timedelta(days=1), status="限", premium_min=1.0,
+    )
+    expected = [
+        r for r in snapshots
+        if r.snapshot_date >= START + timedelta(days=1)
+        and "限" in r.status
+        and r.premium is not None and r.premium >= 1.0
+    ]
+    assert ids == _expected(expected, "premium", True)
+
+
+def test_unknown_sort_rejected(db):
+    from models import FundSnapshot
+
+    with pytest.raises(ValueError):
+        FundSnapshot.page(sort="fund_name")
+
+
+@pytest.mark.parametrize("sort", ["premium", "snapshot_date"])
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_api_cursor_round_trip(app, snapshots, sort, order):
+    client = app.test_client()
+    seen, cursor = [], None
+    while True:
+        url = f"/api/history?sort={sort}&order={order}&limit=4"
+        if cursor:
+            url += f"&cursor={cursor}"
+        body = client.get(url).get_json()
+        assert body["status"] == "success"
+        seen.extend((f["snapshot_date"], f["fund_code"]) for f in body["funds"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    expected = {r.id: r for r in snapshots}
+    assert seen == [
+        (expected[i].snapshot_date.isoformat(), expected[i].fund_code)
+        for i in _expected(snapshots, sort, order == "desc")
+    ]
+
+
+def test_api_rejects_bad_cursor(app, db):
+    resp = app.test_client().get("/api/history?cursor=not-a-cursor")
+    assert resp.status_code == 400
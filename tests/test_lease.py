@@ -0,0 +1,84 @@
+"""
+Lease：跨 worker 的数据库租约（占有、续期、过期接管、释放）
+"""
+from datetime import datetime, timedelta
+
+
+def _expire(db, name):
+    """把租约的过期时间拨到过去，模拟持有者崩溃后租约过期"""
+    from models import Lease
+
+    lease = db.session.get(Lease, name)
+    lease.expires_at = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_first_holder_wins(db):
+    from models import Lease
+
+    assert Lease.acquire("scheduler", "a", 60)
+    assert not Lease.acquire("scheduler", "b", 60)
+    assert Lease.current_holder("scheduler") == "a"
+
+
+def test_holder_renews(db):
+    from models import Lease
+
+    Lease.acquire("scheduler", "a", 1)
+    first = db.session.get(Lease, "scheduler").expires_at
+
+    assert Lease.acquire("scheduler", "a", 60)
+    assert Lease.get_active("scheduler").expires_at > first
+
+
+def test_expired_lease_taken_over(db):
+    from models import Lease
+
+    Lease.acquire("scheduler", "a", 60)
+    _expire(db, "scheduler")
+
+    assert Lease.get_active("scheduler") is None
+    assert Lease.current_holder("scheduler") is None
+    assert Lease.acquire("scheduler", "b", 60)
+    assert Lease.current_holder("scheduler") == "b"
+    # 原持有者恢复后不能再续期
+    assert not Lease.acquire("scheduler", "a", 60)
+
+
+def test_release_only_by_holder(db):
+    from models import Lease
+
+    Lease.acquire("refresh", "a", 60)
+
+    assert not Lease.release("refresh", "b")
+    assert Lease.current_holder("refresh") == "a"
+    assert Lease.release("refresh", "a")
+    assert Lease.get_active("refresh") is None
+    assert Lease.acquire("refresh", "b", 60)
+
+
+def test_names_are_independent(db):
+    from models import Lease
+
+    assert Lease.acquire("scheduler", "a", 60)
+    assert Lease.acquire("notify_outbox", "b", 60)
+    assert Lease.current_holder("scheduler") == "a"
+    assert Lease.current_holder("notify_outbox") == "b"
+
+
+def test_get_active_sees_changes_from_other_sessions(app, db):
+    """get_active 从数据库重新读取，不返回本会话缓存的旧持有者"""
+    from models import Lease
+
+    Lease.acquire("refresh", "a", 60)
+    assert Lease.get_active("refresh").holder == "a"
+
+    # 其他 worker（独立连接）接管了租约
+    with db.engine.begin() as conn:
+        conn.execute(
+            Lease.__table__.update()
+            .where(Lease.__table__.c.name == "refresh")
+            .values(holder="b")
+        )
+
+    assert Lease.get_active("refresh").holder == "b"
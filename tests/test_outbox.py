@@ -0,0 +1,173 @@
+"""
+通知发件箱：入队幂等、领取、失败重试、死信与投递器
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def _enqueue(key="k1", channels=("dingtalk", "bark")):
+    from models import NotifyOutbox
+
+    item, _ = NotifyOutbox.enqueue(key, "标题", "内容", list(channels), ["a@example.com"])
+    return item
+
+
+def _make_due(db, item):
+    item.next_attempt_at = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_enqueue_is_idempotent(db):
+    from models import NotifyOutbox
+
+    first, created = NotifyOutbox.enqueue("k1", "标题", "内容", ["bark"])
+    again, created_again = NotifyOutbox.enqueue("k1", "标题", "内容", ["bark"])
+
+    assert created and not created_again
+    assert again.id == first.id
+    assert NotifyOutbox.query.count() == 1
+
+
+def test_claim_is_exclusive_until_timeout(db):
+    from models import NotifyOutbox
+
+    item = _enqueue()
+
+    assert [i.id for i in NotifyOutbox.claim_due(10, 120)] == [item.id]
+    assert NotifyOutbox.claim_due(10, 120) == []
+
+    # 投递进程崩溃：领取超时后可被重新领取
+    item.locked_until = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+    assert [i.id for i in NotifyOutbox.claim_due(10, 120)] == [item.id]
+
+
+def test_partial_failure_retries_only_failed_channels(db):
+    from models import NotifyOutbox
+
+    item = _enqueue()
+    NotifyOutbox.claim_due(10, 120)
+    before = datetime.now()
+
+    item.record_attempt(succeeded=["dingtalk"], failed=["bark"], error="失败渠道: bark", backoff=30)
+
+    assert item.status == "pending"
+    assert item.attempts == 1
+    assert item.get_channels() == ["bark"]
+    assert item.get_delivered() == ["dingtalk"]
+    assert item.next_attempt_at >= before + timedelta(seconds=30)
+    # 退避期内不会被领取
+    assert NotifyOutbox.claim_due(10, 120) == []
+
+
+def test_dead_letter_after_max_attempts_and_requeue(db):
+    from models import NotifyOutbox
+
+    item = _enqueue(channels=["bark"])
+    for _ in range(3):
+        _make_due(db, item)
+        assert NotifyOutbox.claim_due(10, 120)
+        item.record_attempt(succeeded=[], failed=["bark"], error="boom", max_attempts=3, backoff=0)
+
+    assert item.status == "dead"
+    assert item.last_error == "boom"
+    assert NotifyOutbox.claim_due(10, 120) == []
+
+    item.requeue()
+    assert item.status == "pending" and item.attempts == 0
+    assert [i.id for i in NotifyOutbox.claim_due(10, 120)] == [item.id]
+
+
+def test_timed_out_channels_not_retried(db):
+    item = _enqueue()
+
+    item.record_attempt(succeeded=["dingtalk"], failed=[], unknown=["bark"])
+
+    assert item.status == "sent"
+    assert item.get_channels() == []
+    assert "bark" in item.last_error
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    """独立的投递器实例，发送结果由测试逐次指定"""
+    from apps.notify.notification_service import notification_service
+    from apps.notify.outbox import OutboxDispatcher
+
+    results = []
+    calls = []
+
+    def deliver(title, content, channels, recipients=None):
+        calls.append(list(channels))
+        return results.pop(0)
+
+    monkeypatch.setattr(notification_service, "deliver", deliver)
+    d = OutboxDispatcher()
+    d.results, d.calls = results, calls
+    return d
+
+
+def _result(success=(), failed=(), timeout=(), deferred=()):
+    return {
+        "success": list(success), "failed": list(failed),
+        "timeout": list(timeout), "deferred": list(deferred),
+    }
+
+
+def test_dispatcher_retries_failed_channel_then_sends(db, dispatcher):
+    item = _enqueue()
+    dispatcher.results += [
+        _result(success=["dingtalk"], failed=["bark"]),
+        _result(success=["bark"]),
+    ]
+
+    assert dispatcher.dispatch_due() == 1
+    assert item.status == "pending"
+
+    _make_due(db, item)
+    assert dispatcher.dispatch_due() == 1
+
+    assert dispatcher.calls == [["dingtalk", "bark"], ["bark"]]
+    assert item.status == "sent"
+    assert sorted(item.get_delivered()) == ["bark", "dingtalk"]
+
+
+def test_dispatcher_dead_letters_after_max_attempts(db, dispatcher, monkeypatch):
+    import config
+
+    monkeypatch.setattr(config.notify_cfg, "OUTBOX_MAX_ATTEMPTS", 2)
+    item = _enqueue(channels=["bark"])
+    dispatcher.results += [_result(failed=["bark"]), _result(failed=["bark"])]
+
+    dispatcher.dispatch_due()
+    _make_due(db, item)
+    dispatcher.dispatch_due()
+
+    assert item.status == "dead"
+    assert item.attempts == 2
+
+
+def test_dispatcher_treats_deferred_as_delivered(db, dispatcher):
+    item = _enqueue()
+    dispatcher.results.append(_result(success=["dingtalk"], deferred=["bark"]))
+
+    dispatcher.dispatch_due()
+
+    assert item.status == "sent"
+
+
+def test_dispatcher_exception_retries_all_channels(db, dispatcher, monkeypatch):
+    from apps.notify.notification_service import notification_service
+
+    def boom(*args, **kwargs):
+        raise RuntimeError("network down")
+
+    monkeypatch.setattr(notification_service, "deliver", boom)
+    item = _enqueue()
+
+    dispatcher.dispatch_due()
+
+    assert item.status == "pending"
+    assert item.get_channels() == ["dingtalk", "bark"]
+    assert item.last_error == "network down"
@@ -0,0 +1,225 @@
+"""
+溢价率滚动统计：矩阵计算与增量缓存
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+START = date(2026, 9, 1)
+CODES = ["513100", "159941", "164906", "501018"]
+
+
+def _reference(wide, min_periods):
+    """逐只基金用 pandas Series 计算的参考结果"""
+    rows = {}
+    for code in wide.columns:
+        latest = wide[code].iloc[-1]
+        if pd.isna(latest):
+            continue
+        s = wide[code].dropna()
+        enough = len(s) >= max(min_periods, 2)
+        std = s.std(ddof=1)
+        rows[code] = {
+            "premium": latest,
+            "mean": s.mean() if enough else np.nan,
+            "std": std if enough else np.nan,
+            "zscore": (latest - s.mean()) / std if enough and std > 0 else np.nan,
+            "pct_rank": (s <= latest).mean() if enough else np.nan,
+            "max": s.max(),
+            "min": s.min(),
+            "samples": len(s),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def test_compute_stats_matches_reference():
+    from apps.analytics.rolling import STAT_FIELDS, compute_stats
+
+    rng = np.random.default_rng(7)
+    wide = pd.DataFrame(
+        rng.normal(2.0, 1.5, size=(10, 5)),
+        index=[START + timedelta(days=d) for d in range(10)],
+        columns=["a", "b", "c", "d", "e"],
+    )
+    wide.iloc[[1, 4, 6], 0] = np.nan   # 有缺失日
+    wide.iloc[:7, 1] = np.nan          # 样本不足
+    wide.iloc[-1, 2] = np.nan          # 最新一日无数据
+    wide["d"] = 1.5                    # 标准差为 0
+
+    stats = compute_stats(wide, min_periods=5)
+
+    assert list(stats.columns) == list(STAT_FIELDS)
+    assert "c" not in stats.index
+    assert np.isnan(stats.loc["b", "zscore"]) and stats.loc["b", "samples"] == 3
+    assert np.isnan(stats.loc["d", "zscore"]) and stats.loc["d", "std"] == 0
+    pd.testing.assert_frame_equal(
+        stats.astype("float64"), _reference(wide, 5)[list(STAT_FIELDS)].astype("float64"),
+        check_names=False,
+    )
+
+
+def test_compute_stats_empty():
+    from apps.analytics.rolling import STAT_FIELDS, compute_stats
+
+    stats = compute_stats(pd.DataFrame(dtype="float64"))
+    assert stats.empty and list(stats.columns) == list(STAT_FIELDS)
+
+
+@pytest.fixture
+def window_cfg(monkeypatch):
+    import config
+
+    monkeypatch.setattr(config.analytics_cfg, "ROLLING_WINDOW", 5)
+    monkeypatch.setattr(config.analytics_cfg, "ROLLING_MIN_PERIODS", 3)
+    return config.analytics_cfg
+
+
+def _save_day(db, day, premiums):
+    """整日写入快照：premiums 为 基金代码 → 溢价率"""
+    from models import FundSnapshot
+
+    FundSnapshot.query.filter_by(snapshot_date=day).delete()
+    for code, premium in premiums.items():
+        db.session.add(FundSnapshot(
+            snapshot_date=day, fund_code=code, fund_name=code,
+            source="欧美市场", premium=premium, status="开放申购",
+        ))
+    db.session.commit()
+
+
+def _day_premiums(d, codes=CODES):
+    return {code: round(np.sin(d + i) * 3 + i, 4) for i, code in enumerate(codes)}
+
+
+def _changed():
+    """快照变化后递增版本戳（与抓取保存后的调用一致）"""
+    from apps.latest_view import latest_view
+
+    latest_view.invalidate()
+
+
+def _full_rebuild(cfg):
+    from apps.analytics.rolling import compute_stats, load_window
+
+    return compute_stats(load_window(cfg.ROLLING_WINDOW), cfg.ROLLING_MIN_PERIODS)
+
+
+def _assert_same(cached, full):
+    pd.testing.assert_frame_equal(cached.sort_index(), full.sort_index())
+
+
+def test_incremental_splice_matches_full_rebuild(db, window_cfg):
+    from apps.analytics.rolling import RollingStatsCache
+
+    for d in range(7):
+        _save_day(db, START + timedelta(days=d), _day_premiums(d))
+    cache = RollingStatsCache()
+    _assert_same(cache.current(), _full_rebuild(window_cfg))
+
+    # 当日重抓：改写溢价率、一只基金消失
+    today = START + timedelta(days=6)
+    premiums = _day_premiums(6)
+    premiums["513100"] += 5
+    del premiums["501018"]
+    _save_day(db, today, premiums)
+    _changed()
+    _assert_same(cache.current(), _full_rebuild(window_cfg))
+
+    # 新增两天（其中出现新基金），窗口向后滑动
+    for d in (7, 8):
+        _save_day(db, START + timedelta(days=d), _day_premiums(d, CODES + ["162411"]))
+    _changed()
+    stats = cache.current()
+    _assert_same(stats, _full_rebuild(window_cfg))
+    assert len(cache._window) == window_cfg.ROLLING_WINDOW
+    assert cache._window.index[0] == START + timedelta(days=4)
+    assert stats.loc["162411", "samples"] == 2
+
+
+def test_cached_until_version_changes(db, window_cfg):
+    from apps.analytics.rolling import RollingStatsCache
+
+    for d in range(5):
+        _save_day(db, START + timedelta(days=d), _day_premiums(d))
+    cache = RollingStatsCache()
+    first = cache.current()
+
+    _save_day(db, START + timedelta(days=5), _day_premiums(5))
+    assert cache.current() is first
+
+    _changed()
+    assert cache.current() is not first
+    assert cache._window.index[-1] == START + timedelta(days=5)
+
+
+def test_deleted_last_day_triggers_full_rebuild(db, window_cfg):
+    from apps.analytics.rolling import RollingStatsCache
+    from models import FundSnapshot
+
+    for d in range(7):
+        _save_day(db, START + timedelta(days=d), _day_premiums(d))
+    cache = RollingStatsCache()
+    cache.current()
+
+    FundSnapshot.query.filter_by(snapshot_date=START + timedelta(days=6)).delete()
+    db.session.commit()
+    _changed()
+
+    stats = cache.current()
+    _assert_same(stats, _full_rebuild(window_cfg))
+    assert cache._window.index[-1] == START + timedelta(days=5)
+    assert cache._window.index[0] == START + timedelta(days=1)
+
+
+def test_deleted_early_days_trigger_full_rebuild(db, window_cfg):
+    from apps.analytics.rolling import RollingStatsCache
+    from models import FundSnapshot
+
+    for d in range(7):
+        _save_day(db, START + timedelta(days=d), _day_premiums(d))
+    cache = RollingStatsCache()
+    cache.current()
+    assert cache._window.index[0] == START + timedelta(days=2)
+
+    # 清理过期快照：只保留最后 3 天，少于窗口大小
+    FundSnapshot.query.filter(FundSnapshot.snapshot_date < START + timedelta(days=4)).delete()
+    db.session.commit()
+    _changed()
+
+    stats = cache.current()
+    _assert_same(stats, _full_rebuild(window_cfg))
+    assert cache._window.index[0] == START + timedelta(days=4)
+    assert (stats["samples"] == 3).all()
+
+
+def test_cleanup_route_bumps_shared_stamp(app, db, window_cfg):
+    from apps.analytics.rolling import RollingStatsCache
+
+    today = date.today()
+    for d in range(5):
+        _save_day(db, today - timedelta(days=4 - d), _day_premiums(d))
+    cache = RollingStatsCache()
+    cache.current()
+
+    resp = app.test_client().post("/api/history/cleanup", json={"keep_days": 2})
+    assert resp.get_json()["status"] == "success"
+
+    # 其他 worker 的缓存未被直接调用 invalidate，只通过共享版本戳得知快照变化
+    stats = cache.current()
+    assert cache._window.index[0] == today - timedelta(days=2)
+    assert (stats["samples"] == 3).all()
+
+
+def test_to_records_json_friendly():
+    from apps.analytics.rolling import RollingStatsCache
+
+    stats = pd.DataFrame(
+        {"premium": [1.23456], "mean": [np.nan], "samples": [3.0]},
+        index=pd.Index(["513100"], name="fund_code"),
+    )
+
+    assert RollingStatsCache.to_records(stats) == [
+        {"fund_code": "513100", "premium": 1.2346, "mean": None, "samples": 3},
+    ]
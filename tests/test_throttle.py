@@ -0,0 +1,207 @@
+"""
+渠道限流：令牌桶、超限合并汇总、汇总失败与退出时转交
+"""
+import pytest
+
+from apps.notify import throttle
+from apps.notify.throttle import ChannelThrottle, TokenBucket, build_digest, parse_rate_limits
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttle.time, "monotonic", clock)
+    return clock
+
+
+class FakeTimer:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+@pytest.fixture
+def no_timers(monkeypatch):
+    """不启动真实定时器，记录计划的汇总发送（渠道, 延迟）"""
+    scheduled = []
+
+    def schedule(self, channel, delay):
+        scheduled.append((channel, delay))
+        self._timers[channel] = FakeTimer()
+
+    monkeypatch.setattr(ChannelThrottle, "_schedule", schedule)
+    return scheduled
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("dingtalk=20, serverchan=5") == {"dingtalk": 20, "serverchan": 5}
+    assert parse_rate_limits("dingtalk=x,bark=0,,=3,pushplus=10") == {"pushplus": 10}
+    assert parse_rate_limits("") == {}
+    assert parse_rate_limits(None) == {}
+
+
+def test_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(20)
+    assert bucket.capacity == 5
+
+    assert all(bucket.try_acquire() for _ in range(5))
+    assert not bucket.try_acquire()
+    assert bucket.wait_time() == pytest.approx(60 / 15)
+
+    clock.now += 60 / 15
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    # 长时间空闲后也不超过容量
+    clock.now += 3600
+    assert sum(bucket.try_acquire() for _ in range(10)) == 5
+
+
+def test_bucket_never_exceeds_limit_per_minute(clock):
+    bucket = TokenBucket(20)
+    sent = []
+    for step in range(600):
+        clock.now = 1000.0 + step * 0.5
+        if bucket.try_acquire():
+            sent.append(clock.now)
+
+    for i, start in enumerate(sent):
+        assert sum(1 for t in sent[i:] if t < start + 60) <= 20
+
+
+def test_unlimited_channel_always_admitted(clock, no_timers):
+    t = ChannelThrottle({"dingtalk": 4}, sender=lambda *a: True)
+    assert all(t.admit("bark", "标题", "内容") for _ in range(50))
+    assert no_timers == []
+
+
+def test_over_limit_messages_queued_in_order(clock, no_timers):
+    t = ChannelThrottle({"dingtalk": 4}, sender=lambda *a: True)
+
+    assert t.admit("dingtalk", "t1", "c1")
+    assert not t.admit("dingtalk", "t2", "c2", ["a"])
+    assert t.pending_count("dingtalk") == 1
+    assert no_timers == [("dingtalk", pytest.approx(20.0))]
+
+    # 有待合并消息时，即使令牌已恢复也继续排队，保证先后顺序
+    clock.now += 60
+    assert not t.admit("dingtalk", "t3", "c3", ["b"])
+    assert t.pending_count("dingtalk") == 2
+    assert len(no_timers) == 1
+
+
+def test_flush_sends_single_digest(clock, no_timers):
+    sent = []
+    t = ChannelThrottle({"dingtalk": 4}, sender=lambda *a: sent.append(a) or True)
+    t.admit("dingtalk", "t1", "c1")
+    t.admit("dingtalk", "t2", "c2", ["a"], context="cfg-1")
+    t.admit("dingtalk", "t3", "c3", ["b", "a"], context="cfg-2")
+
+    clock.now += 20
+    t._flush("dingtalk")
+
+    assert len(sent) == 1
+    channel, title, content, recipients, context = sent[0]
+    assert channel == "dingtalk"
+    assert title == "[QDII汇总] 2 条通知"
+    assert content.index("t2") < content.index("t3")
+    assert recipients == ["a", "b"]
+    assert context == "cfg-2"
+    assert t.pending_count("dingtalk") == 0
+
+
+def test_flush_waits_for_token(clock, no_timers):
+    sent = []
+    t = ChannelThrottle({"dingtalk": 4}, sender=lambda *a: sent.append(a) or True)
+    t.admit("dingtalk", "t1", "c1")
+    t.admit("dingtalk", "t2", "c2")
+
+    t._flush("dingtalk")
+
+    assert sent == []
+    assert t.pending_count("dingtalk") == 1
+    assert len(no_timers) == 2
+
+
+@pytest.mark.parametrize("sender_ok", [False, None])
+def test_failed_digest_handed_to_fallback(clock, no_timers, sender_ok):
+    def sender(*args):
+        if sender_ok is None:
+            raise RuntimeError("boom")
+        return sender_ok
+
+    handed = []
+    t = ChannelThrottle({"dingtalk": 4}, sender=sender,
+                        fallback=lambda *a: handed.append(a) or True)
+    t.admit("dingtalk", "t1", "c1")
+    t.admit("dingtalk", "t2", "c2", ["a"])
+
+    clock.now += 20
+    t._flush("dingtalk")
+
+    assert handed == [("dingtalk", "t2", "c2", ["a"])]
+
+
+def test_drain_hands_off_all_pending(clock, no_timers):
+    sent, handed = [], []
+    t = ChannelThrottle({"dingtalk": 4, "serverchan": 4}, sender=lambda *a: sent.append(a) or True,
+                        fallback=lambda *a: handed.append(a) or True)
+    for channel in ("dingtalk", "serverchan"):
+        t.admit(channel, "t1", "c1")
+        t.admit(channel, "t2", "c2")
+        t.admit(channel, "t3", "c3")
+
+    assert t.drain() == 2
+
+    assert sent == []
+    assert sorted((h[0], h[1]) for h in handed) == [
+        ("dingtalk", "[QDII汇总] 2 条通知"),
+        ("serverchan", "[QDII汇总] 2 条通知"),
+    ]
+    assert t.pending_count("dingtalk") == t.pending_count("serverchan") == 0
+    assert t.drain() == 0
+
+
+def test_build_digest():
+    assert build_digest([("t1", "c1", ["a"])]) == ("t1", "c1", ["a"])
+
+    title, content, recipients = build_digest([("t1", "c1", ["a"]), ("t2", "c2", ["b", "a"])])
+    assert title == "[QDII汇总] 2 条通知"
+    assert content == "### 1. t1\n\nc1\n\n---\n\n### 2. t2\n\nc2"
+    assert recipients == ["a", "b"]
+
+
+def test_failed_digest_requeued_to_outbox(app, db, clock, no_timers):
+    from apps.notify.outbox import OutboxDispatcher
+    from models import NotifyOutbox
+
+    dispatcher = OutboxDispatcher()
+    t = ChannelThrottle({"dingtalk": 4}, sender=lambda *a: False, fallback=dispatcher.requeue)
+    t.admit("dingtalk", "t1", "c1")
+    t.admit("dingtalk", "t2", "c2", ["a"])
+
+    # 投递器未启动时无法转交
+    clock.now += 20
+    t._flush("dingtalk")
+    assert NotifyOutbox.query.count() == 0
+
+    dispatcher.app = app
+    t.admit("dingtalk", "t3", "c3", ["b"])
+    clock.now += 20
+    t._flush("dingtalk")
+
+    item = NotifyOutbox.query.one()
+    assert item.kind == "digest"
+    assert item.status == "pending"
+    assert (item.title, item.content) == ("t3", "c3")
+    assert item.get_channels() == ["dingtalk"]
+    assert item.get_recipients() == ["b"]
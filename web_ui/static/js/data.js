@@ -60,54 +60,53 @@ const DataModule = (function() {
     if (statusMessage) statusMessage.innerHTML = '<strong>正在刷新数据...</strong>';
     if (statusOutput) statusOutput.textContent = '准备开始抓取数据...';
 
-    // SSE 方式实时获取进度
-    const eventSource = new EventSource('/api/refresh-status');
-    let lastEventTime = Date.now();
-
-    const checkInterval = setInterval(function() {
-      if (Date.now() - lastEventTime > 15000) {
-        eventSource.close();
-        clearInterval(checkInterval);
-        if (statusMessage) statusMessage.innerHTML = '<strong class="text-danger">连接超时</strong>';
-        resetButton();
-      }
-    }, 3000);
-
-    eventSource.onmessage = function(event) {
-      lastEventTime = Date.now();
-      try {
-        const data = JSON.parse(event.data);
-        if (data.status === 'completed') {
-          eventSource.close();
-          clearInterval(checkInterval);
-          if (statusMessage) statusMessage.innerHTML = '<strong class="text-success">刷新成功！</strong>';
-          if (statusOutput) statusOutput.textContent = data.message;
-          // 自动刷新页面
-          setTimeout(function() { window.location.reload(); }, 1500);
-        } else if (data.status === 'error') {
-          eventSource.close();
-          clearInterval(checkInterval);
-          if (statusMessage) statusMessage.innerHTML = '<strong class="text-danger">刷新失败</strong>';
-          if (statusOutput) statusOutput.textContent = data.message;
-          startCooldown();
-        } else {
-          if (statusOutput) {
-            const lines = statusOutput.textContent.split('\n');
-            lines.push(data.message);
-            if (lines.length > 10) lines.shift();
-            statusOutput.textContent = lines.join('\n');
-            statusOutput.scrollTop = statusOutput.scrollHeight;
-          }
-        }
-      } catch(e) {}
-    };
-
-    eventSource.onerror = function() {
-      eventSource.close();
-      clearInterval(checkInterval);
-      if (statusMessage) statusMessage.innerHTML = '<strong class="text-danger">连接错误</strong>';
+    // 短轮询获取进度（每次请求立即返回，不占用服务端 worker 线程）；
+    // 执行刷新的 worker 中断时由服务端返回错误事件
+    let finished = false;
+
+    function fail(message) {
+      finished = true;
+      if (statusMessage) statusMessage.innerHTML = '<strong class="text-danger">' + message + '</strong>';
       startCooldown();
-    };
+    }
+
+    function handleEvent(data) {
+      if (data.status === 'completed') {
+        finished = true;
+        if (statusMessage) statusMessage.innerHTML = '<strong class="text-success">刷新成功！</strong>';
+        if (statusOutput) statusOutput.textContent = data.message;
+        // 自动刷新页面
+        setTimeout(function() { window.location.reload(); }, 1500);
+      } else if (data.status === 'error') {
+        fail('刷新失败');
+        if (statusOutput) statusOutput.textContent = data.message;
+      } else if (statusOutput) {
+        const lines = statusOutput.textContent.split('\n');
+        lines.push(data.since_start != null
+          ? '[' + data.since_start.toFixed(1) + 's] ' + data.message
+          : data.message);
+        if (lines.length > 10) lines.shift();
+        statusOutput.textContent = lines.join('\n');
+        statusOutput.scrollTop = statusOutput.scrollHeight;
+      }
+    }
+
+    function poll(jobId, offset) {
+      const url = jobId
+        ? '/api/refresh/progress?job=' + encodeURIComponent(jobId) + '&offset=' + offset
+        : '/api/refresh/progress';
+      fetch(url)
+        .then(function(resp) { return resp.json(); })
+        .then(function(data) {
+          if (data.status !== 'success') return fail('连接错误');
+          data.events.forEach(function(event) { if (!finished) handleEvent(event); });
+          if (finished || data.finished) return;
+          setTimeout(function() { poll(data.job_id, data.offset); }, data.poll_interval * 1000);
+        })
+        .catch(function() { fail('连接错误'); });
+    }
+
+    poll(null, 0);
   }
 
   function applyFilters() {
@@ -106,6 +106,7 @@ const TaskModule = (function() {
                 ${getStatusText(conditions.status_filter)}
               </span>
               <div>溢价率 ≥ ${conditions.premium_min}</div>
+              ${conditions.zscore_min != null ? `<div>z-score ≥ ${conditions.zscore_min}</div>` : ''}
             </div>
           </td>
           <td>
@@ -707,8 +708,8 @@ const TaskModule = (function() {
         <tr>
           <td>${formattedTime}</td>
           <td>
-            <span class="badge ${log.status === 'executed' ? 'badge-success' : 'badge-danger'}">
-              ${log.status === 'executed' ? '执行成功' : '执行失败'}
+            <span class="badge ${getLogBadgeClass(log.status)}">
+              ${getLogStatusText(log.status)}
             </span>
           </td>
           <td>${log.filtered_count}条数据</td>
@@ -847,6 +848,18 @@ const TaskModule = (function() {
   /**
    * 获取状态文本
    */
+  function getLogStatusText(status) {
+    if (status === 'executed' || status === 'success') return '执行成功';
+    if (status === 'unchanged') return '数据未变化';
+    return '执行失败';
+  }
+
+  function getLogBadgeClass(status) {
+    if (status === 'executed' || status === 'success') return 'badge-success';
+    if (status === 'unchanged') return 'badge-secondary';
+    return 'badge-danger';
+  }
+
   function getStatusText(statusFilter) {
     const statusMap = {
       'all': '全部状态',